@@ -3,6 +3,8 @@ import requests
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from utils import recompute_clusters_panel, get_cluster_snapshot, get_scorer
+from scoring import profile_features
 
 st.set_page_config(
     page_title="EtrePROF - ML Dashboard",
@@ -205,22 +207,7 @@ elif section == "User Clusters":
         # Recompute clusters
         st.markdown("### Recompute Clusters")
 
-        if st.button("Recompute clusters", type="secondary"):
-            with st.spinner("Recomputing... This may take a few minutes."):
-                recompute_result = call_api("/clusters/recompute", method="POST")
-
-                if recompute_result and recompute_result.get("success"):
-                    st.success("Clusters recomputed successfully")
-
-                    st.markdown("#### New distribution:")
-                    distribution = recompute_result["cluster_distribution"]
-
-                    cols = st.columns(4)
-                    for i, (cluster_key, count) in enumerate(distribution.items()):
-                        with cols[i]:
-                            st.metric(f"Cluster {i}", f"{count:,}")
-
-                    st.rerun()
+        recompute_clusters_panel()
 
 # Section 3: Recommendations
 elif section == "Recommendations":
@@ -335,11 +322,14 @@ elif section == "User Profile":
 
                 with col3:
                     profile = profile_data["profile"]
-                    engagement_score = (
-                        profile.get("anciennete", 0) * 2 +
-                        profile.get("degre", 0) * 10
-                    ) / 10
-                    st.metric("Engagement Score", f"{engagement_score:.1f}/10")
+                    snapshot = get_cluster_snapshot()
+                    if snapshot:
+                        # Missing behavioral features fall back to the cluster's averages
+                        features, _ = profile_features(profile, snapshot.metrics[snapshot.position(cluster_info["id"])])
+                        engagement_score = float(get_scorer(snapshot).score(features)[0][0])
+                        st.metric("Engagement Score", f"{engagement_score:.1f}/10")
+                    else:
+                        st.metric("Engagement Score", "N/A")
 
                 st.markdown("### Detailed Profile")
 
@@ -0,0 +1,78 @@
+# archives.py
+# Lecture en flux d'archives ZIP : les membres sont décompressés un par un dans un
+# fichier temporaire borné, jamais l'archive entière en mémoire.
+import posixpath
+import zipfile
+from tempfile import SpooledTemporaryFile
+
+from uploads import MB, CHUNK_SIZE, SPOOL_THRESHOLD
+
+MAX_MEMBERS = 500
+MAX_TOTAL_BYTES = 500 * MB
+
+
+class ArchiveLimitError(ValueError):
+    pass
+
+
+def _is_hidden(name):
+    parts = name.split("/")
+    return any(part.startswith(".") or part == "__MACOSX" for part in parts)
+
+
+def _copy_capped(source, target, cap):
+    # On compte les octets réellement décompressés : les tailles d'en-tête peuvent mentir
+    written = 0
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+        written += len(chunk)
+        if written > cap:
+            return None
+        target.write(chunk)
+    return written
+
+
+def iter_archive_members(archive_file, size_caps, max_total_bytes=MAX_TOTAL_BYTES, max_members=MAX_MEMBERS):
+    """Génère `(nom, fichier, raison_du_rejet)` pour chaque membre de l'archive.
+
+    Seules les extensions présentes dans `size_caps` sont extraites, chacune sous son
+    plafond. Le fichier fourni n'est valide que jusqu'à l'itération suivante.
+    """
+    archive_file.seek(0)
+    total = 0
+    count = 0
+
+    with zipfile.ZipFile(archive_file) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or _is_hidden(name):
+                continue
+
+            suffix = posixpath.splitext(name)[1].lstrip(".").lower()
+            if suffix not in size_caps:
+                yield name, None, "Unsupported file format"
+                continue
+
+            count += 1
+            if count > max_members:
+                raise ArchiveLimitError(f"Archive has more than {max_members} supported files")
+
+            cap = size_caps[suffix]
+            if info.file_size > cap:
+                yield name, None, f"File too large ({info.file_size / MB:.1f} MB)"
+                continue
+
+            with SpooledTemporaryFile(max_size=SPOOL_THRESHOLD) as member:
+                with archive.open(info) as source:
+                    written = _copy_capped(source, member, min(cap, max_total_bytes - total))
+
+                if written is None:
+                    if total + cap > max_total_bytes:
+                        raise ArchiveLimitError(
+                            f"Archive expands beyond {max_total_bytes / MB:.0f} MB"
+                        )
+                    yield name, None, f"File too large (over {cap / MB:.0f} MB once decompressed)"
+                    continue
+
+                total += written
+                member.seek(0)
+                yield name, member, None
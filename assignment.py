@@ -0,0 +1,44 @@
+# assignment.py
+# Affectation locale au cluster le plus proche, sans appel au backend. Les centroïdes sont
+# les profils moyens de l'instantané (/clusters) ; la distance euclidienne est calculée
+# sur les variables centrées-réduites, pour un ou des milliers de vecteurs à la fois.
+import numpy as np
+
+from clusters import PROFILE_METRICS
+
+
+class CentroidAssigner:
+    def __init__(self, cluster_ids, centroids, mean, scale, features=PROFILE_METRICS, scaling=None):
+        self.cluster_ids = np.asarray(cluster_ids)
+        self.scaling = scaling
+        self.features = tuple(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.where(np.asarray(scale, dtype=np.float64) > 0, scale, 1.0)
+        self._centroids = (np.asarray(centroids, dtype=np.float64) - self.mean) / self.scale
+        self._centroid_norms = (self._centroids ** 2).sum(axis=1)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, users=None):
+        # Le backend ne publie pas les paramètres de son StandardScaler : moyenne et écart-type
+        # mesurés sur l'instantané utilisateurs en tiennent lieu, sinon distances non réduites
+        mean, scale, scaling = snapshot.population_moments(users)
+        return cls(snapshot.ids, snapshot.metrics, mean, scale, scaling=scaling)
+
+    def assign(self, vectors):
+        """`vectors` : tableau (n, variables) ou un seul vecteur, dans l'ordre de `features`.
+        Renvoie (clusters, distances, confiances) ; la confiance (0-1) mesure l'écart entre
+        le centroïde le plus proche et le suivant."""
+        X = (np.atleast_2d(np.asarray(vectors, dtype=np.float64)) - self.mean) / self.scale
+        # |x - c|² = |x|² - 2 x·c + |c|², sans matrice intermédiaire (n, k, variables)
+        squared = (X ** 2).sum(axis=1)[:, None] - 2 * X @ self._centroids.T + self._centroid_norms
+        squared = np.maximum(squared, 0)
+
+        if squared.shape[1] > 1:
+            nearest_two = np.partition(squared, 1, axis=1)[:, :2]
+        else:
+            nearest_two = np.hstack([squared, squared])
+        best = squared.argmin(axis=1)
+        distances = np.sqrt(nearest_two[:, 0])
+        runner_up = np.sqrt(nearest_two[:, 1])
+        confidence = np.where(runner_up > 0, 1 - distances / np.where(runner_up > 0, runner_up, 1), 1.0)
+        return self.cluster_ids[best], distances, confidence
@@ -0,0 +1,26 @@
+# catalog.py
+# Lecture de l'export du catalogue ÊtrePROF (CSV ou JSON Lines) : une ligne par contenu,
+# colonnes id, title, text, et optionnellement topic, url, type.
+import csv
+import json
+import os
+
+
+def iter_catalog(path):
+    """Génère les contenus du catalogue sous forme de dicts, sans tout charger en mémoire."""
+    if not path or not os.path.exists(path):
+        return
+
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+
+
+def content_text(content):
+    """Texte indexable d'un contenu : titre puis corps."""
+    return "\n\n".join(part for part in (content.get("title"), content.get("text")) if part)
@@ -0,0 +1,129 @@
+# classification.py
+# Client de l'endpoint /classify : le texte part dans le corps de la requête, les longs
+# documents sont découpés en sections qui se chevauchent, classées en parallèle puis agrégées.
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+CHUNK_CHARS = 4000
+CHUNK_OVERLAP = 400
+MAX_WORKERS = 4
+REQUEST_TIMEOUT = 60
+
+
+class ClassificationError(Exception):
+    pass
+
+
+def split_into_chunks(text, max_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """Découpe `text` en intervalles (début, fin) d'au plus `max_chars`, coupés de
+    préférence entre deux paragraphes, avec `overlap` caractères de recouvrement."""
+    length = len(text)
+    if length <= max_chars:
+        return [(0, length)]
+
+    chunks = []
+    start = 0
+    while start < length:
+        end = min(start + max_chars, length)
+        if end < length:
+            # On coupe au dernier saut de paragraphe (ou espace) de la seconde moitié du bloc
+            floor = start + max_chars // 2
+            cut = text.rfind("\n\n", floor, end)
+            if cut == -1:
+                cut = text.rfind(" ", floor, end)
+            if cut != -1:
+                end = cut
+        chunks.append((start, end))
+        if end >= length:
+            break
+
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
+
+
+def classify_chunk(session, api_base_url, content):
+    response = session.post(f"{api_base_url}/classify", json={"content": content}, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 200:
+        raise ClassificationError(f"API Error: {response.status_code}")
+
+    result = response.json()
+    if not result or not result.get("success"):
+        raise ClassificationError(result.get("error", "Classification failed") if result else "Empty response")
+    return result["data"]
+
+
+def aggregate_sections(sections):
+    """Fusionne les résultats par section en un `topic_principal` unique.
+
+    Chaque section vote pour son thème avec un poids = longueur x confiance ; la
+    confiance finale est la confiance moyenne pondérée par la longueur, les sections
+    en désaccord comptant pour zéro.
+    """
+    scores = {}
+    total_length = 0
+    for section in sections:
+        length = section["end"] - section["start"]
+        total_length += length
+        label = section["label"]
+        scores[label] = scores.get(label, 0) + length * section["confidence"]
+
+    label = max(scores, key=scores.get)
+    total_score = sum(scores.values()) or 1
+    distribution = [
+        {"label": l, "share": round(score / total_score * 100, 1)}
+        for l, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    ]
+    return {
+        "topic_principal": {
+            "label": label,
+            "confidence": round(scores[label] / total_length, 1),
+        },
+        "topic_distribution": distribution,
+    }
+
+
+def classify_document(api_base_url, text, max_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP, max_workers=MAX_WORKERS):
+    """Classe un document de n'importe quelle taille. Renvoie un dict au format de
+    l'API (`topic_principal` avec label et confiance) complété de `sections`."""
+    chunks = split_into_chunks(text, max_chars, overlap)
+
+    with requests.Session() as session:
+        if len(chunks) == 1:
+            data = classify_chunk(session, api_base_url, text)
+            topic = data["topic_principal"]
+            data["sections"] = [{
+                "section": 1, "start": 0, "end": len(text),
+                "label": topic["label"], "confidence": topic["confidence"],
+            }]
+            return data
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            futures = [
+                executor.submit(classify_chunk, session, api_base_url, text[start:end])
+                for start, end in chunks
+            ]
+
+        sections = []
+        errors = []
+        for i, ((start, end), future) in enumerate(zip(chunks, futures), 1):
+            try:
+                topic = future.result()["topic_principal"]
+            except Exception as e:
+                errors.append(f"section {i}: {e}")
+                continue
+            sections.append({
+                "section": i, "start": start, "end": end,
+                "label": topic["label"], "confidence": topic["confidence"],
+            })
+
+    if not sections:
+        raise ClassificationError("; ".join(errors))
+
+    data = aggregate_sections(sections)
+    data["sections"] = sections
+    if errors:
+        data["failed_sections"] = errors
+    return data
@@ -0,0 +1,79 @@
+# classification_cache.py
+# Cache des résultats de /classify, indexé par le hash du texte normalisé et la version
+# du modèle : un même article recollé avec d'autres espaces ne repart pas en inférence.
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 512
+
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_MARKDOWN_NOISE = re.compile(r"[#*_`>~|]+|^\s*[-+]\s+|^\s*\d+\.\s+", re.MULTILINE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Texte réduit à son contenu : sans syntaxe markdown, espaces fusionnés, casse repliée."""
+    text = _IMAGE.sub(" ", text)
+    text = _LINK.sub(r"\1", text)
+    text = _MARKDOWN_NOISE.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def cache_key(text, model_version):
+    normalized = normalize_text(text)
+    return hashlib.sha256(f"{model_version}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """LRU en mémoire, partagé entre sessions, avec copie optionnelle sur disque (un JSON par entrée)."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, data)
+        return data
+
+    def set(self, key, data):
+        self._remember(key, data)
+        if self.cache_dir:
+            # Écriture atomique : un lecteur concurrent ne voit jamais un JSON tronqué
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,132 @@
+# cluster_history.py
+# Historique des instantanés de clusters : un fichier npz compressé (colonnes NumPy) par
+# version, ajouté sans jamais réécrire les précédents. Les horodatages sont dans le nom
+# des fichiers : une requête par période ne lit que l'index en mémoire.
+import bisect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from clusters import ClusterSnapshot, PROFILE_METRICS
+
+DEFAULT_DIRECTORY = "cluster_history"
+MAX_LOADED = 32
+
+
+def _filename(recorded_at, version):
+    return f"{round(recorded_at * 1000):013d}_{version}.npz"
+
+
+class ClusterHistory:
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+        self._timestamps = []
+        self._versions = []
+        for name in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(name)
+            if ext != ".npz" or "_" not in stem or stem.endswith(".tmp"):
+                continue  # fichiers temporaires d'une écriture interrompue
+            millis, version = stem.split("_", 1)
+            self._timestamps.append(int(millis) / 1000)
+            self._versions.append(version)
+
+    def __len__(self):
+        return len(self._versions)
+
+    def append(self, snapshot):
+        """Enregistre l'instantané s'il diffère du dernier ; renvoie True s'il a été ajouté."""
+        with self._lock:
+            if self._versions and self._versions[-1] == snapshot.version:
+                return False
+            # Horodatage à la milliseconde (celui du nom de fichier), strictement croissant
+            recorded_at = round(snapshot.fetched_at, 3)
+            if self._timestamps and recorded_at <= self._timestamps[-1]:
+                recorded_at = round(self._timestamps[-1] + 0.001, 3)
+            path = os.path.join(self.directory, _filename(recorded_at, snapshot.version))
+            tmp_path = f"{path}.tmp.npz"
+            np.savez_compressed(
+                tmp_path,
+                ids=np.asarray(snapshot.ids, dtype=np.int32),
+                names=np.array(snapshot.names),
+                counts=snapshot.counts,
+                percentages=snapshot.percentages,
+                metrics=snapshot.metrics.astype(np.float32),
+                level_names=np.array(snapshot.level_names),
+                levels=snapshot.levels.astype(np.float32),
+                descriptions=np.array(json.dumps([dict(d) for d in snapshot.descriptions], ensure_ascii=False)),
+            )
+            os.replace(tmp_path, path)
+            self._timestamps.append(recorded_at)
+            self._versions.append(snapshot.version)
+            return True
+
+    def entries(self, start=None, end=None):
+        """[(horodatage, version)] entre `start` et `end` (timestamps inclus), du plus ancien au plus récent."""
+        with self._lock:
+            low = bisect.bisect_left(self._timestamps, start) if start is not None else 0
+            high = bisect.bisect_right(self._timestamps, end) if end is not None else len(self._timestamps)
+            return list(zip(self._timestamps[low:high], self._versions[low:high]))
+
+    def load(self, recorded_at, version):
+        key = (recorded_at, version)
+        with self._lock:
+            snapshot = self._loaded.get(key)
+            if snapshot is not None:
+                self._loaded.move_to_end(key)
+                return snapshot
+
+        with np.load(os.path.join(self.directory, _filename(recorded_at, version))) as data:
+            snapshot = ClusterSnapshot(
+                version,
+                data["ids"].tolist(),
+                data["names"].tolist(),
+                data["counts"],
+                data["percentages"],
+                data["metrics"],
+                data["level_names"].tolist(),
+                data["levels"],
+                json.loads(str(data["descriptions"])),
+                fetched_at=recorded_at,
+            )
+        with self._lock:
+            self._loaded[key] = snapshot
+            while len(self._loaded) > MAX_LOADED:
+                self._loaded.popitem(last=False)
+        return snapshot
+
+
+def diff_snapshots(old, new):
+    """Écarts par cluster entre deux instantanés : une ligne par identifiant présent dans l'un ou l'autre."""
+    ids = sorted(set(old.ids) | set(new.ids))
+
+    def aligned(snapshot, values):
+        out = np.full((len(ids),) + values.shape[1:], np.nan)
+        positions = [ids.index(cid) for cid in snapshot.ids]
+        out[positions] = values
+        return out
+
+    old_counts, new_counts = aligned(old, old.counts), aligned(new, new.counts)
+    old_pct, new_pct = aligned(old, old.percentages), aligned(new, new.percentages)
+    metric_deltas = aligned(new, new.metrics) - aligned(old, old.metrics)
+
+    rows = []
+    for i, cid in enumerate(ids):
+        name = new.name(cid) if cid in new.ids else old.name(cid)
+        row = {
+            "cluster": cid,
+            "name": name,
+            "size_before": old_counts[i],
+            "size_after": new_counts[i],
+            "size_change": new_counts[i] - old_counts[i],
+            "percentage_change": new_pct[i] - old_pct[i],
+        }
+        row.update({f"{key}_change": metric_deltas[i, j] for j, key in enumerate(PROFILE_METRICS)})
+        rows.append(row)
+    return rows
@@ -0,0 +1,135 @@
+# clusters.py
+# Instantané immuable des clusters renvoyés par /clusters : le JSON est parcouru une seule
+# fois par version du backend, puis partagé par toutes les sessions et toutes les pages.
+import hashlib
+import json
+import time
+from types import MappingProxyType
+
+import numpy as np
+
+# Couleurs des clusters, identiques sur toutes les pages
+CLUSTER_COLORS = ['#5f2ec8', '#ffc373', '#45B7D1', '#96CEB4', '#FF6B6B']
+
+# Métriques de profil renvoyées par l'API pour chaque cluster
+PROFILE_METRICS = ("activity_level", "email_engagement", "content_usage", "topic_count", "anciennete")
+
+# Origine des moyennes / écarts-types qui centrent-réduisent les métriques (population_moments)
+USER_MOMENTS = "users"
+UNSCALED = "unscaled"
+
+
+def _readonly(values, dtype):
+    array = np.asarray(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+def _parse_percentage(value):
+    # "60.0%" côté API, parfois déjà numérique
+    return float(str(value).replace('%', '') or 0)
+
+
+class ClusterSnapshot:
+    __slots__ = (
+        "version", "fetched_at", "ids", "names", "colors", "counts", "percentages", "total",
+        "metrics", "level_names", "levels", "descriptions", "_positions",
+    )
+
+    def __init__(self, version, ids, names, counts, percentages, metrics, level_names, levels, descriptions,
+                 fetched_at=None):
+        setattr_ = super().__setattr__
+        setattr_("version", version)
+        setattr_("fetched_at", fetched_at or time.time())
+        setattr_("ids", tuple(ids))
+        setattr_("names", tuple(names))
+        setattr_("colors", tuple(CLUSTER_COLORS[cid % len(CLUSTER_COLORS)] for cid in ids))
+        setattr_("counts", _readonly(counts, np.int64))
+        setattr_("percentages", _readonly(percentages, np.float64))
+        setattr_("total", int(self.counts.sum()))
+        setattr_("metrics", _readonly(metrics, np.float64))
+        setattr_("level_names", tuple(level_names))
+        setattr_("levels", _readonly(levels, np.float64))
+        setattr_("descriptions", tuple(MappingProxyType(dict(d)) for d in descriptions))
+        setattr_("_positions", MappingProxyType({cid: i for i, cid in enumerate(self.ids)}))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ClusterSnapshot is immutable")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"ClusterSnapshot(version={self.version!r}, clusters={len(self)}, users={self.total})"
+
+    @classmethod
+    def from_api(cls, clusters):
+        """`clusters` : dict {"0": {name, count, percentage, profile, description}} de /clusters."""
+        version = hashlib.sha1(json.dumps(clusters, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        ids = sorted(int(cid) for cid in clusters)
+        entries = [clusters[str(cid)] for cid in ids]
+
+        level_names = []
+        for entry in entries:
+            for level in entry.get("description", {}).get("repartition_niveaux", {}):
+                if level not in level_names:
+                    level_names.append(level)
+        levels = np.zeros((len(ids), len(level_names)))
+        for i, entry in enumerate(entries):
+            for level, share in entry.get("description", {}).get("repartition_niveaux", {}).items():
+                levels[i, level_names.index(level)] = _parse_percentage(share)
+
+        return cls(
+            version,
+            ids,
+            [entry["name"] for entry in entries],
+            [entry["count"] for entry in entries],
+            [entry.get("percentage", 0) for entry in entries],
+            [[entry.get("profile", {}).get(key) or 0 for key in PROFILE_METRICS] for entry in entries],
+            level_names,
+            levels,
+            [entry.get("description", {}) for entry in entries],
+        )
+
+    def position(self, cluster_id):
+        return self._positions[int(cluster_id)]
+
+    def name(self, cluster_id):
+        return self.names[self.position(cluster_id)]
+
+    def color(self, cluster_id):
+        return self.colors[self.position(cluster_id)]
+
+    def count(self, cluster_id):
+        return int(self.counts[self.position(cluster_id)])
+
+    def percentage(self, cluster_id):
+        return float(self.percentages[self.position(cluster_id)])
+
+    def description(self, cluster_id):
+        return self.descriptions[self.position(cluster_id)]
+
+    def metric(self, cluster_id, key):
+        return float(self.metrics[self.position(cluster_id), PROFILE_METRICS.index(key)])
+
+    def population_moments(self, users=None):
+        """(moyenne, écart-type, origine) de chaque métrique sur la population.
+        Avec `users` (instantané user_snapshot), mesurés sur les utilisateurs : USER_MOMENTS.
+        Sinon la moyenne des profils pondérée par effectif et un écart-type de 1 (distances
+        non réduites) : UNSCALED. L'écart entre centroïdes n'est pas une dispersion
+        d'utilisateurs, il donnerait le plus de poids aux métriques qui séparent le moins."""
+        weights = self.counts / max(self.total, 1)
+        cluster_mean = weights @ self.metrics
+        if users is None or not len(users):
+            return cluster_mean, np.ones(len(PROFILE_METRICS)), UNSCALED
+        mean, scale = users.moments()
+        # Métrique absente de l'instantané : moyenne des clusters, non réduite
+        mean = np.where(np.isnan(mean), cluster_mean, mean)
+        scale = np.where(np.isnan(scale) | (scale <= 0), 1.0, scale)
+        return mean, scale, USER_MOMENTS
+
+    def level_distribution(self, cluster_id):
+        """(niveaux, pourcentages) du cluster, sans les niveaux absents."""
+        row = self.levels[self.position(cluster_id)]
+        present = np.nonzero(row)[0]
+        return [self.level_names[i] for i in present], row[present]
@@ -0,0 +1,151 @@
+# cohorts.py
+# Analyse d'une cohorte d'utilisateurs (CSV d'identifiants) : profils récupérés en
+# parallèle avec un nombre borné de requêtes, mis en cache et réessayés en cas d'erreur
+# passagère, puis agrégés au fil de l'eau.
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from pipeline import iter_batch
+
+COHORT_WORKERS = 8
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 0.5
+REQUEST_TIMEOUT = 20
+CACHE_TTL = 600
+CACHE_SIZE = 50000
+
+DEGREE_LABELS = {1: "Primary", 2: "Secondary", 3: "Trainer"}
+EXPERIENCE_BUCKETS = [(0, 2, "0-2 years"), (3, 5, "3-5 years"), (6, 10, "6-10 years"), (11, 20, "11-20 years")]
+# Colonnes de profile_row(), dans l'ordre de l'export
+PROFILE_FIELDS = ["user_id", "cluster_id", "cluster_name", "anciennete", "degre", "academie", "niveaux_enseignes"]
+
+
+class ProfileNotFound(Exception):
+    pass
+
+
+def read_user_ids(file):
+    """Identifiants uniques (ordre conservé) de la colonne `user_id`, ou de la première colonne."""
+    frame = pd.read_csv(file)
+    if pd.notna(pd.to_numeric(str(frame.columns[0]).strip(), errors="coerce")):
+        # Pas d'en-tête : le premier identifiant a été pris pour un nom de colonne
+        file.seek(0)
+        frame = pd.read_csv(file, header=None)
+    column = "user_id" if "user_id" in frame.columns else frame.columns[0]
+    ids = pd.to_numeric(frame[column], errors="coerce").dropna().astype(int)
+    return ids.drop_duplicates().tolist()
+
+
+class ProfileFetcher:
+    """Récupère /user/{id}/profile ; partagé par les sessions (cache commun, pool de connexions)."""
+
+    def __init__(self, api_base_url, workers=COHORT_WORKERS):
+        self.api_base_url = api_base_url
+        self.workers = workers
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=workers))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=workers))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fetch(self, user_id):
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached and time.time() - cached[0] < CACHE_TTL:
+                self._cache.move_to_end(user_id)
+                return cached[1]
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                response = self.session.get(f"{self.api_base_url}/user/{user_id}/profile", timeout=REQUEST_TIMEOUT)
+                if response.status_code == 404:
+                    raise ProfileNotFound(f"User {user_id} not found")
+                # Erreurs serveur et limitation de débit : on réessaie
+                if response.status_code == 429 or response.status_code >= 500:
+                    response.raise_for_status()
+                result = response.json()
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError):
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                time.sleep(BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        if not result.get("success"):
+            raise ProfileNotFound(result.get("error", f"User {user_id} not found"))
+
+        data = result["data"]
+        with self._lock:
+            self._cache[user_id] = (time.time(), data)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return data
+
+    def iter_profiles(self, user_ids):
+        """Génère (user_id, profil, erreur) dans l'ordre d'arrivée."""
+        yield from iter_batch(user_ids, self.fetch, max_workers=self.workers)
+
+
+def experience_bucket(years):
+    if years is None:
+        return "Not specified"
+    for low, high, label in EXPERIENCE_BUCKETS:
+        if low <= years <= high:
+            return label
+    return "20+ years"
+
+
+def profile_row(data):
+    """Ligne à plat d'un profil, pour les agrégats et l'export."""
+    profile = data.get("profile", {})
+    cluster = data.get("cluster", {})
+    niveaux = profile.get("niveaux_enseignes") or []
+    return {
+        "user_id": data.get("user_id"),
+        "cluster_id": cluster.get("id"),
+        "cluster_name": cluster.get("name"),
+        "anciennete": profile.get("anciennete"),
+        "degre": profile.get("degre"),
+        "academie": profile.get("academie"),
+        "niveaux_enseignes": ", ".join(niveaux) if isinstance(niveaux, list) else niveaux,
+    }
+
+
+class CohortAggregator:
+    """Compteurs mis à jour à chaque profil reçu : mix de clusters, ancienneté, degré, académie."""
+
+    def __init__(self):
+        self.clusters = Counter()
+        self.experience = Counter()
+        self.levels = Counter()
+        self.academies = Counter()
+        self.total = 0
+
+    def add(self, row):
+        self.total += 1
+        self.clusters[row["cluster_name"] or "Unknown"] += 1
+        self.experience[experience_bucket(row["anciennete"])] += 1
+        self.levels[DEGREE_LABELS.get(row["degre"], "Not specified")] += 1
+        self.academies[row["academie"] or "Not specified"] += 1
+
+    @staticmethod
+    def _series(counter, name, limit=None):
+        items = counter.most_common(limit)
+        return pd.Series(dict(items), name=name, dtype="int64")
+
+    def cluster_mix(self):
+        return self._series(self.clusters, "Users")
+
+    def experience_mix(self):
+        order = [label for _, _, label in EXPERIENCE_BUCKETS] + ["20+ years", "Not specified"]
+        return pd.Series({label: self.experience[label] for label in order if self.experience[label]}, name="Users", dtype="int64")
+
+    def level_mix(self):
+        return self._series(self.levels, "Users")
+
+    def top_academies(self, limit=10):
+        return self._series(self.academies, "Users", limit)
@@ -0,0 +1,102 @@
+# exports.py
+# Export CSV / Parquet des tableaux d'analyse : les lignes sont consommées par paquets et
+# écrites au fil de l'eau dans un fichier temporaire (en mémoire tant qu'il est petit,
+# sur disque au-delà). Aucun DataFrame complet n'est construit. Parquet nécessite pyarrow.
+import csv
+import io
+import tempfile
+from itertools import islice
+
+from clusters import PROFILE_METRICS
+
+CHUNK_ROWS = 5000
+SPOOL_THRESHOLD = 8 * 1024 * 1024
+
+CSV = "csv"
+PARQUET = "parquet"
+MIME_TYPES = {CSV: "text/csv", PARQUET: "application/vnd.apache.parquet"}
+
+RECOMMENDATION_FIELDS = ["rank", "id", "title", "type", "is_priority_challenge", "priority_challenge",
+                         "reason", "source", "url"]
+CLUSTER_FIELDS = ["cluster_id", "name", "count", "percentage", *PROFILE_METRICS,
+                  "activite_generale", "engagement_email", "usage_contenu", "diversite_thematique", "niveau_principal"]
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_csv(rows, fieldnames, out, chunk_rows=CHUNK_ROWS):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = csv.DictWriter(text, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in _chunks(rows, chunk_rows):
+        writer.writerows(chunk)
+    text.detach()  # `out` reste ouvert pour le téléchargement
+
+
+def write_parquet(rows, fieldnames, out, chunk_rows=CHUNK_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    schema = None
+    try:
+        for chunk in _chunks(rows, chunk_rows):
+            columns = {name: [row.get(name) for row in chunk] for name in fieldnames}
+            if schema is None:
+                # Schéma déduit du premier paquet ; une colonne encore vide devient du texte
+                inferred = pa.Table.from_pydict(columns).schema
+                schema = pa.schema([
+                    pa.field(field.name, pa.string() if pa.types.is_null(field.type) else field.type)
+                    for field in inferred
+                ])
+                writer = pq.ParquetWriter(out, schema, compression="zstd")
+            # Un row group par paquet : la mémoire reste bornée à CHUNK_ROWS lignes
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_rows(rows, fieldnames, fmt=CSV, chunk_rows=CHUNK_ROWS):
+    """Fichier temporaire (rembobiné) contenant `rows` (itérable de dicts) au format demandé."""
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_THRESHOLD)
+    if fmt == PARQUET:
+        write_parquet(rows, fieldnames, out, chunk_rows)
+    else:
+        write_csv(rows, fieldnames, out, chunk_rows)
+    out.seek(0)
+    return out
+
+
+def recommendation_rows(contents, **context):
+    """Lignes d'une liste de recommandations ; `context` (user_id, cluster_id...) est ajouté à chaque ligne."""
+    for rank, content in enumerate(contents, 1):
+        yield {**context, "rank": rank, **{field: content.get(field) for field in RECOMMENDATION_FIELDS[1:]}}
+
+
+def cluster_rows(snapshot):
+    for i, cluster_id in enumerate(snapshot.ids):
+        description = snapshot.descriptions[i]
+        yield {
+            "cluster_id": cluster_id,
+            "name": snapshot.names[i],
+            "count": int(snapshot.counts[i]),
+            "percentage": float(snapshot.percentages[i]),
+            **{metric: float(snapshot.metrics[i, j]) for j, metric in enumerate(PROFILE_METRICS)},
+            **{field: description.get(field) for field in CLUSTER_FIELDS[4 + len(PROFILE_METRICS):]},
+        }
@@ -0,0 +1,149 @@
+# extraction.py
+# Registre des backends d'extraction de texte, par type de fichier.
+# Chaque backend est noté en vitesse et en fidélité (1 à 3) ; la sélection se fait
+# selon la préférence demandée ("speed" / "quality") et la taille du fichier.
+import zipfile
+from xml.etree import ElementTree
+
+import pdfplumber
+import mammoth
+
+from uploads import decode_stream, file_size
+
+SPEED = "speed"
+QUALITY = "quality"
+
+# Au-delà de cette taille, un PDF passe par le backend rapide même en mode "quality"
+# (pdfplumber analyse chaque caractère : trop lent sur les gros documents)
+LARGE_PDF_BYTES = 8 * 1024 * 1024
+
+# Séparateur de pages des PDF : saut de page (\f) entre deux lignes vides, pour que le
+# prétraitement repère les en-têtes / pieds de page répétés en bord de page
+PAGE_BREAK = "\n\n\f\n\n"
+
+_BACKENDS = {}
+
+
+def register_backend(suffixes, name, speed, quality):
+    """Déclare une fonction d'extraction `func(file) -> str` pour une liste d'extensions."""
+    def decorator(func):
+        for suffix in suffixes:
+            _BACKENDS.setdefault(suffix, []).append({
+                "name": name,
+                "speed": speed,
+                "quality": quality,
+                "extract": func,
+            })
+        return func
+    return decorator
+
+
+def supported_suffixes():
+    return sorted(_BACKENDS)
+
+
+def candidate_backends(suffix, preference=QUALITY, size=None):
+    """Backends utilisables pour `suffix`, du plus adapté au moins adapté."""
+    backends = _BACKENDS.get(suffix)
+    if not backends:
+        raise ValueError("Unsupported file format")
+
+    if suffix == "pdf" and size is not None and size > LARGE_PDF_BYTES:
+        preference = SPEED
+
+    if preference == SPEED:
+        key = lambda b: (b["speed"], b["quality"])
+    else:
+        key = lambda b: (b["quality"], b["speed"])
+    return sorted(backends, key=key, reverse=True)
+
+
+def select_backend(suffix, preference=QUALITY, size=None):
+    return candidate_backends(suffix, preference, size)[0]["name"]
+
+
+def extract_text(uploaded_file, suffix, preference=QUALITY):
+    """Extrait le texte avec le meilleur backend disponible, en repliant sur le suivant
+    si une dépendance optionnelle manque ou si le backend ne renvoie rien."""
+    backends = candidate_backends(suffix, preference, file_size(uploaded_file))
+
+    last_error = None
+    for backend in backends:
+        uploaded_file.seek(0)
+        try:
+            text = backend["extract"](uploaded_file)
+        except ImportError as e:
+            last_error = e
+            continue
+        if text.strip() or backend is backends[-1]:
+            return text
+
+    if last_error is not None:
+        raise last_error
+    return ""
+
+
+# ==================== TXT / MD ====================
+
+@register_backend(["txt", "md"], "plain_text", speed=3, quality=3)
+def _extract_plain_text(uploaded_file):
+    return decode_stream(uploaded_file)
+
+
+# ==================== PDF ====================
+
+@register_backend(["pdf"], "pdfium_text", speed=3, quality=1)
+def _extract_pdf_pdfium(uploaded_file):
+    # pypdfium2 est installé avec pdfplumber : extraction native, sans analyse de mise en page
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(uploaded_file)
+    try:
+        pages = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range().replace("\r\n", "\n"))
+            textpage.close()
+            page.close()
+        return PAGE_BREAK.join(pages)
+    finally:
+        pdf.close()
+
+
+@register_backend(["pdf"], "pdfplumber_layout", speed=1, quality=3)
+def _extract_pdf_pdfplumber(uploaded_file):
+    with pdfplumber.open(uploaded_file) as pdf:
+        return PAGE_BREAK.join([page.extract_text() or "" for page in pdf.pages])
+
+
+# ==================== DOCX ====================
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+@register_backend(["docx"], "docx_xml", speed=3, quality=1)
+def _extract_docx_xml(uploaded_file):
+    # Lecture en flux de word/document.xml : on ne garde que le paragraphe courant en mémoire
+    paragraphs = []
+    current = []
+    with zipfile.ZipFile(uploaded_file) as archive:
+        with archive.open("word/document.xml") as document:
+            for _, element in ElementTree.iterparse(document, events=("end",)):
+                tag = element.tag
+                if tag == _W + "t":
+                    current.append(element.text or "")
+                elif tag == _W + "tab":
+                    current.append("\t")
+                elif tag in (_W + "br", _W + "cr"):
+                    current.append("\n")
+                elif tag == _W + "p":
+                    paragraphs.append("".join(current))
+                    current = []
+                    element.clear()
+    return "\n\n".join(p for p in paragraphs if p.strip())
+
+
+@register_backend(["docx"], "mammoth_markdown", speed=1, quality=3)
+def _extract_docx_mammoth(uploaded_file):
+    result = mammoth.convert_to_markdown(uploaded_file)
+    return result.value
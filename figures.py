@@ -0,0 +1,185 @@
+# figures.py
+# Cache des graphiques Plotly des pages clusters. Les specs sérialisées (dicts) sont
+# conservées par (graphique, version du snapshot, paramètres) : un rerun ne reconstruit
+# plus les figures. Le surlignage propre à un utilisateur est appliqué sur une copie
+# légère de la spec de base.
+import threading
+from collections import OrderedDict
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+MAX_FIGURES = 128
+HIGHLIGHT_COLOR = '#FFD700'
+
+RADAR_CATEGORIES = ["General Activity", "Email Engagement", "Content Usage", "Thematic Diversity", "Experience"]
+
+_figures = OrderedDict()
+_lock = threading.Lock()
+
+
+def distribution_pie(snapshot):
+    fig = px.pie(
+        values=snapshot.counts,
+        names=snapshot.names,
+        color=snapshot.names,
+        color_discrete_map=dict(zip(snapshot.names, snapshot.colors)),
+        hole=0.4,
+        labels={'names': 'Cluster', 'values': 'Number of users'}
+    )
+    # Légende sur le côté, pas de texte dans les parts
+    fig.update_layout(
+        legend=dict(orientation="v", yanchor="middle", y=0.5, xanchor="right", x=1.1),
+        margin=dict(t=30, b=10, l=10, r=120)
+    )
+    fig.update_traces(textposition='none')
+    return fig
+
+
+def levels_pie(snapshot, cluster_id):
+    level_names, level_values = snapshot.level_distribution(cluster_id)
+    fig = px.pie(
+        values=level_values,
+        names=level_names,
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+        labels={'label': 'Level', 'value': 'Percentage'}
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label', textfont_size=11)
+    fig.update_layout(margin=dict(t=10, b=10, l=10, r=10), height=300)
+    return fig
+
+
+def profile_radar(snapshot, cluster_id):
+    values = [
+        snapshot.metric(cluster_id, "activity_level") / 2 * 10,  # Échelle 0-10
+        snapshot.metric(cluster_id, "email_engagement") / 2 * 10,
+        snapshot.metric(cluster_id, "content_usage") / 2 * 10,
+        snapshot.metric(cluster_id, "topic_count") / 8 * 10,  # Maximum autour de 8
+        min(snapshot.metric(cluster_id, "anciennete") / 20 * 10, 10)  # Plafonné à 10
+    ]
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(
+        r=values,
+        theta=RADAR_CATEGORIES,
+        fill='toself',
+        name=snapshot.name(cluster_id),
+        line_color=snapshot.color(cluster_id)
+    ))
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 10],
+                tickvals=[0, 2, 4, 6, 8, 10],
+                ticktext=["0", "2", "4", "6", "8", "10"]
+            )
+        ),
+        showlegend=False,
+        height=400,
+        margin=dict(t=30, b=30, l=80, r=80)
+    )
+    return fig
+
+
+def cluster_position_bar(snapshot):
+    # Base sans utilisateur : voir `cluster_position_figure` pour le surlignage
+    fig = go.Figure(data=[
+        go.Bar(
+            x=snapshot.names,
+            y=snapshot.counts,
+            marker_color=list(snapshot.colors),
+            text=[""] * len(snapshot),
+            textposition="auto",
+            textfont=dict(size=12, color="white")
+        )
+    ])
+    fig.update_layout(
+        xaxis_title="User Clusters",
+        yaxis_title="Number of Users",
+        showlegend=False,
+        height=400,
+        xaxis={'categoryorder': 'total descending'}  # Tri par taille
+    )
+    # Pourcentages au-dessus des barres
+    for i, percentage in enumerate(snapshot.percentages):
+        fig.add_annotation(
+            x=snapshot.names[i],
+            y=snapshot.counts[i],
+            text=f"{percentage:.1f}%",
+            showarrow=False,
+            yshift=10,
+            font=dict(size=10, color="gray")
+        )
+    return fig
+
+
+BUILDERS = {
+    "distribution_pie": distribution_pie,
+    "levels_pie": levels_pie,
+    "profile_radar": profile_radar,
+    "cluster_position_bar": cluster_position_bar,
+}
+
+
+def figure_spec(kind, snapshot, **params):
+    """Spec sérialisée du graphique, construite une fois par version du snapshot et paramètres.
+    La spec est partagée : ne pas la modifier, passer par `get_figure` ou une copie."""
+    key = (kind, snapshot.version, tuple(sorted(params.items())))
+    with _lock:
+        spec = _figures.get(key)
+        if spec is not None:
+            _figures.move_to_end(key)
+            return spec
+
+    spec = BUILDERS[kind](snapshot, **params).to_plotly_json()
+    with _lock:
+        _figures[key] = spec
+        while len(_figures) > MAX_FIGURES:
+            _figures.popitem(last=False)
+    return spec
+
+
+def _from_spec(spec):
+    # La spec provient d'une figure déjà validée : la revalider coûterait plus que de la construire
+    return go.Figure(spec, _validate=False)
+
+
+def get_figure(kind, snapshot, **params):
+    return _from_spec(figure_spec(kind, snapshot, **params))
+
+
+def cluster_position_figure(snapshot, cluster_id, user_id):
+    """Barres des clusters avec celui de l'utilisateur surligné : seules les couleurs, le
+    texte et le titre changent par rapport à la spec de base mise en cache."""
+    spec = figure_spec("cluster_position_bar", snapshot)
+    position = snapshot.position(cluster_id)
+
+    bar = dict(spec["data"][0])
+    colors = list(snapshot.colors)
+    colors[position] = HIGHLIGHT_COLOR
+    text = [""] * len(snapshot)
+    text[position] = "👤 This User"
+    bar["marker"] = {**bar.get("marker", {}), "color": colors}
+    bar["text"] = text
+
+    layout = {**spec["layout"], "title": {"text": f"User {user_id} Position Across All Clusters"}}
+    return _from_spec({"data": [bar], "layout": layout})
+
+
+def heatmap(table, colorbar_title, colorscale="Blues", text_format=".0f", height=None):
+    """Carte de chaleur d'un tableau (lignes × colonnes) ; les cases vides (NaN) restent blanches."""
+    fig = go.Figure(data=go.Heatmap(
+        z=table.to_numpy(dtype=float),
+        x=[str(column) for column in table.columns],
+        y=[str(index) for index in table.index],
+        colorscale=colorscale,
+        colorbar=dict(title=colorbar_title),
+        texttemplate=f"%{{z:{text_format}}}",
+        hoverongaps=False,
+    ))
+    fig.update_layout(
+        height=height or max(400, 22 * len(table) + 120),
+        yaxis=dict(autorange="reversed"),
+        margin=dict(l=10, r=10, t=30, b=10),
+    )
+    return fig
@@ -0,0 +1,136 @@
+# history.py
+# Historique des classifications dans SQLite, avec index plein texte FTS5 sur le texte
+# source : recherche par mot-clé, thème et plage de confiance, paginée.
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = "classification_history.db"
+PAGE_SIZE = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    source_name TEXT,
+    origin TEXT,
+    topic TEXT,
+    confidence REAL,
+    result_json TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_classifications_topic ON classifications(topic, confidence);
+CREATE INDEX IF NOT EXISTS idx_classifications_created ON classifications(created_at);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS classifications_fts USING fts5(
+    text, source_name,
+    content='classifications', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS classifications_ai AFTER INSERT ON classifications BEGIN
+    INSERT INTO classifications_fts(rowid, text, source_name) VALUES (new.id, new.text, new.source_name);
+END;
+CREATE TRIGGER IF NOT EXISTS classifications_ad AFTER DELETE ON classifications BEGIN
+    INSERT INTO classifications_fts(classifications_fts, rowid, text, source_name)
+    VALUES ('delete', old.id, old.text, old.source_name);
+END;
+"""
+
+
+def _fts_query(keywords):
+    # Chaque mot devient un terme entre guillemets : pas d'injection de syntaxe FTS5
+    return " ".join('"' + word.replace('"', '""') + '"' for word in keywords.split())
+
+
+class ClassificationHistory:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+        try:
+            connection.executescript(_FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite compilé sans FTS5 : repli sur LIKE
+            self.full_text = False
+
+    def _connection(self):
+        # Une connexion par thread (les sessions Streamlit tournent dans des threads distincts)
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def record(self, text, data, source_name=None, origin=None):
+        topic = data.get("topic_principal", {})
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO classifications (created_at, source_name, origin, topic, confidence, result_json, text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), source_name, origin, topic.get("label"), topic.get("confidence"),
+                 json.dumps(data, ensure_ascii=False), text),
+            )
+        return cursor.lastrowid
+
+    def search(self, keywords=None, topic=None, min_confidence=None, max_confidence=None,
+               limit=PAGE_SIZE, offset=0):
+        """Renvoie (lignes, total). Les lignes portent un extrait `snippet` autour des mots trouvés."""
+        conditions = []
+        params = []
+        source = "classifications c"
+        snippet = "substr(c.text, 1, 200)"
+
+        if keywords and keywords.strip():
+            if self.full_text:
+                source += " JOIN classifications_fts f ON f.rowid = c.id"
+                conditions.append("classifications_fts MATCH ?")
+                params.append(_fts_query(keywords))
+                snippet = "snippet(classifications_fts, 0, '**', '**', '…', 16)"
+            else:
+                for word in keywords.split():
+                    conditions.append("c.text LIKE ?")
+                    params.append(f"%{word}%")
+        if topic:
+            conditions.append("c.topic = ?")
+            params.append(topic)
+        if min_confidence is not None:
+            conditions.append("c.confidence >= ?")
+            params.append(min_confidence)
+        if max_confidence is not None:
+            conditions.append("c.confidence <= ?")
+            params.append(max_confidence)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        connection = self._connection()
+        total = connection.execute(f"SELECT COUNT(*) FROM {source} {where}", params).fetchone()[0]
+        rows = connection.execute(
+            f"SELECT c.id, c.created_at, c.source_name, c.origin, c.topic, c.confidence, {snippet} AS snippet "
+            f"FROM {source} {where} ORDER BY c.created_at DESC LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def get(self, record_id):
+        row = self._connection().execute(
+            "SELECT * FROM classifications WHERE id = ?", (record_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["result"] = json.loads(record.pop("result_json") or "{}")
+        return record
+
+    def topics(self):
+        rows = self._connection().execute(
+            "SELECT DISTINCT topic FROM classifications WHERE topic IS NOT NULL ORDER BY topic"
+        ).fetchall()
+        return [row[0] for row in rows]
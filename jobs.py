@@ -0,0 +1,147 @@
+# jobs.py
+# Tâches longues exécutées en arrière-plan, hors des threads de l'interface Streamlit.
+# Chaque tâche a un identifiant : une page peut la retrouver après un rerun, une
+# navigation ou un rechargement, suivre sa progression et l'annuler.
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import requests
+
+RECOMPUTE = "recompute"
+RECOMPUTE_TIMEOUT = 1800
+# Durée supposée d'un recalcul tant qu'aucun n'a abouti ; ensuite, moyenne des derniers
+DEFAULT_RECOMPUTE_SECONDS = 180
+MAX_JOBS = 20
+
+# Étapes du recalcul côté backend, avec leur part estimée de la durée totale.
+# L'API ne publie pas sa progression : l'étape courante est estimée à partir du temps écoulé.
+RECOMPUTE_STAGES = [
+    ("load", "Loading user data", 0.15),
+    ("features", "Processing behavioral features", 0.20),
+    ("kmeans", "Running K-means clustering", 0.35),
+    ("reassign", "Reassigning users to clusters", 0.20),
+    ("statistics", "Updating cluster statistics", 0.10),
+]
+
+RUNNING, SUCCEEDED, FAILED, CANCELLED = "running", "succeeded", "failed", "cancelled"
+
+
+class Job:
+    def __init__(self, kind, expected_seconds, stages=RECOMPUTE_STAGES):
+        self.id = uuid.uuid4().hex[:8]
+        self.kind = kind
+        self.status = RUNNING
+        self.stages = stages
+        self.expected_seconds = expected_seconds
+        self.started_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.thread = None
+
+    @property
+    def done(self):
+        return self.status != RUNNING
+
+    @property
+    def busy(self):
+        # Une tâche annulée peut encore occuper le backend jusqu'au retour de sa requête
+        return self.thread is not None and self.thread.is_alive()
+
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    def progress(self):
+        if self.status == SUCCEEDED:
+            return 1.0
+        # Plafonnée à 99 % : seule la réponse du backend termine la tâche
+        return min(self.elapsed() / self.expected_seconds, 0.99)
+
+    def stage(self):
+        """(clé, libellé) de l'étape estimée en cours."""
+        progress = self.progress()
+        reached = 0.0
+        for key, label, share in self.stages:
+            reached += share
+            if progress < reached:
+                return key, label
+        return self.stages[-1][:2]
+
+    def eta(self):
+        return 0 if self.done else max(self.expected_seconds - self.elapsed(), 0)
+
+    def cancel(self):
+        # Le backend n'expose pas d'annulation : la tâche est détachée et son résultat ignoré
+        if self.status == RUNNING:
+            self.status = CANCELLED
+            self.finished_at = time.time()
+
+
+class JobManager:
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._durations = deque(maxlen=5)
+        self._listeners = []
+        # Incrémenté à chaque recalcul publié : sert de version aux données de clusters
+        self.generation = 0
+
+    def subscribe(self, callback):
+        """`callback(job)` est appelé (depuis le thread de la tâche) quand un recalcul aboutit."""
+        self._listeners.append(callback)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, kind=RECOMPUTE):
+        with self._lock:
+            return next((job for job in reversed(self._jobs.values()) if job.kind == kind and job.busy), None)
+
+    def start_recompute(self, api_base_url):
+        """Lance le recalcul des clusters, ou renvoie celui déjà en cours."""
+        with self._lock:
+            for job in reversed(self._jobs.values()):
+                if job.kind == RECOMPUTE and job.busy:
+                    if job.status == CANCELLED:
+                        raise RuntimeError("A cancelled recompute is still finishing on the backend")
+                    return job
+
+            expected = sum(self._durations) / len(self._durations) if self._durations else DEFAULT_RECOMPUTE_SECONDS
+            job = Job(RECOMPUTE, expected)
+            self._jobs[job.id] = job
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+
+        job.thread = threading.Thread(target=self._run_recompute, args=(job, api_base_url), daemon=True)
+        job.thread.start()
+        return job
+
+    def _run_recompute(self, job, api_base_url):
+        try:
+            response = requests.post(f"{api_base_url}/clusters/recompute", timeout=RECOMPUTE_TIMEOUT)
+            response.raise_for_status()
+            result = response.json()
+            if not result.get("success"):
+                raise RuntimeError(result.get("error") or "Recompute failed")
+        except Exception as e:
+            if job.status == RUNNING:
+                job.error = str(e)
+                job.status = FAILED
+                job.finished_at = time.time()
+            return
+
+        if job.status != RUNNING:
+            return  # annulée entre-temps : rien n'est publié
+        job.finished_at = time.time()
+        self._durations.append(job.finished_at - job.started_at)
+        job.result = result.get("cluster_distribution", {})
+        self.generation += 1
+        # Les caches sont invalidés avant que la tâche n'apparaisse terminée aux pages
+        try:
+            for callback in self._listeners:
+                callback(job)
+        finally:
+            job.status = SUCCEEDED
@@ -0,0 +1,109 @@
+# lookups.py
+# Historique des consultations d'une session (page User Analytics) : les profils récents et
+# les données dérivées pour l'affichage restent en mémoire, avec une navigation
+# précédent / suivant comme dans un navigateur. Taille et ancienneté sont bornées.
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = 20
+MAX_AGE_SECONDS = 15 * 60
+
+
+class LookupHistory:
+    """Une instance par session (st.session_state) : pas de verrou nécessaire."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_age=MAX_AGE_SECONDS):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # clé -> (enregistré le, valeur), de la moins à la plus récemment consultée
+        self._entries = OrderedDict()
+        self._trail = []
+        self._cursor = -1
+
+    def __len__(self):
+        self._evict()
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def _evict(self):
+        # L'âge compte depuis la récupération, pas depuis la dernière consultation :
+        # une donnée trop ancienne doit être rechargée même si on la regarde souvent
+        now = time.time()
+        for key in [key for key, (stored_at, _) in self._entries.items() if now - stored_at > self.max_age]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if all(key in self._entries for key in self._trail):
+            return
+
+        # Le parcours ne garde que les clés encore en mémoire, sans doublons consécutifs ;
+        # le curseur reste sur l'entrée affichée, ou sur la précédente encore disponible
+        trail, cursor = [], -1
+        for i, key in enumerate(self._trail):
+            if key in self._entries and (not trail or trail[-1] != key):
+                trail.append(key)
+            if i == self._cursor:
+                cursor = len(trail) - 1
+        self._trail = trail
+        self._cursor = max(cursor, 0) if trail else -1
+
+    def get(self, key):
+        self._evict()
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def update(self, key, value):
+        """Remplace la valeur d'une entrée sans changer son ancienneté ni la navigation."""
+        if key in self._entries:
+            self._entries[key] = (self._entries[key][0], value)
+
+    def visit(self, key, value=None):
+        """Affiche `key` : enregistre `value` si elle est fournie, sinon réutilise la valeur
+        en mémoire. Comme dans un navigateur, les pages « suivantes » sont abandonnées."""
+        if value is not None:
+            self._entries[key] = (time.time(), value)
+        elif key not in self._entries:
+            raise KeyError(key)
+        self._entries.move_to_end(key)
+
+        if not self._trail or self._trail[self._cursor] != key:
+            del self._trail[self._cursor + 1:]
+            self._trail.append(key)
+            self._cursor = len(self._trail) - 1
+        self._evict()
+        return self.get(key)
+
+    def can_go_back(self):
+        self._evict()
+        return self._cursor > 0
+
+    def can_go_forward(self):
+        self._evict()
+        return 0 <= self._cursor < len(self._trail) - 1
+
+    def back(self):
+        if self.can_go_back():
+            self._cursor -= 1
+        return self.current()
+
+    def forward(self):
+        if self.can_go_forward():
+            self._cursor += 1
+        return self.current()
+
+    def current(self):
+        """(clé, valeur) de l'entrée affichée, ou None."""
+        self._evict()
+        if self._cursor < 0:
+            return None
+        key = self._trail[self._cursor]
+        self._entries.move_to_end(key)
+        return key, self._entries[key][1]
+
+    def recent(self):
+        """[(clé, âge en secondes)], de la plus à la moins récemment consultée."""
+        self._evict()
+        now = time.time()
+        return [(key, now - stored_at) for key, (stored_at, _) in reversed(self._entries.items())]
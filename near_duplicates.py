@@ -0,0 +1,135 @@
+# near_duplicates.py
+# Index MinHash / LSH local pour repérer les quasi-doublons d'un document : catalogue
+# ÊtrePROF et textes déjà classés. Les signatures sont calculées en NumPy vectorisé.
+import json
+import os
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+from classification_cache import normalize_text
+
+NUM_PERM = 128
+# 16 bandes de 8 lignes : seuil LSH ≈ (1/16)^(1/8) ≈ 0.71 de similarité de Jaccard
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# Au-delà de cette similarité, le thème connu du doublon est réutilisé tel quel
+REUSE_THRESHOLD = 0.9
+REPORT_THRESHOLD = 0.5
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_rng = np.random.RandomState(1945)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    words = normalize_text(text).split()
+    if len(words) < size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64)
+
+
+def minhash_signature(text):
+    hashes = shingle_hashes(text)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    # (shingles x permutations) en une passe ; le débordement uint64 est voulu
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+class NearDuplicateIndex:
+    def __init__(self):
+        # Tableau à capacité doublée : les ajouts restent en O(1) amorti
+        self._signatures = np.empty((64, NUM_PERM), dtype=np.uint64)
+        self._entries = []
+        self._buckets = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+        # Une seule écriture à la fois ; les requêtes ne sont pas bloquées pendant la compression
+        self._save_lock = threading.Lock()
+        self._saved = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_keys(self, signature):
+        return [signature[b * ROWS:(b + 1) * ROWS].tobytes() for b in range(BANDS)]
+
+    def add(self, text, entry, signature=None):
+        """Indexe `text` ; `entry` est un dict libre (id, title, topic, source...)."""
+        if signature is None:
+            signature = minhash_signature(text)
+        with self._lock:
+            position = len(self._entries)
+            if position == len(self._signatures):
+                grown = np.empty((2 * position, NUM_PERM), dtype=np.uint64)
+                grown[:position] = self._signatures
+                self._signatures = grown
+            self._signatures[position] = signature
+            self._entries.append(entry)
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(position)
+
+    def query(self, text, threshold=REPORT_THRESHOLD, limit=5, signature=None):
+        """Renvoie les entrées similaires, triées, avec leur `similarity` estimée (0-1)."""
+        if signature is None:
+            signature = minhash_signature(text)
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            if not candidates:
+                return []
+            positions = np.fromiter(candidates, dtype=np.int64)
+            similarities = (self._signatures[positions] == signature).mean(axis=1)
+            entries = [self._entries[p] for p in positions]
+
+        order = np.argsort(-similarities)[:limit]
+        return [
+            {**entries[i], "similarity": float(similarities[i])}
+            for i in order
+            if similarities[i] >= threshold
+        ]
+
+    @property
+    def dirty(self):
+        """Des entrées ont été ajoutées depuis le dernier enregistrement (ou le chargement)."""
+        return len(self._entries) != self._saved
+
+    def save(self, path):
+        with self._save_lock:
+            with self._lock:
+                entries = list(self._entries)
+                signatures = self._signatures[:len(entries)].copy()
+            # Fichier temporaire propre à cet appel, remplacé atomiquement
+            fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(os.path.abspath(path)))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.savez_compressed(f, signatures=signatures, entries=np.array(json.dumps(entries, ensure_ascii=False)))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            self._saved = len(entries)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        if path and os.path.exists(path):
+            with np.load(path) as data:
+                signatures = data["signatures"]
+                entries = json.loads(str(data["entries"]))
+            for signature, entry in zip(signatures, entries):
+                index.add(None, entry, signature=signature)
+            index._saved = len(index)
+        return index
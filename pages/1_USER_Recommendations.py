@@ -1,5 +1,5 @@
 import streamlit as st
-from utils import call_api
+from utils import call_api, get_cluster_snapshot, get_assigner
 
 # Configuration de la page
 st.set_page_config(
@@ -180,6 +180,44 @@ if st.button("🎯 Get My Recommendations", type="primary", disabled=user_id is
                 - Contact support if the problem persists
                 """)
 
+# New users have no cluster yet: place them locally from a short self-assessment
+st.divider()
+with st.expander("🆕 New to ÊtrePROF? Find your profile without a user ID"):
+    snapshot = get_cluster_snapshot()
+    if not snapshot:
+        st.warning("Profiles are not available at the moment.")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            activity = st.select_slider("How often do you visit ÊtrePROF?", options=[0.0, 0.5, 1.0, 1.5, 2.0], value=1.0,
+                                        format_func=lambda x: {0.0: "Never", 0.5: "Rarely", 1.0: "Monthly", 1.5: "Weekly", 2.0: "Daily"}[x])
+            email = st.select_slider("Do you read our newsletters?", options=[0.0, 0.5, 1.0, 1.5, 2.0], value=1.0,
+                                     format_func=lambda x: {0.0: "Never", 0.5: "Rarely", 1.0: "Sometimes", 1.5: "Often", 2.0: "Always"}[x])
+            usage = st.select_slider("Do you use our contents in class?", options=[0.0, 0.5, 1.0, 1.5, 2.0], value=1.0,
+                                     format_func=lambda x: {0.0: "Never", 0.5: "Rarely", 1.0: "Sometimes", 1.5: "Often", 2.0: "Always"}[x])
+        with col2:
+            topics = st.slider("How many teaching topics interest you?", 0, 10, 3)
+            experience = st.slider("Years of teaching experience:", 0, 40, 5)
+
+        if st.button("🧭 Find My Profile"):
+            assigner = get_assigner(snapshot)
+            cluster_ids, _, confidence = assigner.assign([activity, email, usage, topics, experience])
+            cluster_id = int(cluster_ids[0])
+
+            st.markdown(f"""
+            <div style="background-color: {snapshot.color(cluster_id)}; color: white; padding: 0.8rem; border-radius: 5px;">
+                <h4 style="margin: 0;">Your profile: {snapshot.name(cluster_id)}</h4>
+            </div>
+            """, unsafe_allow_html=True)
+            st.caption(f"Match strength: {confidence[0]:.0%}")
+
+            response = call_api(f"/recommend/{cluster_id}")
+            if response and response.get("success"):
+                contents = [c for c in response["recommendations"].get("recommendations", []) if c.get('title') and c.get('title') != 'Untitled']
+                for i, content in enumerate(contents[:5], 1):
+                    st.markdown(f"**{i}. {content['title']}** ({content.get('type', 'N/A').replace('_', ' ')})"
+                                + (f" – [📖 Read]({content['url']})" if content.get('url') else ""))
+
 # Navigation
 st.divider()
 if st.button("🏠 Back to Home"):
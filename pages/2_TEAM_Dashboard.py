@@ -81,7 +81,7 @@ st.divider()
 st.markdown("### 📱 Quick Navigation")
 
 # Feature buttons
-col1, col2, col3, col4 = st.columns(4)
+col1, col2, col3, col4, col5 = st.columns(5)
 
 with col1:
     with st.container():
@@ -111,6 +111,13 @@ with col4:
         if st.button("View Recommendations", key="recommendations_btn", type="primary"):
             st.switch_page("pages/6_TEAM_Recommendations.py")
 
+with col5:
+    with st.container():
+        st.markdown("#### 🗺️ Academies & Levels")
+        st.markdown("Compare cluster mix and engagement by academy and teaching level.")
+        if st.button("View Academies", key="academies_btn", type="primary"):
+            st.switch_page("pages/7_TEAM_Academies.py")
+
 st.divider()
 
 # User Experience
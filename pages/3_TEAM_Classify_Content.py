@@ -1,6 +1,20 @@
 import streamlit as st
-from utils import call_api, convert_file_to_markdown
-import requests
+from utils import call_api, convert_file_to_markdown, convert_archive_to_markdown, get_setting, UPLOAD_SIZE_CAPS
+from archives import ArchiveLimitError
+import pandas as pd
+from uploads import MB
+from extraction import SPEED, QUALITY
+from classification import ClassificationError
+from classification_cache import ClassificationCache
+from preprocessing import TOKEN_BUDGET
+from near_duplicates import NearDuplicateIndex
+from similar_content import SimilarContentIndex
+from catalog import iter_catalog, content_text
+from pipeline import ClassificationPipeline, iter_batch
+from preclassifier import PreClassifier, AgreementTracker
+from history import ClassificationHistory, DEFAULT_PATH as HISTORY_PATH, PAGE_SIZE
+from datetime import datetime
+import time
 
 # Page configuration
 st.set_page_config(
@@ -28,11 +42,78 @@ st.markdown("""
 
 API_BASE_URL = st.secrets["api"]["API_URL"]
 
+
+@st.cache_resource
+def get_classification_cache():
+    # Shared by all sessions; optional on-disk copy via [classification] cache_dir in secrets.toml
+    return ClassificationCache(cache_dir=get_setting("classification", "cache_dir"))
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_model_version():
+    # None when the API exposes no version: the classification cache is then bypassed
+    status = call_api("/") or {}
+    version = status.get("model_version") or status.get("version")
+    return str(version) if version else None
+
+
+@st.cache_resource
+def get_duplicate_index():
+    # Persisted index of classified texts, seeded with the catalog export ([catalog] path) on first start
+    index = NearDuplicateIndex.load(get_setting("classification", "duplicate_index_path"))
+    if not len(index):
+        for content in iter_catalog(get_setting("catalog", "path")):
+            index.add(content_text(content), {
+                "id": content.get("id"),
+                "title": content.get("title", "Untitled"),
+                "topic": {"label": content["topic"]} if content.get("topic") else None,
+                "source": "catalog"
+            })
+    return index
+
+
+@st.cache_resource
+def get_similar_content_index():
+    # BM25 index of the catalog ([catalog] bm25_index_path): only contents added to the export since the last save are indexed
+    path = get_setting("catalog", "bm25_index_path")
+    index = SimilarContentIndex.load(path)
+    known_ids = index.content_ids()
+    added = 0
+    for content in iter_catalog(get_setting("catalog", "path")):
+        if str(content.get("id")) not in known_ids:
+            index.add(content.get("title"), content.get("text"), {
+                "id": content.get("id"),
+                "title": content.get("title", "Untitled"),
+                "type": content.get("type"),
+                "url": content.get("url")
+            })
+            added += 1
+    if added and path:
+        index.save(path)
+    return index
+
+
+@st.cache_resource
+def get_preclassifier():
+    # Local TF-IDF model trained offline (python preclassifier.py train ...); None if not configured
+    return PreClassifier.load(get_setting("classification", "preclassifier_path"))
+
+
+@st.cache_resource
+def get_agreement_tracker():
+    return AgreementTracker(get_setting("classification", "preclassifier_stats_path"))
+
+
+@st.cache_resource
+def get_history():
+    return ClassificationHistory(get_setting("classification", "history_path", HISTORY_PATH))
+
+
 # Title with icon
 st.markdown("# 📋 Content Classification")
 st.markdown("Analyze markdown content to identify themes and priority challenges.")
 
-tab_text, tab_file = st.tabs(["📋 Paste Text", "📂 Upload File"])
+tab_text, tab_file, tab_batch, tab_history = st.tabs(["📋 Paste Text", "📂 Upload File", "📚 Batch", "🕘 History"])
 
 markdown_content = ""
 
@@ -46,10 +127,60 @@ with tab_text:
         markdown_content = pasted_text.strip()
 
 with tab_file:
-    uploaded_file = st.file_uploader("Upload a file (TXT, PDF, DOCX, MD)", type=["txt", "pdf", "docx", "md"])
-    if uploaded_file is not None:
+    uploaded_file = st.file_uploader(
+        "Upload a file (TXT, PDF, DOCX, MD) or a ZIP bundle of them",
+        type=["txt", "pdf", "docx", "md", "zip"],
+        help="Max size: " + ", ".join(f"{suffix.upper()} {cap // MB} MB" for suffix, cap in UPLOAD_SIZE_CAPS.items())
+    )
+    # Classification only needs raw text: the fast backends skip layout analysis
+    extraction_mode = st.radio(
+        "Extraction mode:",
+        options=[SPEED, QUALITY],
+        format_func=lambda x: "⚡ Fast (text only)" if x == SPEED else "🧾 Faithful (layout / markdown)",
+        horizontal=True
+    )
+    if uploaded_file is not None and uploaded_file.name.lower().endswith(".zip"):
+        # Converted texts are kept per upload so reruns don't decompress the archive again
+        archive_key = (uploaded_file.file_id, extraction_mode)
+        archive = st.session_state.get("archive_docs")
+        if not archive or archive["key"] != archive_key:
+            docs = []
+            status = st.empty()
+            try:
+                for name, text, error in convert_archive_to_markdown(uploaded_file, preference=extraction_mode):
+                    docs.append({"name": name, "text": text, "error": error})
+                    status.caption(f"📦 {len(docs)} files read – last: {name}")
+            except ArchiveLimitError as e:
+                st.error(f"❌ Archive rejected: {e}")
+            except Exception as e:
+                st.error(f"❌ Error reading archive: {e}")
+            status.empty()
+            archive = {"key": archive_key, "docs": docs}
+            st.session_state["archive_docs"] = archive
+
+        converted = [d for d in archive["docs"] if d["text"]]
+        st.success(f"✅ {len(converted)} of {len(archive['docs'])} files extracted from archive")
+
+        with st.expander("📦 Archive contents"):
+            st.dataframe(pd.DataFrame([{
+                "File": d["name"],
+                "Characters": len(d["text"]) if d["text"] else 0,
+                "Status": "✅" if d["text"] else f"⏭️ {d['error'] or 'Empty'}"
+            } for d in archive["docs"]]), use_container_width=True, hide_index=True)
+
+        if converted:
+            selected_doc = st.selectbox(
+                "Document to analyze:",
+                options=range(len(converted)),
+                format_func=lambda i: converted[i]["name"]
+            )
+            markdown_content = converted[selected_doc]["text"]
+            with st.expander("🔍 Preview extracted content"):
+                st.code(markdown_content[:2000])
+
+    elif uploaded_file is not None:
         try:
-            markdown_content = convert_file_to_markdown(uploaded_file)
+            markdown_content = convert_file_to_markdown(uploaded_file, preference=extraction_mode)
             st.success("✅ File processed successfully")
             with st.expander("🔍 Preview extracted content"):
                 st.code(markdown_content[:2000])  # Preview max 2000 chars
@@ -57,6 +188,33 @@ with tab_file:
             st.error(f"❌ Error processing file: {e}")
             markdown_content = ""
 
+# Extracted text carries headers, page numbers, TOCs... trimmed before being sent to /classify
+with st.expander("🧹 Preprocessing options"):
+    preprocess_enabled = st.checkbox("Clean and trim content before classification", value=True)
+    token_budget = st.number_input(
+        "Token budget",
+        min_value=500,
+        max_value=50000,
+        value=int(get_setting("classification", "token_budget", TOKEN_BUDGET)),
+        step=500,
+        help="Most informative paragraphs are kept up to this number of words"
+    )
+
+
+def get_pipeline():
+    return ClassificationPipeline(
+        API_BASE_URL,
+        get_classification_cache(),
+        get_duplicate_index(),
+        get_model_version(),
+        token_budget=token_budget,
+        preprocess=preprocess_enabled,
+        duplicate_index_path=get_setting("classification", "duplicate_index_path"),
+        training_log_path=get_setting("classification", "training_log_path"),
+        history=get_history()
+    )
+
+
 # Analysis section with improved layout
 col1, col2 = st.columns([2, 1])
 
@@ -70,49 +228,251 @@ with col2:
 
 # Process analysis
 if analyze_btn and markdown_content:
+    # Provisional topic from the local model, shown while BERTopic is running
+    preclassifier = get_preclassifier()
+    provisional = preclassifier.predict(markdown_content) if preclassifier else None
+    provisional_box = st.empty()
+    if provisional:
+        provisional_box.info(
+            f"⏳ Provisional topic: **{provisional['label']}** ({provisional['confidence']}%) – "
+            "waiting for the BERTopic result..."
+        )
+
     with st.spinner("Analyzing content..."):
         try:
-            url = f"{API_BASE_URL}/classify"
-            response = requests.post(url, params={"content": markdown_content})
+            analysis = get_pipeline().analyze(markdown_content)
+            data = analysis["data"]
 
-            if response.status_code == 200:
-                result = response.json()
+            if provisional:
+                final_label = data["topic_principal"]["label"]
+                tracker = get_agreement_tracker()
+                if analysis["source"] == "api":
+                    tracker.record(provisional, final_label)
+                rate = tracker.agreement_rate()
+                agreement = "✅ matched" if provisional["label"] == final_label else "↪️ differed from"
+                provisional_box.caption(
+                    f"Local pre-classifier {agreement} BERTopic (guessed {provisional['label']}, "
+                    f"{provisional['confidence']}%)"
+                    + (f" · overall agreement {rate:.0%}" if rate is not None else "")
+                )
+            payload = analysis["payload"]
+            report = analysis["report"]
+            duplicates = analysis["duplicates"]
+            reused = analysis["reused"]
 
-                if result and result.get("success"):
-                    data = result["data"]
+            if analysis["source"] == "cache":
+                st.success("✅ Analysis completed successfully  ·  ⚡ cached")
+                st.caption("This content was already classified with the current model: no new inference was run.")
+            elif reused:
+                st.success("✅ Analysis completed successfully  ·  ♻️ near-duplicate")
+                st.caption(f"{reused['similarity']:.0%} similar to “{reused['title']}”: its known topic was reused "
+                           "(confidence is the classifier's for that content).")
+            else:
+                st.success("✅ Analysis completed successfully")
 
-                    st.success("✅ Analysis completed successfully")
+            if duplicates:
+                with st.expander(f"🪞 Possible duplicates ({len(duplicates)})", expanded=reused is not None):
+                    st.dataframe(pd.DataFrame([{
+                        "Content": d.get("title", "Untitled"),
+                        "Source": d.get("source", ""),
+                        "Topic": (d.get("topic") or {}).get("label", "—"),
+                        "Similarity": f"{d['similarity']:.0%}"
+                    } for d in duplicates]), use_container_width=True, hide_index=True)
 
-                    topic_principal = data["topic_principal"]
+            if report and report["original_chars"]:
+                reduction = 1 - len(payload) / report["original_chars"]
+                removed = ", ".join(f"{count} {kind.replace('_', ' ')}" for kind, count in report["removed"].items() if count)
+                st.caption(
+                    f"🧹 Payload: {report['original_chars']:,} → {len(payload):,} characters (−{reduction:.0%}), "
+                    f"{report['original_tokens']:,} → {report['final_tokens']:,} tokens"
+                    + (f" · removed: {removed}" if removed else "")
+                )
 
-                    col1, col2 = st.columns(2)
+            topic_principal = data["topic_principal"]
 
-                    with col1:
-                        st.metric("Main Topic", topic_principal["label"])
+            col1, col2 = st.columns(2)
 
-                    with col2:
-                        confidence = topic_principal['confidence']
-                        # Color-coded confidence
-                        if confidence >= 70:
-                            st.metric("Confidence", f"{confidence}%", delta="High")
-                        elif confidence >= 50:
-                            st.metric("Confidence", f"{confidence}%", delta="Medium")
-                        else:
-                            st.metric("Confidence", f"{confidence}%", delta="Low")
+            with col1:
+                st.metric("Main Topic", topic_principal["label"])
 
-                    with st.expander("ℹ️ Detailed Results"):
-                        st.json(data)
+            with col2:
+                confidence = topic_principal['confidence']
+                # Color-coded confidence
+                if confidence is None:
+                    # Topic reused from a catalog entry: no classifier confidence, only similarity
+                    st.metric("Similarity", f"{reused['similarity']:.0%}", delta="Near-duplicate", delta_color="off")
+                elif confidence >= 70:
+                    st.metric("Confidence", f"{confidence}%", delta="High")
+                elif confidence >= 50:
+                    st.metric("Confidence", f"{confidence}%", delta="Medium")
+                else:
+                    st.metric("Confidence", f"{confidence}%", delta="Low")
 
-                    st.markdown('</div>', unsafe_allow_html=True)
-            else:
-                st.error(f"API Error: {response.status_code}")
+            # Long documents are classified section by section
+            sections = data.get("sections", [])
+            if len(sections) > 1:
+                st.markdown(f"#### 🧩 Topics by Section ({len(sections)} sections)")
+                st.dataframe(pd.DataFrame([{
+                    "Section": section["section"],
+                    "Characters": f"{section['start']:,}–{section['end']:,}",
+                    "Topic": section["label"],
+                    "Confidence": f"{section['confidence']}%"
+                } for section in sections]), use_container_width=True, hide_index=True)
+
+            if data.get("failed_sections"):
+                st.warning(f"⚠️ {len(data['failed_sections'])} section(s) could not be classified and were ignored.")
+
+            similar_index = get_similar_content_index()
+            if len(similar_index):
+                started = time.perf_counter()
+                similar = similar_index.query(payload, k=5)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                if similar:
+                    st.markdown("#### 📚 Similar Existing Contents")
+                    st.dataframe(pd.DataFrame([{
+                        "Content": c.get("title", "Untitled"),
+                        "Type": c.get("type") or "—",
+                        "Score": c["score"],
+                        "Link": c.get("url") or ""
+                    } for c in similar]), use_container_width=True, hide_index=True,
+                        column_config={"Link": st.column_config.LinkColumn("Link")})
+                    st.caption(f"BM25 search over {len(similar_index):,} catalog contents in {elapsed_ms:.1f} ms")
 
+            with st.expander("ℹ️ Detailed Results"):
+                st.json(data)
+
+        except ClassificationError as e:
+            provisional_box.empty()
+            st.error(f"❌ {e}")
         except Exception as e:
+            provisional_box.empty()
             st.error(f"Error: {str(e)}")
 
 elif analyze_btn:
     st.warning("Please paste text or upload a file first.")
 
+with tab_batch:
+    batch_files = st.file_uploader(
+        "Upload several files (TXT, PDF, DOCX, MD)",
+        type=["txt", "pdf", "docx", "md"],
+        accept_multiple_files=True,
+        key="batch_files"
+    )
+    batch_btn = st.button("📚 Classify Batch", type="primary", disabled=not batch_files)
+
+    if batch_btn and batch_files:
+        pipeline = get_pipeline()
+
+        def process_file(item):
+            _, uploaded = item
+            started = time.perf_counter()
+            text = convert_file_to_markdown(uploaded, preference=SPEED)
+            analysis = pipeline.analyze(text, title=uploaded.name, save_index=False)
+            analysis["seconds"] = time.perf_counter() - started
+            return analysis
+
+        rows = {i: {"File": f.name, "Status": "⏳ Queued", "Topic": "", "Confidence": None, "Similarity": None,
+                    "Source": "", "Seconds": None}
+                for i, f in enumerate(batch_files)}
+        progress = st.progress(0.0, text=f"0 / {len(batch_files)} files")
+        table = st.empty()
+        table.dataframe(pd.DataFrame(rows.values()), use_container_width=True, hide_index=True)
+
+        # Workers only convert and classify; the table is refreshed here, on the script thread
+        try:
+            for done, ((i, _), analysis, error) in enumerate(iter_batch(enumerate(batch_files), process_file), 1):
+                row = rows[i]
+                if error is not None:
+                    row["Status"] = f"❌ {error}"
+                else:
+                    topic = analysis["data"]["topic_principal"]
+                    row.update({
+                        "Status": "✅ Done",
+                        "Topic": topic["label"],
+                        "Confidence": topic["confidence"],
+                        "Similarity": analysis["data"].get("duplicate_of", {}).get("similarity"),
+                        "Source": analysis["source"],
+                        "Seconds": round(analysis["seconds"], 2)
+                    })
+                progress.progress(done / len(batch_files), text=f"{done} / {len(batch_files)} files")
+                table.dataframe(pd.DataFrame(rows.values()), use_container_width=True, hide_index=True)
+        finally:
+            # Newly classified texts are persisted once for the whole batch, even if it is interrupted
+            pipeline.save_index()
+
+        progress.empty()
+        table.empty()
+        st.session_state["batch_results"] = pd.DataFrame(rows.values())
+
+    if "batch_results" in st.session_state:
+        batch_df = st.session_state["batch_results"]
+        st.dataframe(batch_df, use_container_width=True, hide_index=True)
+        st.download_button(
+            "⬇️ Download results (CSV)",
+            data=batch_df.to_csv(index=False).encode("utf-8"),
+            file_name="classification_batch.csv",
+            mime="text/csv"
+        )
+
+with tab_history:
+    history = get_history()
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        history_query = st.text_input("Search in classified texts:", placeholder="différenciation, harcèlement...")
+    with col2:
+        history_topic = st.selectbox("Topic:", options=[""] + history.topics(), format_func=lambda x: x or "All topics")
+    with col3:
+        history_confidence = st.slider("Confidence (%):", 0, 100, (0, 100))
+
+    def search_history(page):
+        return history.search(
+            keywords=history_query,
+            topic=history_topic or None,
+            # Full range: no filter, so reused topics without a confidence are listed too
+            min_confidence=history_confidence[0] or None,
+            max_confidence=history_confidence[1] if history_confidence[1] < 100 else None,
+            limit=PAGE_SIZE,
+            offset=(page - 1) * PAGE_SIZE
+        )
+
+    started = time.perf_counter()
+    history_rows, history_total = search_history(st.session_state.get("history_page", 1))
+    page_count = max(1, -(-history_total // PAGE_SIZE))
+    if st.session_state.get("history_page", 1) > page_count:
+        # Filters changed: back to the first page
+        st.session_state["history_page"] = 1
+        history_rows, history_total = search_history(1)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    st.caption(f"{history_total:,} classifications found in {elapsed_ms:.1f} ms")
+
+    if history_rows:
+        st.dataframe(pd.DataFrame([{
+            "Date": datetime.fromtimestamp(row["created_at"]).strftime("%Y-%m-%d %H:%M"),
+            "Source": row["source_name"] or "Pasted text",
+            "Topic": row["topic"],
+            "Confidence": row["confidence"],
+            "Origin": row["origin"],
+            "Excerpt": row["snippet"]
+        } for row in history_rows]), use_container_width=True, hide_index=True)
+
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            st.number_input("Page", min_value=1, max_value=page_count, step=1, key="history_page")
+            st.caption(f"of {page_count}")
+        with col2:
+            detail_id = st.selectbox(
+                "Show detailed results for:",
+                options=[row["id"] for row in history_rows],
+                format_func=lambda i: next(f"#{r['id']} – {r['source_name'] or 'Pasted text'} ({r['topic']})"
+                                           for r in history_rows if r["id"] == i)
+            )
+            with st.expander("ℹ️ Detailed Results"):
+                st.json(history.get(detail_id)["result"])
+    else:
+        st.info("No classification matches these filters yet.")
+
 # Help section
 with st.expander("ℹ️ About Content Classification"):
     st.markdown("""
@@ -123,7 +483,12 @@ with st.expander("ℹ️ About Content Classification"):
     2. Click "Analyze Content"
     3. View the identified topic and confidence score
 
+    Use the **Batch** tab to classify many files at once: they are processed in parallel and
+    results can be downloaded as CSV.
+
     For best results, provide content with clear educational themes and at least 100-200 words.
+    Long documents are split into overlapping sections that are classified in parallel,
+    then combined into a single main topic.
     """)
 
 
@@ -1,8 +1,13 @@
 import streamlit as st
-from utils import call_api
-import plotly.express as px
-import plotly.graph_objects as go
+from utils import call_api, get_setting, get_cluster_snapshot, get_cluster_history, recompute_clusters_panel
+from figures import get_figure
+from cluster_history import diff_snapshots
+from clusters import PROFILE_METRICS
+from whatif import load_feature_matrix, preview_clusters, closest_current_clusters
 import pandas as pd
+from datetime import datetime
+import os
+import time
 
 # Page configuration
 st.set_page_config(
@@ -52,75 +57,44 @@ if not api_status:
     st.error("❌ Unable to connect to the API")
     st.stop()
 
-# Retrieving cluster data
-with st.spinner("Loading cluster data..."):
-    clusters_data = call_api("/clusters")
+# Cluster snapshot, parsed once and shared by all sessions
+snapshot = get_cluster_snapshot()
 
-if clusters_data and clusters_data.get("success"):
-    clusters = clusters_data["clusters"]
 
+@st.cache_data(max_entries=2, show_spinner="Reading the features export...")
+def load_features(source_key, _source):
+    # Keyed by upload id or path + mtime: reruns from any widget on the page skip the file read
+    return load_feature_matrix(_source)
+
+
+def features_source_key(source):
+    if isinstance(source, str):
+        return source, os.path.getmtime(source)
+    return source.file_id
+
+if snapshot:
     # Clusters overview
     st.markdown("## 📊 Clusters Overview")
 
-    cluster_names = []
-    cluster_counts = []
-    cluster_colors = ['#5f2ec8', '#ffc373', '#45B7D1', '#96CEB4', '#FF6B6B']
-
     # Cluster cards
-    cols = st.columns(5)
-    for i, (cluster_id, cluster_info) in enumerate(clusters.items()):
-        cluster_names.append(cluster_info["name"])
-        cluster_counts.append(cluster_info["count"])
-
+    cols = st.columns(len(snapshot))
+    for i, cluster_id in enumerate(snapshot.ids):
         with cols[i]:
             # Dynamic style based on cluster color
             st.markdown(f"""
-            <div class="cluster-header" style="background-color: {cluster_colors[int(cluster_id)]}; color: white;">
-                {cluster_info["name"]}
+            <div class="cluster-header" style="background-color: {snapshot.colors[i]}; color: white;">
+                {snapshot.names[i]}
             </div>
             <div class="cluster-count">
-                {int(cluster_info["count"]):,}
+                {int(snapshot.counts[i]):,}
             </div>
             """, unsafe_allow_html=True)
 
     # Distribution chart
     st.markdown("### 🍰 User Distribution")
 
-    # Créer une liste des clusters dans l'ordre de leurs IDs
-    ordered_clusters = []
-    for cid in sorted([int(c) for c in clusters.keys()]):
-        cluster_info = clusters[str(cid)]
-        ordered_clusters.append({
-            'name': cluster_info['name'],
-            'count': cluster_info['count'],
-            'color': cluster_colors[cid],
-            'id': cid
-        })
-
-    # Convertir en DataFrame
-    df_clusters = pd.DataFrame(ordered_clusters)
-
-    # Maintenant utiliser ce DataFrame pour le graphique
-    fig_pie = px.pie(
-        df_clusters,
-        values='count',
-        names='name',
-        color='name',  # Utiliser le nom comme variable de couleur
-        color_discrete_map={row['name']: row['color'] for _, row in df_clusters.iterrows()},  # Mapping explicite
-        hole=0.4,
-        labels={'name': 'Cluster', 'count': 'Number of users'}
-    )
-
-    # Legend to the side as requested
-    fig_pie.update_layout(
-        legend=dict(orientation="v", yanchor="middle", y=0.5, xanchor="right", x=1.1),
-        margin=dict(t=30, b=10, l=10, r=120)
-    )
-
-    # Clean presentation without text in pie slices
-    fig_pie.update_traces(
-        textposition='none'
-    )
+    # Cached figure, rebuilt only when the snapshot changes
+    fig_pie = get_figure("distribution_pie", snapshot)
 
     st.plotly_chart(fig_pie, use_container_width=True)
 
@@ -131,22 +105,19 @@ if clusters_data and clusters_data.get("success"):
     st.markdown("## 🔍 Detailed Cluster Analysis")
 
     # Cluster selection with colored badges
-    cluster_options = {k: f"{v['name']} ({v['percentage']}%)" for k, v in clusters.items()}
-
     selected_cluster = st.selectbox(
         "Select a cluster to analyze in detail:",
-        options=list(cluster_options.keys()),
-        format_func=lambda x: cluster_options[x]
+        options=snapshot.ids,
+        format_func=lambda x: f"{snapshot.name(x)} ({snapshot.percentage(x)}%)"
     )
 
-    if selected_cluster:
-        profile = clusters[selected_cluster]["profile"]
-        description = clusters[selected_cluster]["description"]
+    if selected_cluster is not None:
+        description = snapshot.description(selected_cluster)
 
         # Section header with cluster color
         st.markdown(f"""
-        <h3 style="background-color: {cluster_colors[int(selected_cluster)]}; color: white; padding: 0.8rem; border-radius: 5px;">
-            Cluster {selected_cluster}: {clusters[selected_cluster]['name']}
+        <h3 style="background-color: {snapshot.color(selected_cluster)}; color: white; padding: 0.8rem; border-radius: 5px;">
+            Cluster {selected_cluster}: {snapshot.name(selected_cluster)}
         </h3>
         """, unsafe_allow_html=True)
 
@@ -159,8 +130,8 @@ if clusters_data and clusters_data.get("success"):
             metrics_col1, metrics_col2, metrics_col3 = st.columns(3)
 
             with metrics_col1:
-                st.metric("Size", f"{profile['size']:,} users")
-                st.metric("Percentage", f"{profile['percentage']:.1f}%")
+                st.metric("Size", f"{snapshot.count(selected_cluster):,} users")
+                st.metric("Percentage", f"{snapshot.percentage(selected_cluster):.1f}%")
 
             with metrics_col2:
                 st.metric("Average Experience", description["anciennete_moyenne"])
@@ -199,66 +170,14 @@ if clusters_data and clusters_data.get("success"):
             # Teaching levels distribution chart
             st.subheader("🏫 Teaching Levels")
 
-            niveaux = description["repartition_niveaux"]
-            level_names = list(niveaux.keys())
-            level_values = [float(v.replace('%', '')) for v in niveaux.values()]
-
-            fig_levels = px.pie(
-                values=level_values,
-                names=level_names,
-                color_discrete_sequence=px.colors.qualitative.Pastel,
-                labels={'label': 'Level', 'value': 'Percentage'}
-            )
-
-            fig_levels.update_traces(
-                textposition='inside',
-                textinfo='percent+label',
-                textfont_size=11
-            )
-
-            fig_levels.update_layout(
-                margin=dict(t=10, b=10, l=10, r=10),
-                height=300
-            )
+            fig_levels = get_figure("levels_pie", snapshot, cluster_id=selected_cluster)
 
             st.plotly_chart(fig_levels, use_container_width=True)
 
         # Radar chart for profile comparison
         st.subheader("📊 Behavioral Profile")
 
-        categories = ["General Activity", "Email Engagement", "Content Usage",
-                     "Thematic Diversity", "Experience"]
-
-        values = [
-            profile.get("activity_level", 0) / 2 * 10,  # Scale to 0-10
-            profile.get("email_engagement", 0) / 2 * 10,
-            profile.get("content_usage", 0) / 2 * 10,
-            profile.get("topic_count", 0) / 8 * 10,  # Assuming max is around 8
-            min(profile.get("anciennete", 0) / 20 * 10, 10)  # Cap at 10
-        ]
-
-        fig_radar = go.Figure()
-        fig_radar.add_trace(go.Scatterpolar(
-            r=values,
-            theta=categories,
-            fill='toself',
-            name=clusters[selected_cluster]['name'],
-            line_color=cluster_colors[int(selected_cluster)]
-        ))
-
-        fig_radar.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 10],
-                    tickvals=[0, 2, 4, 6, 8, 10],
-                    ticktext=["0", "2", "4", "6", "8", "10"]
-                )
-            ),
-            showlegend=False,
-            height=400,
-            margin=dict(t=30, b=30, l=80, r=80)
-        )
+        fig_radar = get_figure("profile_radar", snapshot, cluster_id=selected_cluster)
 
         st.plotly_chart(fig_radar, use_container_width=True)
 
@@ -281,28 +200,114 @@ if clusters_data and clusters_data.get("success"):
 
         This operation should only be performed when necessary, such as after significant changes to the user base.
         """)
-        # Bouton et logique de recalcul
-        if st.button("Recompute clusters", type="primary"):
-            with st.spinner("Recomputing clusters... This may take a few minutes."):
-                recompute_result = call_api("/clusters/recompute", method="POST")
-
-                if recompute_result and recompute_result.get("success"):
-                    st.success("✅ Clusters recomputed successfully!")
-                    st.balloons()
-
-                    # Afficher les résultats du recalcul
-                    if "cluster_distribution" in recompute_result:
-                        distribution = recompute_result["cluster_distribution"]
-                        st.write("### New cluster distribution:")
-
-                        cols = st.columns(len(distribution))
-                        for i, (cluster_key, count) in enumerate(distribution.items()):
-                            with cols[i]:
-                                st.metric(f"Cluster {cluster_key.split('_')[1]}", f"{count:,}")
-
-                        st.info("Please refresh the page to see updated cluster data.")
-                else:
-                    st.error("❌ Failed to recompute clusters. Please try again.")
+        # Le recalcul tourne en tâche de fond : progression, ETA et annulation
+        recompute_clusters_panel()
+
+    # Local what-if: try another k or feature set without touching the production model server
+    with st.expander("🧪 What-if Preview (local, no recompute)", expanded=False):
+        st.markdown("Run a fast mini-batch K-means on a local export of user features and compare it with the current clusters.")
+        features_file = st.file_uploader("User features export (CSV or Parquet)", type=["csv", "parquet"], key="whatif_file")
+        features_path = get_setting("clusters", "features_path")
+        if features_file is None and features_path:
+            st.caption(f"Using the configured export: {features_path}")
+
+        source = features_file if features_file is not None else features_path
+        if source:
+            try:
+                frame = load_features(features_source_key(source), source)
+            except Exception as e:
+                st.error(f"❌ Unable to read the features export: {e}")
+                frame = None
+
+            if frame is not None:
+                numeric_columns = [c for c in frame.select_dtypes("number").columns if c != "user_id"]
+                col1, col2, col3 = st.columns([3, 1, 1])
+                with col1:
+                    selected_features = st.multiselect(
+                        "Features:",
+                        options=numeric_columns,
+                        default=[c for c in PROFILE_METRICS if c in numeric_columns] or numeric_columns
+                    )
+                with col2:
+                    k = st.slider("Number of clusters (k):", 2, 10, len(snapshot))
+                with col3:
+                    sample_size = st.number_input("Sample size (0 = all):", min_value=0, value=min(len(frame), 100000), step=10000)
+
+                if st.button("▶️ Run Preview", disabled=not selected_features):
+                    with st.spinner("Clustering locally..."):
+                        st.session_state["whatif_preview"] = preview_clusters(frame, selected_features, k, sample_size or None)
+
+                preview = st.session_state.get("whatif_preview")
+                if preview:
+                    metric_cols = st.columns(4)
+                    metric_cols[0].metric("Users", f"{preview['users']:,}")
+                    metric_cols[1].metric("Run Time", f"{preview['seconds']:.2f}s")
+                    metric_cols[2].metric("Est. Memory", f"{preview['memory'] / 2**20:.1f} MB")
+                    metric_cols[3].metric("Iterations", preview["iterations"])
+
+                    closest = closest_current_clusters(preview, snapshot)
+                    st.dataframe(pd.DataFrame([{
+                        "Preview Cluster": i,
+                        "Users": f"{int(preview['counts'][i]):,}",
+                        "Share": f"{preview['percentages'][i]:.1f}%",
+                        **{feature.replace('_', ' ').title(): round(float(preview['profiles'][i, j]), 2)
+                           for j, feature in enumerate(preview["features"])},
+                        "Closest Current Cluster": snapshot.name(closest[i]) if closest[i] is not None else "—",
+                        "Current Share": f"{snapshot.percentage(closest[i]):.1f}%" if closest[i] is not None else "—"
+                    } for i in range(preview["k"])]), use_container_width=True, hide_index=True)
+
+    # Snapshots archived locally: comparing two of them needs no backend call
+    st.markdown("---")
+    st.markdown("### 🕰️ Cluster History")
+
+    history = get_cluster_history()
+    history_entries = history.entries()
+
+    if len(history_entries) < 2:
+        st.info("Changes will appear here once a new cluster snapshot is recorded (e.g. after a recompute).")
+    else:
+        first_day = datetime.fromtimestamp(history_entries[0][0]).date()
+        last_day = datetime.fromtimestamp(history_entries[-1][0]).date()
+        period = st.date_input("Period:", value=(first_day, last_day), min_value=first_day, max_value=last_day)
+
+        if len(period) == 2:
+            start = datetime.combine(period[0], datetime.min.time()).timestamp()
+            end = datetime.combine(period[1], datetime.max.time()).timestamp()
+            in_range = history.entries(start, end)
+        else:
+            in_range = history_entries
+
+        def format_entry(i):
+            recorded_at, version = in_range[i]
+            return f"{datetime.fromtimestamp(recorded_at):%Y-%m-%d %H:%M} · {version}"
+
+        if len(in_range) < 2:
+            st.info("Select a period containing at least two snapshots.")
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                before = st.selectbox("Compare snapshot:", options=range(len(in_range)),
+                                      index=len(in_range) - 2, format_func=format_entry)
+            with col2:
+                after = st.selectbox("With snapshot:", options=range(len(in_range)),
+                                     index=len(in_range) - 1, format_func=format_entry)
+
+            started = time.perf_counter()
+            changes = diff_snapshots(history.load(*in_range[before]), history.load(*in_range[after]))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            st.dataframe(pd.DataFrame([{
+                "Cluster": f"{c['cluster']}: {c['name']}",
+                "Size": f"{c['size_before']:,.0f} → {c['size_after']:,.0f}",
+                "Size Change": f"{c['size_change']:+,.0f}",
+                "Share Change": f"{c['percentage_change']:+.1f} pts",
+                "Activity": f"{c['activity_level_change']:+.2f}",
+                "Email Engagement": f"{c['email_engagement_change']:+.2f}",
+                "Content Usage": f"{c['content_usage_change']:+.2f}",
+                "Topics": f"{c['topic_count_change']:+.2f}",
+                "Experience": f"{c['anciennete_change']:+.1f}"
+            } for c in changes]), use_container_width=True, hide_index=True)
+            st.caption(f"{len(history_entries)} snapshots archived · compared in {elapsed_ms:.1f} ms")
 
 
 
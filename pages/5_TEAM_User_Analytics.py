@@ -1,9 +1,14 @@
 import streamlit as st
-from utils import call_api
-import plotly.express as px
-import plotly.graph_objects as go
+from utils import call_api, get_setting, get_cluster_snapshot, get_profile_fetcher, get_scorer, get_assigner, get_user_snapshot, export_buttons, scaling_label
+from cohorts import CohortAggregator, read_user_ids, profile_row, PROFILE_FIELDS, DEGREE_LABELS
+from exports import CLUSTER_FIELDS, RECOMMENDATION_FIELDS, cluster_rows, recommendation_rows
+from scoring import profile_features, risk_level, risk_levels, RISK_LEVELS
+from lookups import LookupHistory, MAX_ENTRIES, MAX_AGE_SECONDS
+from clusters import PROFILE_METRICS
+from figures import cluster_position_figure
 import pandas as pd
 from datetime import datetime, timedelta
+import time
 
 # Page configuration
 st.set_page_config(
@@ -36,9 +41,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Define cluster colors for consistency - SAME AS IN OTHER PAGES
-cluster_colors = ['#5f2ec8', '#ffc373', '#45B7D1', '#96CEB4', '#FF6B6B']
-
 # Header
 st.markdown("# 🔍 User Analytics - Team Dashboard")
 st.markdown("Deep dive into user behavior patterns, engagement metrics, and detailed profiling for team analysis.")
@@ -49,11 +51,8 @@ if not api_status:
     st.error("❌ Cannot connect to API")
     st.stop()
 
-# Load clusters for context
-clusters_data = call_api("/clusters")
-clusters = {}
-if clusters_data and clusters_data.get("success"):
-    clusters = clusters_data["clusters"]
+# Load clusters for context (shared snapshot, colors consistent with other pages)
+snapshot = get_cluster_snapshot()
 
 # User ID input
 col1, col2 = st.columns([3, 1])
@@ -71,346 +70,523 @@ with col2:
     st.markdown("<br>", unsafe_allow_html=True)  # Vertical alignment
     analyze_btn = st.button("🔍 Analyze User", type="primary")
 
-if analyze_btn:
-    with st.spinner(f"Loading comprehensive analytics for user {user_id}..."):
-        profile_result = call_api(f"/user/{user_id}/profile")
-
-        if profile_result and profile_result.get("success"):
-            profile_data = profile_result["data"]
-
-            # Extract user information
-            user_profile = profile_data["profile"]
-            cluster_info = profile_data["cluster"]
-            cluster_id = int(cluster_info['id'])  # Ensure cluster_id is integer
-            recommendations = profile_data["recommendations"]
-
-            # Success header with user ID and cluster color
-            st.markdown(f"""
-            <div class="profile-header" style="border-left: 8px solid {cluster_colors[cluster_id]};">
-                <h2>✅ User {user_id} - {cluster_info['name']}</h2>
-            </div>
-            """, unsafe_allow_html=True)
-
-            # ==================== OVERVIEW SECTION ====================
-            st.markdown("### 📊 User Overview")
+# Per-session lookup history: back/forward and recent users re-render from memory, without API calls
+history = st.session_state.setdefault("lookup_history", LookupHistory(
+    get_setting("analytics", "history_size", MAX_ENTRIES),
+    get_setting("analytics", "history_max_age", MAX_AGE_SECONDS),
+))
+
+
+def derive_view(profile_data):
+    # Everything the page derives from a profile, computed once per lookup (and again only
+    # if the cluster snapshot changes)
+    cluster_id = int(profile_data["cluster"]["id"])
+    view = {"profile_data": profile_data, "cluster_id": cluster_id,
+            "snapshot_version": snapshot.version if snapshot else None,
+            "engagement": None, "churn": None, "measured": [], "scoring_version": None, "scaling": None, "comparison": None}
+    if snapshot:
+        # Scores from the user's own features; metrics missing from the profile use the cluster's averages
+        scorer = get_scorer(snapshot)
+        features, measured = profile_features(profile_data["profile"], snapshot.metrics[snapshot.position(cluster_id)])
+        engagement, churn = scorer.score(features)
+        view.update(engagement=float(engagement[0]), churn=float(churn[0]), measured=measured,
+                    scoring_version=scorer.version, scaling=scorer.scaling)
+
+        comparison_data = []
+        for i, cid in enumerate(snapshot.ids):
+            is_user_cluster = cid == cluster_id
+            cluster_detail = snapshot.descriptions[i]
+            comparison_data.append({
+                "Cluster": f"{'👤 ' if is_user_cluster else ''}{snapshot.names[i]}",
+                "Size": f"{snapshot.counts[i]:,} ({snapshot.percentages[i]:.1f}%)",
+                "Activity": cluster_detail['activite_generale'],
+                "Content Usage": cluster_detail['usage_contenu'],
+                "Main Level": cluster_detail['niveau_principal'].split('(')[0]
+            })
+        view["comparison"] = pd.DataFrame(comparison_data)
+    return view
+
+
+def load_user(lookup_id):
+    with st.spinner(f"Loading comprehensive analytics for user {lookup_id}..."):
+        profile_result = call_api(f"/user/{lookup_id}/profile")
+
+    if profile_result and profile_result.get("success"):
+        history.visit(lookup_id, derive_view(profile_result["data"]))
+        return True
+
+    if profile_result and not profile_result.get("success"):
+        st.error(f"❌ {profile_result.get('error', 'User not found')}")
+
+        st.markdown("### 💡 Troubleshooting")
+        st.info("""
+        **Common issues:**
+        - User ID doesn't exist in database
+        - User has no interaction history
+        - API synchronization delay
+
+        **Try with known user IDs:** 6000, 12345, 45678, 89012
+        """)
+    else:
+        st.error("❌ Unable to load user analytics. Please try again.")
+    return False
 
-            # Key metrics row
-            col1, col2, col3, col4 = st.columns(4)
 
-            with col1:
-                st.metric("User ID", user_id)
+def request_lookup(lookup_id):
+    st.session_state["lookup_request"] = lookup_id
 
-            with col2:
-                anciennete = user_profile.get('anciennete')
-                if anciennete:
-                    st.metric("Experience", f"{anciennete} years")
-                else:
-                    st.metric("Experience", "Not specified")
 
-            with col3:
-                cluster_name = cluster_info.get('name', 'Unknown')
-                st.metric("Cluster", f"{cluster_id}: {cluster_name}")
+lookup_ok = True
+requested_id = user_id if analyze_btn else st.session_state.pop("lookup_request", None)
+if requested_id is not None:
+    if requested_id in history:
+        history.visit(requested_id)
+    else:
+        # Not looked up yet, or evicted (too old / too many users since)
+        lookup_ok = load_user(requested_id)
+
+if lookup_ok and len(history):
+    nav = st.columns([1, 1, 1, 5])
+    nav[0].button("⬅️ Back", on_click=history.back, disabled=not history.can_go_back(), use_container_width=True)
+    nav[1].button("➡️ Forward", on_click=history.forward, disabled=not history.can_go_forward(), use_container_width=True)
+    if nav[2].button("🔄 Refresh", use_container_width=True):
+        lookup_ok = load_user(history.current()[0])
+    with nav[3]:
+        recent_cols = st.columns(6)
+        for i, (recent_id, age) in enumerate(history.recent()[:6]):
+            recent_cols[i].button(f"👤 {recent_id} · {age / 60:.0f}m", key=f"recent_{recent_id}",
+                                  on_click=request_lookup, args=(recent_id,), use_container_width=True,
+                                  help="Show again from memory")
+
+current = history.current() if lookup_ok else None
+if current:
+    user_id, view = current
+    if view["snapshot_version"] != (snapshot.version if snapshot else None):
+        view = derive_view(view["profile_data"])
+        history.update(user_id, view)
+    profile_data = view["profile_data"]
+
+    # Extract user information
+    user_profile = profile_data["profile"]
+    cluster_info = profile_data["cluster"]
+    cluster_id = view["cluster_id"]
+    recommendations = profile_data["recommendations"]
+
+    # Success header with user ID and cluster color
+    st.markdown(f"""
+    <div class="profile-header" style="border-left: 8px solid {snapshot.color(cluster_id) if snapshot else '#666'};">
+        <h2>✅ User {user_id} - {cluster_info['name']}</h2>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # ==================== OVERVIEW SECTION ====================
+    st.markdown("### 📊 User Overview")
+
+    # Key metrics row
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("User ID", user_id)
+
+    with col2:
+        anciennete = user_profile.get('anciennete')
+        if anciennete:
+            st.metric("Experience", f"{anciennete} years")
+        else:
+            st.metric("Experience", "Not specified")
 
-            with col4:
-                degre = user_profile.get('degre')
-                degre_labels = {1: "Primary", 2: "Secondary", 3: "Trainer"}
-                if degre:
-                    st.metric("Level", degre_labels.get(degre, "Unknown"))
-                else:
-                    st.metric("Level", "Not specified")
-
-            # ==================== CLUSTER ANALYSIS ====================
-            st.markdown("---")
-            st.markdown("## 🎯 Cluster Analysis")
-
-            col1, col2 = st.columns([1, 2])
-
-            with col1:
-                st.markdown("### Cluster Profile")
-
-                cluster_desc = cluster_info["description"]
-
-                # Use consistent cluster color
-                st.markdown(f"""
-                <div style="background-color: {cluster_colors[cluster_id]}; color: white; padding: 0.5rem; border-radius: 5px; margin-bottom: 1rem;">
-                    <h4 style="margin: 0;">Cluster {cluster_id}: {cluster_name}</h4>
-                </div>
-                """, unsafe_allow_html=True)
-
-                st.markdown(f"**Size:** {clusters[str(cluster_id)]['count']:,} users")
-                st.markdown(f"**Main Level:** {cluster_desc['niveau_principal']}")
-                st.markdown(f"**Average Experience:** {cluster_desc['anciennete_moyenne']}")
-
-                st.markdown("#### Behavioral Characteristics")
-                st.markdown(f"""
-                <div class="characteristic">
-                    <strong>Activity Level:</strong> {cluster_desc['activite_generale']}
-                </div>
-                <div class="characteristic">
-                    <strong>Email Engagement:</strong> {cluster_desc['engagement_email']}
-                </div>
-                <div class="characteristic">
-                    <strong>Content Usage:</strong> {cluster_desc['usage_contenu']}
-                </div>
-                <div class="characteristic">
-                    <strong>Theme Diversity:</strong> {cluster_desc['diversite_thematique']}
-                </div>
-                """, unsafe_allow_html=True)
-
-            with col2:
-                st.markdown("### User Position in All Clusters")
-
-                # Get real cluster data from API
-                if clusters:
-                    cluster_names = []
-                    cluster_counts = []
-                    colors = []
-
-                    for cid, cluster_info_detail in clusters.items():
-                        cid_int = int(cid)  # Convert to integer for color indexing
-                        cluster_names.append(cluster_info_detail['name'])
-
-                        # Extract count
-                        count = cluster_info_detail['count']
-                        cluster_counts.append(count)
-
-                        # Highlight user's cluster with gold color, use consistent colors for others
-                        if cid_int == cluster_id:
-                            colors.append('#FFD700')  # Gold for user's cluster
-                        else:
-                            colors.append(cluster_colors[cid_int])
-
-                    # Create bar chart
-                    fig_cluster = go.Figure(data=[
-                        go.Bar(
-                            x=cluster_names,
-                            y=cluster_counts,
-                            marker_color=colors,
-                            text=[f"👤 This User" if int(cid) == cluster_id else "" for cid in clusters.keys()],
-                            textposition="auto",
-                            textfont=dict(size=12, color="white")
-                        )
-                    ])
-
-                    fig_cluster.update_layout(
-                        title=f"User {user_id} Position Across All Clusters",
-                        xaxis_title="User Clusters",
-                        yaxis_title="Number of Users",
-                        showlegend=False,
-                        height=400,
-                        xaxis={'categoryorder': 'total descending'}  # Sort by size
-                    )
-
-                    # Add annotations for percentages
-                    for i, (cid, cluster_info_detail) in enumerate(clusters.items()):
-                        percentage = cluster_info_detail['percentage']
-                        fig_cluster.add_annotation(
-                            x=cluster_info_detail['name'],
-                            y=cluster_counts[i],
-                            text=f"{percentage:.1f}%",
-                            showarrow=False,
-                            yshift=10,
-                            font=dict(size=10, color="gray")
-                        )
-
-                    st.plotly_chart(fig_cluster, use_container_width=True)
-
-                    # Add cluster comparison table
-                    st.markdown("#### Cluster Comparison")
-
-                    comparison_data = []
-                    for cid, cluster_detail in clusters.items():
-                        cid_int = int(cid)
-                        is_user_cluster = cid_int == cluster_id
-                        comparison_data.append({
-                            "Cluster": f"{'👤 ' if is_user_cluster else ''}{cluster_detail['name']}",
-                            "Size": f"{cluster_detail['count']:,} ({cluster_detail['percentage']:.1f}%)",
-                            "Activity": cluster_detail['description']['activite_generale'],
-                            "Content Usage": cluster_detail['description']['usage_contenu'],
-                            "Main Level": cluster_detail['description']['niveau_principal'].split('(')[0]
-                        })
-
-                    df_comparison = pd.DataFrame(comparison_data)
-                    st.dataframe(df_comparison, use_container_width=True, hide_index=True)
+    with col3:
+        cluster_name = cluster_info.get('name', 'Unknown')
+        st.metric("Cluster", f"{cluster_id}: {cluster_name}")
 
-                else:
-                    st.error("Unable to load cluster data for visualization")
+    with col4:
+        degre = user_profile.get('degre')
+        degre_labels = {1: "Primary", 2: "Secondary", 3: "Trainer"}
+        if degre:
+            st.metric("Level", degre_labels.get(degre, "Unknown"))
+        else:
+            st.metric("Level", "Not specified")
+
+    # ==================== CLUSTER ANALYSIS ====================
+    st.markdown("---")
+    st.markdown("## 🎯 Cluster Analysis")
+
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        st.markdown("### Cluster Profile")
+
+        cluster_desc = cluster_info["description"]
+
+        # Use consistent cluster color
+        st.markdown(f"""
+        <div style="background-color: {snapshot.color(cluster_id) if snapshot else '#666'}; color: white; padding: 0.5rem; border-radius: 5px; margin-bottom: 1rem;">
+            <h4 style="margin: 0;">Cluster {cluster_id}: {cluster_name}</h4>
+        </div>
+        """, unsafe_allow_html=True)
+
+        if snapshot:
+            st.markdown(f"**Size:** {snapshot.count(cluster_id):,} users")
+        st.markdown(f"**Main Level:** {cluster_desc['niveau_principal']}")
+        st.markdown(f"**Average Experience:** {cluster_desc['anciennete_moyenne']}")
+
+        st.markdown("#### Behavioral Characteristics")
+        st.markdown(f"""
+        <div class="characteristic">
+            <strong>Activity Level:</strong> {cluster_desc['activite_generale']}
+        </div>
+        <div class="characteristic">
+            <strong>Email Engagement:</strong> {cluster_desc['engagement_email']}
+        </div>
+        <div class="characteristic">
+            <strong>Content Usage:</strong> {cluster_desc['usage_contenu']}
+        </div>
+        <div class="characteristic">
+            <strong>Theme Diversity:</strong> {cluster_desc['diversite_thematique']}
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown("### User Position in All Clusters")
+
+        # Get real cluster data from API
+        if snapshot:
+            # Cached base chart; only the user's bar is highlighted on top of it
+            fig_cluster = cluster_position_figure(snapshot, cluster_id, user_id)
+
+            st.plotly_chart(fig_cluster, use_container_width=True)
+
+            # Add cluster comparison table
+            st.markdown("#### Cluster Comparison")
+
+            st.dataframe(view["comparison"], use_container_width=True, hide_index=True)
+            export_buttons(lambda: cluster_rows(snapshot), CLUSTER_FIELDS,
+                           f"clusters_{snapshot.version}", key="export_clusters")
 
-            # ==================== DETAILED PROFILE ====================
-            st.markdown("---")
-            st.markdown("## 👨‍🏫 Detailed Professional Profile")
+        else:
+            st.error("Unable to load cluster data for visualization")
 
-            col1, col2 = st.columns(2)
+    # ==================== DETAILED PROFILE ====================
+    st.markdown("---")
+    st.markdown("## 👨‍🏫 Detailed Professional Profile")
 
-            with col1:
-                st.markdown("### Teaching Information")
+    col1, col2 = st.columns(2)
 
-                # Teaching levels
-                niveaux = user_profile.get('niveaux_enseignes', [])
-                if niveaux and len(niveaux) > 0:
-                    if isinstance(niveaux, list):
-                        st.write(f"**Teaching Levels:** {', '.join(niveaux).title()}")
-                    else:
-                        st.write(f"**Teaching Levels:** {niveaux.title()}")
-                else:
-                    st.write("**Teaching Levels:** Not specified")
+    with col1:
+        st.markdown("### Teaching Information")
 
-                # Degree level
-                if degre:
-                    st.write(f"**Degree Level:** {degre_labels.get(degre, 'Unknown')}")
-                else:
-                    st.write("**Degree Level:** Not specified")
-
-            with col2:
-                st.markdown("### Geographic Information")
-
-                academie = user_profile.get('academie')
-                st.write(f"**Academy:** {academie}")
-
-            # ==================== RECOMMENDED CONTENT ====================
-            st.markdown("---")
-            st.markdown("## 📚 Personalized Recommendations")
-
-            # Display recommendations from the API
-            if recommendations and "recommendations" in recommendations:
-                recommended_contents = recommendations["recommendations"]
-                if recommended_contents:
-                    # Show strategy info if available
-                    reasoning = recommendations.get("reasoning", {})
-                    if reasoning:
-                        st.info(f"**Strategy:** {reasoning.get('strategy', 'N/A')}")
-
-                    # Tabs for different views
-                    tab1, tab2 = st.tabs(["📄 List View", "🔍 Detailed View"])
-
-                    with tab1:
-                        # Create a dataframe for the list view
-                        content_list = []
-                        for i, content in enumerate(recommended_contents, 1):
-                            priority = "✅" if content.get('is_priority_challenge') else ""
-
-                            content_list.append({
-                                "#": i,
-                                "Title": content.get('title', 'Untitled'),
-                                "Type": content.get('type', 'N/A'),
-                                "Priority": priority,
-                                "Reason": content.get('reason', 'N/A')
-                            })
-
-                        df = pd.DataFrame(content_list)
-                        st.dataframe(df, use_container_width=True, hide_index=True)
-
-                    with tab2:
-                        # Expandable detailed view
-                        for i, content in enumerate(recommended_contents, 1):
-                            with st.expander(f"{i}. {content.get('title', 'Untitled')} ({content.get('type', 'N/A')})"):
-                                # Content details
-                                col1, col2 = st.columns([2, 1])
-
-                                with col1:
-                                    st.write(f"**Type:** {content.get('type', 'N/A')}")
-                                    st.write(f"**Source:** {content.get('source', 'N/A')}")
-
-                                    if content.get('reason'):
-                                        st.write(f"**Reason:** {content['reason']}")
-
-                                    if content.get('url'):
-                                        st.markdown(f"[View on ÊtrePROF]({content['url']})")
-
-                                with col2:
-                                    # Content characteristics
-                                    if content.get('is_priority_challenge'):
-                                        st.success(f"✅ Priority Challenge: {content.get('priority_challenge', 'Unknown')}")
-
-                                    if content.get('id'):
-                                        st.caption(f"Content ID: {content['id']}")
-                else:
-                    st.warning("No recommendations available for this user.")
+        # Teaching levels
+        niveaux = user_profile.get('niveaux_enseignes', [])
+        if niveaux and len(niveaux) > 0:
+            if isinstance(niveaux, list):
+                st.write(f"**Teaching Levels:** {', '.join(niveaux).title()}")
             else:
-                st.warning("No recommendations data available.")
-
-            # ==================== BEHAVIORAL INSIGHTS ====================
-            st.markdown("---")
-            st.markdown("## 🧠 Behavioral Insights")
-
-            col1, col2, col3 = st.columns(3)
-
-            with col1:
-                st.markdown("### Risk Assessment")
-
-                # Calculate churn risk based on cluster
-                if cluster_id in [0, 4]:  # Low engagement clusters
-                    risk_level = "High"
-                    risk_color = "🔴"
-                    risk_score = 75
-                elif cluster_id == 3:  # Email-heavy
-                    risk_level = "Medium"
-                    risk_color = "🟡"
-                    risk_score = 45
-                else:  # Active clusters
-                    risk_level = "Low"
-                    risk_color = "🟢"
-                    risk_score = 15
-
-                st.metric("Churn Risk", f"{risk_color} {risk_level}", f"{risk_score}%")
-
-                if risk_level == "High":
-                    st.warning("⚠️ User shows low engagement patterns. Consider targeted re-engagement strategies.")
-                elif risk_level == "Medium":
-                    st.info("📧 User prefers email engagement. Consider newsletter optimization.")
-                else:
-                    st.success("✅ User shows healthy engagement patterns.")
-
-            with col2:
-                st.markdown("### Engagement Score")
-
-                # Calculate engagement score based on cluster
-                engagement_scores = {
-                    0: 2.3,
-                    1: 6.8,
-                    2: 9.2,
-                    3: 5.1,
-                    4: 2.7
-                }
-                engagement = engagement_scores.get(cluster_id, 5.0)
-
-                st.metric("Overall Engagement", f"{engagement}/10")
-
-                # Progress bar
-                st.progress(engagement / 10)
-
-            with col3:
-                st.markdown("### Recommendations Priority")
+                st.write(f"**Teaching Levels:** {niveaux.title()}")
+        else:
+            st.write("**Teaching Levels:** Not specified")
 
-                strategy_map = {
-                    0: ("Re-engagement", "🎯"),
-                    1: ("Diversification", "🌟"),
-                    2: ("Expert Content", "🚀"),
-                    3: ("Platform Migration", "📱"),
-                    4: ("Re-engagement", "🎯")
-                }
+        # Degree level
+        if degre:
+            st.write(f"**Degree Level:** {degre_labels.get(degre, 'Unknown')}")
+        else:
+            st.write("**Degree Level:** Not specified")
+
+    with col2:
+        st.markdown("### Geographic Information")
+
+        academie = user_profile.get('academie')
+        st.write(f"**Academy:** {academie}")
+
+    # ==================== RECOMMENDED CONTENT ====================
+    st.markdown("---")
+    st.markdown("## 📚 Personalized Recommendations")
+
+    # Display recommendations from the API
+    if recommendations and "recommendations" in recommendations:
+        recommended_contents = recommendations["recommendations"]
+        if recommended_contents:
+            # Show strategy info if available
+            reasoning = recommendations.get("reasoning", {})
+            if reasoning:
+                st.info(f"**Strategy:** {reasoning.get('strategy', 'N/A')}")
+
+            # Tabs for different views
+            tab1, tab2 = st.tabs(["📄 List View", "🔍 Detailed View"])
+
+            with tab1:
+                # Create a dataframe for the list view
+                content_list = []
+                for i, content in enumerate(recommended_contents, 1):
+                    priority = "✅" if content.get('is_priority_challenge') else ""
+
+                    content_list.append({
+                        "#": i,
+                        "Title": content.get('title', 'Untitled'),
+                        "Type": content.get('type', 'N/A'),
+                        "Priority": priority,
+                        "Reason": content.get('reason', 'N/A')
+                    })
+
+                df = pd.DataFrame(content_list)
+                st.dataframe(df, use_container_width=True, hide_index=True)
+                export_buttons(lambda: recommendation_rows(recommended_contents, user_id=user_id),
+                               ["user_id", *RECOMMENDATION_FIELDS], f"recommendations_user_{user_id}",
+                               key="export_user_recommendations")
+
+            with tab2:
+                # Expandable detailed view
+                for i, content in enumerate(recommended_contents, 1):
+                    with st.expander(f"{i}. {content.get('title', 'Untitled')} ({content.get('type', 'N/A')})"):
+                        # Content details
+                        col1, col2 = st.columns([2, 1])
+
+                        with col1:
+                            st.write(f"**Type:** {content.get('type', 'N/A')}")
+                            st.write(f"**Source:** {content.get('source', 'N/A')}")
+
+                            if content.get('reason'):
+                                st.write(f"**Reason:** {content['reason']}")
+
+                            if content.get('url'):
+                                st.markdown(f"[View on ÊtrePROF]({content['url']})")
+
+                        with col2:
+                            # Content characteristics
+                            if content.get('is_priority_challenge'):
+                                st.success(f"✅ Priority Challenge: {content.get('priority_challenge', 'Unknown')}")
+
+                            if content.get('id'):
+                                st.caption(f"Content ID: {content['id']}")
+        else:
+            st.warning("No recommendations available for this user.")
+    else:
+        st.warning("No recommendations data available.")
 
-                priority, priority_color = strategy_map.get(cluster_id, ("General Content", "📚"))
+    # ==================== BEHAVIORAL INSIGHTS ====================
+    st.markdown("---")
+    st.markdown("## 🧠 Behavioral Insights")
 
-                st.metric("Strategy Focus", f"{priority_color} {priority}")
+    engagement, churn = view["engagement"], view["churn"]
 
+    col1, col2, col3 = st.columns(3)
 
+    with col1:
+        st.markdown("### Risk Assessment")
 
-        elif profile_result and not profile_result.get("success"):
-            st.error(f"❌ {profile_result.get('error', 'User not found')}")
+        if churn is None:
+            st.metric("Churn Risk", "N/A")
+        else:
+            risk_label, risk_color = risk_level(churn)
+            st.metric("Churn Risk", f"{risk_color} {risk_label}", f"{churn:.0f}%", delta_color="inverse")
 
-            st.markdown("### 💡 Troubleshooting")
-            st.info("""
-            **Common issues:**
-            - User ID doesn't exist in database
-            - User has no interaction history
-            - API synchronization delay
+            if risk_label == "High":
+                st.warning("⚠️ User shows low engagement patterns. Consider targeted re-engagement strategies.")
+            elif risk_label == "Medium":
+                st.info("📧 User engagement is moderate. Consider newsletter optimization.")
+            else:
+                st.success("✅ User shows healthy engagement patterns.")
 
-            **Try with known user IDs:** 6000, 12345, 45678, 89012
-            """)
+    with col2:
+        st.markdown("### Engagement Score")
 
+        if engagement is None:
+            st.metric("Overall Engagement", "N/A")
         else:
-            st.error("❌ Unable to load user analytics. Please try again.")
+            st.metric("Overall Engagement", f"{engagement:.1f}/10")
+
+            # Progress bar
+            st.progress(engagement / 10)
+            source = ", ".join(view["measured"]) if view["measured"] else "cluster averages only"
+            st.caption(f"Scoring weights {view['scoring_version']} · {scaling_label(view['scaling'])} · user features: {source}")
+
+    with col3:
+        st.markdown("### Recommendations Priority")
+
+        strategy_map = {
+            0: ("Re-engagement", "🎯"),
+            1: ("Diversification", "🌟"),
+            2: ("Expert Content", "🚀"),
+            3: ("Platform Migration", "📱"),
+            4: ("Re-engagement", "🎯")
+        }
+
+        priority, priority_color = strategy_map.get(cluster_id, ("General Content", "📚"))
+
+        st.metric("Strategy Focus", f"{priority_color} {priority}")
+
+# Population-level filters over the local columnar snapshot: no API calls, milliseconds per query
+with st.expander("🗂️ Population Explorer", expanded=False):
+    users = get_user_snapshot()
+    if users is None:
+        st.info("No local user snapshot yet. Build one from a user export with "
+                "`python user_snapshot.py build users_export.parquet`.")
+    else:
+        st.caption(f"Snapshot {users.version} · {len(users):,} users · changes up to "
+                   f"{datetime.fromtimestamp(users.watermark).strftime('%Y-%m-%d %H:%M')} · "
+                   f"published {datetime.fromtimestamp(users.created_at).strftime('%Y-%m-%d %H:%M')}"
+                   + (f" · {users.segments} pending segments" if users.segments else ""))
+
+        filter_cols = st.columns(3)
+        cluster_filter = filter_cols[0].multiselect(
+            "Clusters", list(snapshot.ids) if snapshot else sorted(users.counts("cluster_id").index),
+            format_func=lambda cid: f"{cid}: {snapshot.name(cid)}" if snapshot and cid in snapshot.ids else str(cid))
+        academy_filter = filter_cols[1].multiselect("Academies", users.dictionary("academie"))
+        level_filter = filter_cols[2].multiselect("Teaching levels", users.dictionary("niveaux_enseignes"))
+        filter_cols = st.columns(2)
+        degree_filter = filter_cols[0].multiselect("Degree", list(DEGREE_LABELS), format_func=DEGREE_LABELS.get)
+        experience = filter_cols[1].slider("Experience (years)", 0, 40, (0, 40))
+
+        started = time.perf_counter()
+        population = users.mask(
+            cluster_ids=cluster_filter or None,
+            academies=academy_filter or None,
+            degres=degree_filter or None,
+            levels=level_filter or None,
+            anciennete=experience if experience != (0, 40) else None,
+        )
+        matched = int(population.sum())
+        cluster_mix = users.counts("cluster_id", population)
+        if snapshot:
+            cluster_mix.index = [snapshot.name(cid) if cid in snapshot.ids else "Unassigned" for cid in cluster_mix.index]
+            engagement, churn = get_scorer(snapshot).score(users.features(population))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        metric_cols = st.columns(4)
+        metric_cols[0].metric("Users", f"{matched:,}")
+        metric_cols[1].metric("Share of Base", f"{matched / max(len(users), 1):.1%}")
+        if snapshot and matched:
+            metric_cols[2].metric("Avg Engagement", f"{engagement.mean():.1f}/10")
+            metric_cols[3].metric("High Churn Risk", f"{(churn >= RISK_LEVELS[0][0]).mean():.0%}")
+
+        if matched:
+            chart_cols = st.columns(3)
+            with chart_cols[0]:
+                st.markdown("##### Cluster Mix")
+                st.bar_chart(cluster_mix, horizontal=True)
+            with chart_cols[1]:
+                st.markdown("##### Top Academies")
+                st.bar_chart(users.counts("academie", population).nlargest(10), horizontal=True)
+            with chart_cols[2]:
+                st.markdown("##### Teaching Levels")
+                st.bar_chart(users.level_counts(population))
+        st.caption(f"⚡ Filtered and aggregated {len(users):,} users in {elapsed_ms:.1f} ms")
+
+# Cohort mode: thousands of IDs fetched concurrently, aggregates refreshed as profiles arrive
+with st.expander("👥 Cohort Analysis", expanded=False):
+    cohort_file = st.file_uploader("CSV of user IDs (a 'user_id' column, or IDs in the first column)", type=["csv"], key="cohort_file")
+
+    def show_cohort(aggregator, charts):
+        charts[0].bar_chart(aggregator.cluster_mix(), horizontal=True)
+        charts[1].bar_chart(aggregator.experience_mix())
+        charts[2].bar_chart(aggregator.level_mix())
+        charts[3].bar_chart(aggregator.top_academies(), horizontal=True)
+
+    if cohort_file is not None:
+        cohort_ids = read_user_ids(cohort_file)
+        cohort = st.session_state.get("cohort")
+        run_cohort = st.button(f"👥 Analyze {len(cohort_ids):,} Users", type="primary", disabled=not cohort_ids)
+
+        progress = st.empty()
+        status = st.empty()
+        chart_cols = st.columns(2)
+        titles = ["Cluster Mix", "Experience", "Level", "Top Academies"]
+        charts = []
+        for i, title in enumerate(titles):
+            with chart_cols[i % 2]:
+                st.markdown(f"##### {title}")
+                charts.append(st.empty())
+
+        if run_cohort:
+            aggregator = CohortAggregator()
+            rows, failed = [], []
+            started = last_refresh = time.perf_counter()
+            for done, (cohort_user, data, error) in enumerate(get_profile_fetcher().iter_profiles(cohort_ids), 1):
+                if error is not None:
+                    failed.append({"user_id": cohort_user, "error": str(error)})
+                else:
+                    row = profile_row(data)
+                    rows.append(row)
+                    aggregator.add(row)
+
+                # Throttled refresh: redrawing on every profile would cost more than fetching
+                now = time.perf_counter()
+                if now - last_refresh > 0.5 or done == len(cohort_ids):
+                    last_refresh = now
+                    rate = done / (now - started) if now > started else 0
+                    eta = (len(cohort_ids) - done) / rate if rate else 0
+                    progress.progress(done / len(cohort_ids), text=f"{done:,} / {len(cohort_ids):,} profiles")
+                    status.caption(f"⚡ {rate:.1f} profiles/s · ETA {eta:.0f}s · {len(failed)} failed")
+                    show_cohort(aggregator, charts)
+
+            cohort = {"key": cohort_file.file_id, "rows": rows, "failed": failed,
+                      "seconds": time.perf_counter() - started, "aggregator": aggregator}
+            st.session_state["cohort"] = cohort
+
+        if cohort and cohort["key"] == cohort_file.file_id:
+            if not run_cohort:
+                show_cohort(cohort["aggregator"], charts)
+            progress.empty()
+            status.caption(f"✅ {len(cohort['rows']):,} profiles loaded in {cohort['seconds']:.1f}s · {len(cohort['failed'])} failed")
+            export_buttons(lambda: cohort["rows"], PROFILE_FIELDS, "cohort_profiles", key="export_cohort")
+            # Expanders cannot be nested: the failed IDs are listed directly in the cohort panel
+            if cohort["failed"]:
+                st.caption(f"⚠️ Failed IDs ({len(cohort['failed'])})")
+                st.dataframe(pd.DataFrame(cohort["failed"]), use_container_width=True, hide_index=True)
+
+# Local placement from behavioral features: no backend round-trip, works for users not yet clustered
+with st.expander("🧭 Local Cluster Placement", expanded=False):
+    if not snapshot:
+        st.warning("Cluster data is not available.")
+    else:
+        assigner = get_assigner(snapshot)
+        st.caption(f"Distances {scaling_label(assigner.scaling)}")
+        single_tab, batch_tab = st.tabs(["👤 Single User", "📄 Batch (CSV)"])
+
+        with single_tab:
+            cols = st.columns(len(PROFILE_METRICS))
+            features = [
+                cols[i].number_input(metric.replace('_', ' ').title(), min_value=0.0, value=float(assigner.mean[i]),
+                                     step=0.1, key=f"placement_{metric}")
+                for i, metric in enumerate(PROFILE_METRICS)
+            ]
+            started = time.perf_counter()
+            placed, distances, confidence = assigner.assign(features)
+            elapsed_us = (time.perf_counter() - started) * 1e6
+            placed_id = int(placed[0])
+            st.markdown(f"""
+            <div style="background-color: {snapshot.color(placed_id)}; color: white; padding: 0.5rem; border-radius: 5px;">
+                <h4 style="margin: 0;">Cluster {placed_id}: {snapshot.name(placed_id)}</h4>
+            </div>
+            """, unsafe_allow_html=True)
+            st.caption(f"Distance to centroid {distances[0]:.2f} · confidence {confidence[0]:.0%} · computed in {elapsed_us:.0f} µs")
+
+        with batch_tab:
+            features_file = st.file_uploader(f"CSV with columns: {', '.join(PROFILE_METRICS)} (optional user_id)", type=["csv"])
+            if features_file is not None:
+                df_features = pd.read_csv(features_file)
+                missing = [m for m in PROFILE_METRICS if m not in df_features.columns]
+                if missing:
+                    st.error(f"❌ Missing columns: {', '.join(missing)}")
+                else:
+                    started = time.perf_counter()
+                    features = df_features[list(PROFILE_METRICS)].astype(float)
+                    # Missing metrics count as the population mean, as in the scorer, not as 0
+                    population_mean = pd.Series(assigner.mean, index=list(PROFILE_METRICS))
+                    placed, distances, confidence = assigner.assign(features.fillna(population_mean).to_numpy())
+                    engagement, churn = get_scorer(snapshot).score(features.to_numpy())
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    df_features["cluster"] = placed
+                    df_features["cluster_name"] = df_features["cluster"].map(dict(zip(snapshot.ids, snapshot.names)))
+                    df_features["distance"] = distances.round(3)
+                    df_features["confidence"] = confidence.round(3)
+                    df_features["engagement"] = engagement.round(2)
+                    df_features["churn_risk"] = churn.round(1)
+                    df_features["risk_level"] = risk_levels(churn)
+
+                    st.caption(f"{len(df_features):,} users placed and scored in {elapsed_ms:.1f} ms")
+                    st.dataframe(df_features.head(200), use_container_width=True, hide_index=True)
+                    st.download_button("⬇️ Download placements (CSV)", df_features.to_csv(index=False),
+                                       file_name="cluster_placements.csv", mime="text/csv")
 
 # Help section for team
 with st.expander("🔧 Team Analytics Guide", expanded=False):
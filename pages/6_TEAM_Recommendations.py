@@ -1,5 +1,6 @@
 import streamlit as st
-from utils import call_api
+from utils import call_api, get_cluster_snapshot, export_buttons
+from exports import RECOMMENDATION_FIELDS, recommendation_rows
 import pandas as pd
 
 # Page configuration
@@ -26,9 +27,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Define cluster colors for consistency
-cluster_colors = ['#5f2ec8', '#ffc373', '#45B7D1', '#96CEB4', '#FF6B6B']
-
 # Main header
 st.markdown("# 📬 Team Recommendations by Cluster")
 st.markdown("Content recommendations based on real behavioral cluster analysis.")
@@ -39,23 +37,17 @@ if not api_status:
     st.error("❌ Cannot connect to API")
     st.stop()
 
-# Load real clusters from API
-with st.spinner("Loading cluster data..."):
-    clusters_data = call_api("/clusters")
-    if not clusters_data or not clusters_data.get("success"):
-        st.error("Unable to load cluster information")
-        st.stop()
-
-    clusters = clusters_data["clusters"]
+# Real clusters from the API, through the shared snapshot
+snapshot = get_cluster_snapshot()
+if not snapshot:
+    st.error("Unable to load cluster information")
+    st.stop()
 
 # Cluster selection section
 st.markdown("## 🎯 Select a Cluster for Recommendations")
 
 # Create cluster options with real names
-cluster_options = {
-    int(k): v["name"]
-    for k, v in clusters.items()
-}
+cluster_options = dict(zip(snapshot.ids, snapshot.names))
 
 col1, col2 = st.columns([3, 1])
 
@@ -82,7 +74,7 @@ if show_btn:
 
             # Success header with cluster name and color
             st.markdown(f"""
-            <div style="background-color: {cluster_colors[selected_cluster]}; color: white; padding: 1rem; border-radius: 5px; margin-bottom: 1rem;">
+            <div style="background-color: {snapshot.color(selected_cluster)}; color: white; padding: 1rem; border-radius: 5px; margin-bottom: 1rem;">
                 <h2>✅ Recommendations for Cluster {selected_cluster}: {cluster_options[selected_cluster]}</h2>
             </div>
             """, unsafe_allow_html=True)
@@ -91,13 +83,13 @@ if show_btn:
             st.markdown("## 📊 Cluster Overview")
 
             # Get cluster description from the clusters data
-            cluster_desc = clusters[str(selected_cluster)]["description"]
+            cluster_desc = snapshot.description(selected_cluster)
 
             # Display metrics in 3 columns
             col1, col2, col3 = st.columns(3)
 
             with col1:
-                st.metric("Cluster Size", f"{clusters[str(selected_cluster)]['count']:,} users")
+                st.metric("Cluster Size", f"{snapshot.count(selected_cluster):,} users")
                 st.write(f"**Email Engagement:** {cluster_desc.get('engagement_email', 'N/A')}")
 
             with col2:
@@ -156,6 +148,9 @@ if show_btn:
 
                     df = pd.DataFrame(content_list)
                     st.dataframe(df, use_container_width=True, hide_index=True)
+                    export_buttons(lambda: recommendation_rows(recommended_contents, cluster_id=selected_cluster),
+                                   ["cluster_id", *RECOMMENDATION_FIELDS], f"recommendations_cluster_{selected_cluster}",
+                                   key="export_cluster_recommendations")
 
                 with tab2:
                     # Expandable detailed view
@@ -198,7 +193,7 @@ if view_all_btn:
         all_recommendations = {}
 
         # Load recommendations for all clusters
-        for cluster_id in range(5):
+        for cluster_id in snapshot.ids:
             response = call_api(f"/recommend/{cluster_id}")
             if response and response.get("success"):
                 all_recommendations[cluster_id] = response["recommendations"]
@@ -209,15 +204,14 @@ if view_all_btn:
 
             for cluster_id, rec_data in all_recommendations.items():
                 # Get cluster info from the clusters data
-                cluster_info = clusters[str(cluster_id)]
-                cluster_desc = cluster_info["description"]
+                cluster_desc = snapshot.description(cluster_id)
 
                 # Get reasoning data
                 reasoning = rec_data.get("reasoning", {})
 
                 comparison_data.append({
                     "Cluster": f"{cluster_id}: {cluster_options[cluster_id]}",
-                    "Size": f"{cluster_info['count']:,}",
+                    "Size": f"{snapshot.count(cluster_id):,}",
                     "Activity": cluster_desc.get("activite_generale", "N/A"),
                     "Content Usage": cluster_desc.get("usage_contenu", "N/A"),
                     "Recommendations": rec_data.get("total_recommendations", 0),
@@ -228,6 +222,14 @@ if view_all_btn:
             df_comparison = pd.DataFrame(comparison_data)
             st.dataframe(df_comparison, use_container_width=True, hide_index=True)
 
+            # All lists in one file, one row per (cluster, content)
+            def all_recommendation_rows():
+                for cluster_id, rec_data in all_recommendations.items():
+                    yield from recommendation_rows(rec_data.get("recommendations", []), cluster_id=cluster_id)
+
+            export_buttons(all_recommendation_rows, ["cluster_id", *RECOMMENDATION_FIELDS],
+                           "recommendations_all_clusters", key="export_all_recommendations")
+
             # Detailed view for each cluster
             st.markdown("### Detailed Recommendations by Cluster")
 
@@ -236,18 +238,18 @@ if view_all_btn:
                 with st.expander(f"Cluster {cluster_id} - {cluster_options[cluster_id]}"):
                     # Add colored header inside expander
                     st.markdown(f"""
-                    <div style="background-color: {cluster_colors[cluster_id]}; color: white; padding: 0.5rem; border-radius: 5px; margin-bottom: 1rem;">
+                    <div style="background-color: {snapshot.color(cluster_id)}; color: white; padding: 0.5rem; border-radius: 5px; margin-bottom: 1rem;">
                         <h4 style="margin: 0;">Cluster {cluster_id}: {cluster_options[cluster_id]}</h4>
                     </div>
                     """, unsafe_allow_html=True)
 
                     # Basic info
-                    cluster_desc = clusters[str(cluster_id)]["description"]
+                    cluster_desc = snapshot.description(cluster_id)
 
                     col1, col2 = st.columns(2)
 
                     with col1:
-                        st.write(f"**Size:** {clusters[str(cluster_id)]['count']:,} users")
+                        st.write(f"**Size:** {snapshot.count(cluster_id):,} users")
                         st.write(f"**Activity:** {cluster_desc.get('activite_generale', 'N/A')}")
                         st.write(f"**Content Usage:** {cluster_desc.get('usage_contenu', 'N/A')}")
 
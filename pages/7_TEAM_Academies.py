@@ -0,0 +1,165 @@
+import streamlit as st
+from utils import get_cluster_snapshot, get_scorer, get_setting, get_user_snapshot, export_buttons
+from regional import TEACHING_LEVEL, DEGREE, academy_level_counts, academy_level_mean, academy_cluster_share
+from figures import heatmap
+from scoring import RISK_LEVELS, DEFAULT_VERSION as SCORING_VERSION
+import numpy as np
+import time
+
+# Page configuration
+st.set_page_config(
+    page_title="ÊtrePROF - Academies & Levels",
+    page_icon="🗺️",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# Custom CSS for consistent styling
+st.markdown("""
+<style>
+    .stApp {
+        background-color: #f4f8fe;
+    }
+    div[data-testid="metric-container"] {
+        background-color: white;
+        border: 1px solid #e1e5e9;
+        padding: 1rem;
+        border-radius: 0.5rem;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# Header
+st.markdown("# 🗺️ Academies & Teaching Levels - Team View")
+st.markdown("Cluster mix and engagement by academy × level, computed over the whole user base for regional campaign targeting.")
+
+users = get_user_snapshot()
+if users is None:
+    st.info("No local user snapshot yet. Build one from a user export with "
+            "`python user_snapshot.py build users_export.parquet`, then keep it fresh with `user_sync.py`.")
+    st.stop()
+
+snapshot = get_cluster_snapshot()
+cluster_names = dict(zip(snapshot.ids, snapshot.names)) if snapshot else {}
+
+
+@st.cache_data(max_entries=32, show_spinner="Aggregating academies and levels...")
+def regional_views(users_version, clusters_version, weights_version, axis, cluster_filter, _users, _snapshot):
+    # Cached per data version: a new user snapshot, cluster recompute or scoring weights version gives new keys
+    started = time.perf_counter()
+    mask = np.isin(_users["cluster_id"], list(cluster_filter)) if cluster_filter else None
+    views = {"counts": academy_level_counts(_users, axis, mask), "academy_users": _users.counts("academie", mask)}
+    names = dict(zip(_snapshot.ids, _snapshot.names)) if _snapshot is not None else {}
+    views["cluster_share"] = academy_cluster_share(_users, names, mask)
+    if _snapshot is not None:
+        engagement, churn = get_scorer(_snapshot).score(_users.features())
+        views["engagement"] = academy_level_mean(_users, engagement, axis, mask)
+        views["churn"] = academy_level_mean(_users, churn, axis, mask)
+        views["high_risk"] = academy_level_mean(_users, (churn >= RISK_LEVELS[0][0]) * 100.0, axis, mask)
+    views["seconds"] = time.perf_counter() - started
+    return views
+
+
+# Controls
+col1, col2, col3 = st.columns([1, 2, 1])
+with col1:
+    axis = st.radio("Level axis", [TEACHING_LEVEL, DEGREE], horizontal=True,
+                    format_func={TEACHING_LEVEL: "Teaching level", DEGREE: "Degree"}.get)
+with col2:
+    cluster_filter = st.multiselect("Clusters", list(snapshot.ids) if snapshot else [],
+                                    format_func=lambda cid: f"{cid}: {cluster_names.get(cid, cid)}",
+                                    help="Leave empty to include every cluster")
+with col3:
+    min_users = st.number_input("Min users per cell", min_value=0, value=20, step=10,
+                                help="Cells with fewer users are hidden from averages")
+
+started = time.perf_counter()
+views = regional_views(users.version, snapshot.version if snapshot else None,
+                       get_setting("scoring", "weights_version", SCORING_VERSION), axis,
+                       tuple(sorted(cluster_filter)), users, snapshot)
+elapsed_ms = (time.perf_counter() - started) * 1000
+
+counts = views["counts"]
+reliable = counts >= max(min_users, 1)
+
+# Key metrics
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    st.metric("👥 Users", f"{len(users):,}")
+with col2:
+    st.metric("🏫 Academies", f"{len(counts):,}")
+with col3:
+    st.metric("🎓 Levels", f"{counts.shape[1]:,}")
+with col4:
+    st.metric("📊 Clusters", f"{len(snapshot) if snapshot else 0}")
+
+st.caption(f"Snapshot {users.version} · computed in {views['seconds'] * 1000:.0f} ms · "
+           f"served in {elapsed_ms:.1f} ms (cached per data version)")
+
+tab_users, tab_engagement, tab_clusters, tab_targets = st.tabs(
+    ["👥 Users", "⚡ Engagement & Risk", "🎯 Cluster Mix", "📍 Campaign Targets"])
+
+with tab_users:
+    st.markdown("### Users by Academy × Level")
+    st.plotly_chart(heatmap(counts, "Users", "Blues", ",.0f"), use_container_width=True)
+    export_buttons(lambda: counts.rename_axis("academie").reset_index().to_dict("records"),
+                   ["academie", *counts.columns], f"users_by_academy_{axis}", key="export_counts")
+
+with tab_engagement:
+    if "engagement" not in views:
+        st.warning("Cluster data is not available: engagement scores need the current cluster profiles.")
+    else:
+        measure = st.radio("Measure", ["engagement", "churn", "high_risk"], horizontal=True,
+                           format_func={"engagement": "Avg engagement (/10)", "churn": "Avg churn risk (%)",
+                                        "high_risk": f"High churn risk share (%, ≥ {RISK_LEVELS[0][0]}%)"}.get)
+        table = views[measure].where(reliable)
+        st.plotly_chart(
+            heatmap(table, "Score" if measure == "engagement" else "%",
+                    "Greens" if measure == "engagement" else "Reds", ".1f" if measure == "engagement" else ".0f"),
+            use_container_width=True,
+        )
+        st.caption(f"Cells with fewer than {min_users} users are left blank.")
+        export_buttons(lambda: table.round(2).rename_axis("academie").reset_index().to_dict("records"),
+                       ["academie", *table.columns], f"{measure}_by_academy_{axis}", key="export_scores")
+
+with tab_clusters:
+    st.markdown("### Cluster Share by Academy (%)")
+    # Small academies would show meaningless 100% shares
+    share = views["cluster_share"]
+    share = share[views["academy_users"].reindex(share.index).fillna(0) >= max(min_users, 1)]
+    st.plotly_chart(heatmap(share, "%", "Purples", ".0f"), use_container_width=True)
+    st.dataframe(share.round(1), use_container_width=True)
+
+with tab_targets:
+    st.markdown("### Academy × Level Cells to Target First")
+    if "high_risk" not in views:
+        st.warning("Cluster data is not available: risk scores need the current cluster profiles.")
+    else:
+        targets = (
+            views["high_risk"].where(reliable).stack().rename("high_risk_share").to_frame()
+            .join(views["engagement"].stack().rename("avg_engagement"))
+            .join(counts.stack().rename("users"))
+            .rename_axis(["academie", "level"]).reset_index()
+            .dropna(subset=["high_risk_share"])
+            .sort_values(["high_risk_share", "users"], ascending=[False, False])
+        )
+        targets["at_risk_users"] = (targets["high_risk_share"] / 100 * targets["users"]).round().astype(int)
+        st.dataframe(
+            targets.head(25).round({"high_risk_share": 1, "avg_engagement": 2}),
+            use_container_width=True,
+            hide_index=True,
+        )
+        export_buttons(lambda: targets.to_dict("records"), list(targets.columns),
+                       f"campaign_targets_{axis}", key="export_targets")
+
+st.divider()
+if st.button("🎯 Back to Dashboard"):
+    st.switch_page("pages/2_TEAM_Dashboard.py")
+
+# Footer
+st.divider()
+st.markdown("""
+<div style='text-align: center; color: #666;'>
+    ÊtrePROF x Le Wagon - batch #1945
+</div>
+""", unsafe_allow_html=True)
@@ -0,0 +1,141 @@
+# pipeline.py
+# Chaîne complète d'analyse d'un contenu : prétraitement, cache, détection de
+# quasi-doublons, classification puis enregistrement dans l'historique. Utilisée par la page de classification
+# (document unique ou lot de fichiers).
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from classification import classify_document
+from classification_cache import cache_key
+from near_duplicates import REUSE_THRESHOLD
+from preprocessing import preprocess_text, TOKEN_BUDGET
+
+BATCH_WORKERS = 4
+# Au-delà, le journal d'entraînement est renommé en .1 (l'ancien .1 est remplacé) :
+# au plus deux fichiers, à passer tous deux à `preclassifier.py train`
+TRAINING_LOG_MAX_BYTES = 50 * 1024 * 1024
+
+_training_log_lock = threading.Lock()
+
+
+class ClassificationPipeline:
+    def __init__(self, api_base_url, cache, duplicate_index, model_version,
+                 token_budget=TOKEN_BUDGET, preprocess=True, duplicate_index_path=None,
+                 training_log_path=None, history=None):
+        self.api_base_url = api_base_url
+        self.cache = cache
+        self.duplicate_index = duplicate_index
+        self.model_version = model_version
+        self.token_budget = token_budget
+        self.preprocess = preprocess
+        self.duplicate_index_path = duplicate_index_path
+        self.training_log_path = training_log_path
+        self.history = history
+
+    def analyze(self, text, title=None, save_index=True):
+        """Renvoie un dict : `data` (format de l'API), `source` ("api", "cache" ou
+        "duplicate"), `duplicates`, `report` (prétraitement) et `payload` envoyé.
+        En lot, passer `save_index=False` puis appeler `save_index()` une fois à la fin :
+        chaque enregistrement recompresse tout l'index."""
+        report = None
+        payload = text
+        if self.preprocess:
+            report = preprocess_text(text, self.token_budget)
+            payload = report["text"] or text
+
+        key = cache_key(payload, self.model_version)
+        duplicates = self.duplicate_index.query(payload)
+        result = {"payload": payload, "report": report, "duplicates": duplicates, "reused": None}
+
+        # Version du modèle inconnue : le cache ne serait jamais invalidé après une mise à jour
+        data = self.cache.get(key) if self.model_version else None
+        if data is not None:
+            result.update(data=data, source="cache")
+            self._record(text, result, title)
+            return result
+
+        best = duplicates[0] if duplicates else None
+        if best and best["similarity"] >= REUSE_THRESHOLD and best.get("topic"):
+            # Quasi-copie d'un contenu connu : son thème est repris sans appeler le backend.
+            # La confiance est celle du classifieur pour le doublon (None pour le catalogue) ;
+            # la similarité reste dans duplicate_of. Rien n'est mis en cache : ce n'est pas
+            # un résultat du modèle, et sa provenance doit rester visible
+            data = {
+                "topic_principal": {
+                    "label": best["topic"]["label"],
+                    "confidence": best["topic"].get("confidence"),
+                },
+                "duplicate_of": {k: best.get(k) for k in ("id", "title", "source", "similarity")},
+            }
+            result.update(data=data, source="duplicate", reused=best)
+            self._record(text, result, title)
+            return result
+        else:
+            data = classify_document(self.api_base_url, payload)
+            # Résultat partiel (sections en échec) : ni indexé ni appris, pour qu'une erreur
+            # passagère du backend ne soit pas réutilisée pour les quasi-doublons
+            if not data.get("failed_sections"):
+                self.duplicate_index.add(payload, {
+                    "id": key[:12],
+                    "title": title or payload.strip().splitlines()[0][:80],
+                    "topic": data["topic_principal"],
+                    "source": "classified",
+                })
+                if save_index:
+                    self.save_index()
+                if self.training_log_path:
+                    self._log_training_example(payload, data["topic_principal"]["label"])
+            result.update(data=data, source="api")
+
+        if self.model_version and not data.get("failed_sections"):
+            self.cache.set(key, data)
+        self._record(text, result, title)
+        return result
+
+    def save_index(self):
+        """Enregistre l'index des quasi-doublons s'il a reçu de nouveaux textes."""
+        if self.duplicate_index_path and self.duplicate_index.dirty:
+            self.duplicate_index.save(self.duplicate_index_path)
+
+    def _record(self, text, result, title):
+        if self.history is not None:
+            result["history_id"] = self.history.record(text, result["data"], source_name=title, origin=result["source"])
+
+    def _log_training_example(self, text, label):
+        # Exemples (texte, thème BERTopic) pour réentraîner le pré-classifieur local
+        with _training_log_lock:
+            try:
+                if os.path.getsize(self.training_log_path) >= TRAINING_LOG_MAX_BYTES:
+                    os.replace(self.training_log_path, f"{self.training_log_path}.1")
+            except FileNotFoundError:
+                pass
+            with open(self.training_log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"text": text, "label": label}, ensure_ascii=False) + "\n")
+
+
+def iter_batch(items, worker, max_workers=BATCH_WORKERS):
+    """Applique `worker(item)` en parallèle et génère `(item, résultat, erreur)` dans l'ordre
+    de fin. Au plus 2 x `max_workers` éléments sont en vol : la mémoire reste bornée."""
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = {}
+
+        def refill():
+            while len(in_flight) < 2 * max_workers:
+                item = next(items, None)
+                if item is None:
+                    return
+                in_flight[executor.submit(worker, item)] = item
+
+        refill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
+            refill()
@@ -0,0 +1,180 @@
+# preclassifier.py
+# Pré-classifieur local : TF-IDF (hashing) + centroïde le plus proche sur les 16 thèmes.
+# Entraîné hors ligne à partir de résultats BERTopic passés, il donne un thème provisoire
+# en quelques millisecondes pendant que /classify travaille.
+#
+#   python preclassifier.py train reclassify_results.csv --output preclassifier.npz
+#   python preclassifier.py train training_log.jsonl training_log.jsonl.1 --output preclassifier.npz
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from classification_cache import normalize_text
+
+N_FEATURES = 1 << 16
+# Température du softmax sur les similarités cosinus (plus petit = plus tranché)
+TEMPERATURE = 0.05
+
+
+def _token_counts(text):
+    words = [w for w in normalize_text(text).split() if len(w) > 2]
+    return Counter(zlib.crc32(w.encode("utf-8")) % N_FEATURES for w in words)
+
+
+def _sparse_vector(counts, idf):
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    tf = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    weights = tf * idf[indices]
+    norm = np.linalg.norm(weights)
+    return indices, (weights / norm if norm else weights)
+
+
+class PreClassifier:
+    def __init__(self, labels, idf, centroids, n_docs=0, trained_at=None):
+        self.labels = list(labels)
+        self.idf = idf
+        self.centroids = centroids
+        self.n_docs = n_docs
+        self.trained_at = trained_at
+
+    @classmethod
+    def train(cls, records):
+        """`records` : itérable de (texte, thème)."""
+        documents = []
+        document_frequency = np.zeros(N_FEATURES, dtype=np.float32)
+        for text, label in records:
+            counts = _token_counts(text)
+            if counts:
+                documents.append((counts, label))
+                document_frequency[list(counts)] += 1
+        if not documents:
+            raise ValueError("No training documents")
+
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)).astype(np.float32) + 1
+        labels = sorted({label for _, label in documents})
+        positions = {label: i for i, label in enumerate(labels)}
+
+        centroids = np.zeros((len(labels), N_FEATURES), dtype=np.float32)
+        for counts, label in documents:
+            indices, weights = _sparse_vector(counts, idf)
+            centroids[positions[label], indices] += weights
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms == 0, 1, norms)
+
+        return cls(labels, idf, centroids, n_docs=len(documents), trained_at=time.time())
+
+    def predict(self, text):
+        counts = _token_counts(text)
+        if not counts:
+            return None
+        indices, weights = _sparse_vector(counts, self.idf)
+        similarities = self.centroids[:, indices] @ weights
+        scores = np.exp((similarities - similarities.max()) / TEMPERATURE)
+        probabilities = scores / scores.sum()
+        best = int(np.argmax(probabilities))
+        return {"label": self.labels[best], "confidence": round(float(probabilities[best]) * 100, 1)}
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            labels=np.array(self.labels),
+            idf=self.idf,
+            centroids=self.centroids,
+            meta=np.array(json.dumps({"n_docs": self.n_docs, "trained_at": self.trained_at})),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        if not path or not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(data["labels"].tolist(), data["idf"], data["centroids"], **meta)
+
+
+class AgreementTracker:
+    """Taux d'accord entre thème provisoire et résultat BERTopic, par tranche de confiance."""
+
+    BUCKETS = [0, 50, 70, 90]
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.stats = {"total": 0, "agree": 0, "buckets": {str(b): [0, 0] for b in self.BUCKETS}}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.stats = json.load(f)
+
+    def record(self, provisional, final_label):
+        bucket = str(max(b for b in self.BUCKETS if provisional["confidence"] >= b))
+        agree = provisional["label"] == final_label
+        with self._lock:
+            self.stats["total"] += 1
+            self.stats["agree"] += agree
+            self.stats["buckets"][bucket][0] += 1
+            self.stats["buckets"][bucket][1] += agree
+            if self.path:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.stats, f)
+                os.replace(tmp_path, self.path)
+        return agree
+
+    def agreement_rate(self, min_confidence=0):
+        with self._lock:
+            pairs = [v for b, v in self.stats["buckets"].items() if int(b) >= min_confidence]
+        total = sum(p[0] for p in pairs)
+        return sum(p[1] for p in pairs) / total if total else None
+
+
+def iter_training_records(path):
+    """(texte, thème) depuis un JSON Lines {text, label} ou un CSV de reclassify.py (path, label)."""
+    if path.endswith(".csv"):
+        from extraction import SPEED
+        from utils import convert_file_to_markdown
+
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                if row.get("status", "ok") != "ok" or not row.get("label"):
+                    continue
+                try:
+                    with open(row["path"], "rb") as document:
+                        yield convert_file_to_markdown(document, preference=SPEED), row["label"]
+                except (OSError, ValueError):
+                    continue
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["text"], record["label"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the local topic pre-classifier.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train")
+    train_parser.add_argument("sources", nargs="+", help="JSON Lines {text, label} or reclassify.py results CSV")
+    train_parser.add_argument("--output", default="preclassifier.npz")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    records = (record for source in args.sources for record in iter_training_records(source))
+    model = PreClassifier.train(records)
+    model.save(args.output)
+    print(f"Trained on {model.n_docs} documents, {len(model.labels)} topics "
+          f"in {time.perf_counter() - started:.1f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+# preprocessing.py
+# Nettoyage du texte extrait avant classification : en-têtes/pieds de page répétés,
+# numéros de page, sommaires, textes alternatifs d'images, paragraphes dupliqués,
+# puis sélection des paragraphes les plus informatifs dans un budget de tokens.
+import hashlib
+import math
+import re
+from collections import Counter
+
+TOKEN_BUDGET = 3000
+
+# Une ligne courte vue en bord de page au moins ce nombre de fois est un en-tête ou un pied de page
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_CHARS = 80
+
+_TOKEN = re.compile(r"\w+")
+_PAGE_BREAK = "\f"
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n|\f")
+_PAGE_NUMBER = re.compile(r"^\s*(page|p\.)?\s*\d{1,4}(\s*(/|sur|of)\s*\d{1,4})?\s*$", re.IGNORECASE)
+_TOC_ENTRY = re.compile(r"(\.{4,}|…{2,})\s*\d{1,4}\s*$")
+_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]*\)|<img[^>]*>|\[(image|figure)[^\]]*\]", re.IGNORECASE)
+_WHITESPACE = re.compile(r"[ \t ]+")
+
+
+def count_tokens(text):
+    return len(_TOKEN.findall(text))
+
+
+def _line_key(line):
+    # Les numéros changent d'une page à l'autre ("Guide ÊtrePROF - 3") : on les ignore
+    return re.sub(r"\d+", "#", line.strip().lower())
+
+
+def _iter_paragraphs(text):
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        if paragraph.strip():
+            yield paragraph
+
+
+def _edge_positions(lines):
+    # Première et dernière ligne non vides d'une page
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return {filled[0], filled[-1]} if filled else set()
+
+
+def _repeated_lines(pages):
+    # En-têtes et pieds de page : lignes courtes en bord de page, répétées d'une page à l'autre
+    counts = Counter()
+    for lines in pages:
+        counts.update({
+            _line_key(lines[i]) for i in _edge_positions(lines) if len(lines[i].strip()) <= BOILERPLATE_MAX_CHARS
+        })
+    return {key for key, count in counts.items() if count >= BOILERPLATE_MIN_REPEATS}
+
+
+def _strip_boilerplate(text, removed):
+    """Retire les en-têtes et pieds de page répétés, uniquement en bord de page (\f). Sans saut
+    de page (DOCX, Markdown, texte), rien n'est retiré : les titres d'une ligne ("## Étape 1")
+    ressembleraient à des en-têtes."""
+    pages = [page.splitlines() for page in text.split(_PAGE_BREAK)]
+    if len(pages) < BOILERPLATE_MIN_REPEATS:
+        return text
+    boilerplate = _repeated_lines(pages)
+    if not boilerplate:
+        return text
+
+    cleaned = []
+    for lines in pages:
+        edges = _edge_positions(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edges and _line_key(line) in boilerplate:
+                removed["boilerplate"] += 1
+            else:
+                kept.append(line)
+        cleaned.append("\n".join(kept))
+    return _PAGE_BREAK.join(cleaned)
+
+
+def _clean_paragraphs(text, removed):
+    for paragraph in _iter_paragraphs(_strip_boilerplate(text, removed)):
+        lines = []
+        for line in paragraph.splitlines():
+            if _IMAGE.search(line):
+                removed["images"] += 1
+                line = _IMAGE.sub(" ", line)
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if _PAGE_NUMBER.match(stripped):
+                removed["page_numbers"] += 1
+            elif _TOC_ENTRY.search(stripped):
+                removed["table_of_contents"] += 1
+            else:
+                lines.append(_WHITESPACE.sub(" ", stripped))
+        if lines:
+            yield "\n".join(lines)
+
+
+def _deduplicate(paragraphs, removed):
+    seen = set()
+    for paragraph in paragraphs:
+        digest = hashlib.blake2b(" ".join(paragraph.lower().split()).encode("utf-8"), digest_size=16).digest()
+        if digest in seen:
+            removed["duplicates"] += 1
+            continue
+        seen.add(digest)
+        yield paragraph
+
+
+def _informativeness(paragraph, document_frequency, total_paragraphs):
+    # Somme des IDF des mots distincts, normalisée par la racine de la longueur :
+    # favorise les paragraphes denses en vocabulaire propre au document
+    words = [w.lower() for w in _TOKEN.findall(paragraph) if len(w) > 2]
+    if not words:
+        return 0.0
+    distinct = set(words)
+    idf = sum(math.log(1 + total_paragraphs / document_frequency[w]) for w in distinct)
+    return idf / math.sqrt(len(words))
+
+
+def _fit_budget(paragraphs, token_budget, removed):
+    sizes = [count_tokens(p) for p in paragraphs]
+    if sum(sizes) <= token_budget:
+        return paragraphs
+
+    document_frequency = Counter()
+    for paragraph in paragraphs:
+        document_frequency.update({w.lower() for w in _TOKEN.findall(paragraph) if len(w) > 2})
+
+    # Le premier paragraphe (titre / chapeau) est toujours gardé
+    scores = [_informativeness(p, document_frequency, len(paragraphs)) for p in paragraphs]
+    ranking = sorted(range(1, len(paragraphs)), key=lambda i: scores[i], reverse=True)
+
+    kept = {0}
+    used = sizes[0]
+    for i in ranking:
+        if used + sizes[i] <= token_budget:
+            kept.add(i)
+            used += sizes[i]
+    removed["over_budget"] += len(paragraphs) - len(kept)
+    return [p for i, p in enumerate(paragraphs) if i in kept]
+
+
+def preprocess_text(text, token_budget=TOKEN_BUDGET):
+    """Renvoie le texte nettoyé et un rapport de réduction (caractères, tokens, éléments retirés)."""
+    removed = Counter({
+        "images": 0, "page_numbers": 0, "table_of_contents": 0,
+        "boilerplate": 0, "duplicates": 0, "over_budget": 0,
+    })
+
+    paragraphs = list(_deduplicate(_clean_paragraphs(text, removed), removed))
+    if token_budget:
+        paragraphs = _fit_budget(paragraphs, token_budget, removed)
+
+    cleaned = "\n\n".join(paragraphs)
+    return {
+        "text": cleaned,
+        "original_chars": len(text),
+        "final_chars": len(cleaned),
+        "original_tokens": count_tokens(text),
+        "final_tokens": count_tokens(cleaned),
+        "removed": dict(removed),
+    }
@@ -0,0 +1,164 @@
+# reclassify.py
+# Reclassement en masse du catalogue, sans l'interface Streamlit.
+#
+#   python reclassify.py contenus/ --output results.csv
+#   python reclassify.py manifest.csv --workers 8 --api-url https://...
+#
+# La progression est enregistrée au fil de l'eau dans un fichier checkpoint (JSON Lines) :
+# relancer la même commande après une interruption reprend là où elle s'était arrêtée.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from extraction import SPEED, QUALITY, supported_suffixes
+from preprocessing import TOKEN_BUDGET
+
+RESULT_FIELDS = ["id", "path", "status", "label", "confidence", "sections", "seconds", "error"]
+
+
+def iter_sources(source):
+    """Génère (id, chemin) depuis un dossier (récursif) ou un manifeste CSV (colonnes
+    `path`, `id` optionnelle) / texte (un chemin par ligne)."""
+    suffixes = tuple(f".{suffix}" for suffix in supported_suffixes())
+
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(suffixes) and not name.startswith("."):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), path
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8", newline="") as f:
+        if source.endswith(".csv"):
+            for row in csv.DictReader(f):
+                path = os.path.join(base, row["path"])
+                yield row.get("id") or row["path"], path
+        else:
+            for line in f:
+                if line.strip():
+                    yield line.strip(), os.path.join(base, line.strip())
+
+
+def load_checkpoint(path):
+    """Dernier résultat connu par id (une ligne JSON par document traité)."""
+    results = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # dernière ligne tronquée par une interruption
+                results[record["id"]] = record
+    return results
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reclassify ÊtrePROF contents with the /classify API.")
+    parser.add_argument("source", help="Directory of TXT/MD/PDF/DOCX files, or a manifest (.csv with a 'path' column, or one path per line)")
+    parser.add_argument("--output", default="reclassify_results.csv", help="Results CSV (default: %(default)s)")
+    parser.add_argument("--checkpoint", help="Progress file (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent documents (default: %(default)s)")
+    parser.add_argument("--api-url", help="API base URL (default: ETREPROF_API_URL or .streamlit/secrets.toml)")
+    parser.add_argument("--extraction", choices=[SPEED, QUALITY], default=SPEED)
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--no-preprocess", action="store_true", help="Send extracted text as is")
+    parser.add_argument("--retry-failed", action="store_true", help="Also reprocess documents that failed in a previous run")
+    args = parser.parse_args(argv)
+
+    if args.api_url:
+        os.environ["ETREPROF_API_URL"] = args.api_url
+
+    # Imports tardifs : utils lit l'URL de l'API à l'import
+    from utils import API_BASE_URL, convert_file_to_markdown
+    from classification import classify_document
+    from pipeline import iter_batch
+    from preprocessing import preprocess_text
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint.jsonl"
+    previous = load_checkpoint(checkpoint_path)
+    done_statuses = {"ok", "failed"} if not args.retry_failed else {"ok"}
+
+    sources = list(iter_sources(args.source))
+    todo = [(doc_id, path) for doc_id, path in sources if previous.get(doc_id, {}).get("status") not in done_statuses]
+    print(f"{len(sources)} documents, {len(sources) - len(todo)} already done, {len(todo)} to process")
+
+    def process(item):
+        doc_id, path = item
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            text = convert_file_to_markdown(f, preference=args.extraction)
+        if not args.no_preprocess:
+            text = preprocess_text(text, args.token_budget)["text"] or text
+        if not text.strip():
+            raise ValueError("No text extracted")
+        data = classify_document(API_BASE_URL, text)
+        return data, time.perf_counter() - started
+
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    try:
+        with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            for count, ((doc_id, path), result, error) in enumerate(iter_batch(todo, process, args.workers), 1):
+                record = {"id": doc_id, "path": path}
+                if error is not None:
+                    failures += 1
+                    record.update(status="failed", error=str(error))
+                else:
+                    data, seconds = result
+                    latencies.append(seconds)
+                    topic = data["topic_principal"]
+                    record.update(
+                        status="ok",
+                        label=topic["label"],
+                        confidence=topic["confidence"],
+                        sections=len(data.get("sections", [])),
+                        seconds=round(seconds, 3),
+                    )
+                checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                previous[doc_id] = record
+
+                elapsed = time.perf_counter() - started
+                rate = count / elapsed if elapsed else 0
+                eta = (len(todo) - count) / rate if rate else 0
+                print(f"\r[{count}/{len(todo)}] {rate:.2f} docs/s, ETA {eta:.0f}s, {failures} failed", end="", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("\nInterrupted: progress saved, run the same command again to resume.", file=sys.stderr)
+        return 130
+    print(file=sys.stderr)
+
+    # Le CSV final reprend tous les résultats connus, y compris ceux des exécutions précédentes
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for doc_id, _ in sources:
+            if doc_id in previous:
+                writer.writerow(previous[doc_id])
+
+    elapsed = time.perf_counter() - started
+    processed = len(todo)
+    print(f"Processed {processed} documents in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.2f} docs/s), {failures} failed")
+    if latencies:
+        print(f"Latency per document: p50 {percentile(latencies, 50):.2f}s, "
+              f"p95 {percentile(latencies, 95):.2f}s, max {max(latencies):.2f}s")
+    print(f"Results written to {args.output}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# regional.py
+# Agrégats académie × niveau sur l'instantané local des utilisateurs (user_snapshot.py) :
+# effectifs, moyennes (engagement, risque) et répartition par cluster, calculés par
+# np.bincount sur les codes de groupe, sans boucle sur les utilisateurs.
+import numpy as np
+import pandas as pd
+
+from cohorts import DEGREE_LABELS
+
+TEACHING_LEVEL = "niveaux_enseignes"
+DEGREE = "degre"
+
+
+def level_memberships(users, axis):
+    """[(libellé, masque des utilisateurs concernés)] pour chaque niveau de l'axe choisi.
+    Un utilisateur peut enseigner plusieurs niveaux : il compte alors dans chacun."""
+    if axis == DEGREE:
+        degrees = users[DEGREE]
+        return [(label, degrees == degree) for degree, label in DEGREE_LABELS.items()]
+    bits = users[TEACHING_LEVEL]
+    return [(level, (bits & (np.uint64(1) << np.uint64(j))) != 0)
+            for j, level in enumerate(users.dictionary(TEACHING_LEVEL))]
+
+
+def _by_academy(users, columns, values=None, mask=None):
+    codes, academies = users.group_codes("academie")
+    out_sums, out_counts = {}, {}
+    for label, member in columns:
+        selected = member if mask is None else member & mask
+        if values is not None:
+            selected = selected & ~np.isnan(values)
+        out_counts[label] = np.bincount(codes[selected], minlength=len(academies))
+        if values is not None:
+            out_sums[label] = np.bincount(codes[selected], weights=values[selected], minlength=len(academies))
+    counts = pd.DataFrame(out_counts, index=academies)
+    sums = pd.DataFrame(out_sums, index=academies) if values is not None else None
+    return counts, sums
+
+
+def academy_level_counts(users, axis=TEACHING_LEVEL, mask=None):
+    """Effectifs (académies × niveaux), sans les académies vides."""
+    counts, _ = _by_academy(users, level_memberships(users, axis), mask=mask)
+    return counts[counts.sum(axis=1) > 0]
+
+
+def academy_level_mean(users, values, axis=TEACHING_LEVEL, mask=None):
+    """Moyenne de `values` (un score par utilisateur) par académie × niveau ; NaN si la case est vide."""
+    counts, sums = _by_academy(users, level_memberships(users, axis), values, mask)
+    means = sums / counts.where(counts > 0)
+    return means[counts.sum(axis=1) > 0]
+
+
+def academy_cluster_share(users, cluster_names=None, mask=None):
+    """Part (%) de chaque cluster parmi les utilisateurs de chaque académie."""
+    cluster_codes, cluster_ids = users.group_codes("cluster_id")
+    cluster_names = cluster_names or {}
+    columns = [(cluster_names.get(cid) or ("Unassigned" if cid < 0 else f"Cluster {cid}"), cluster_codes == i)
+               for i, cid in enumerate(cluster_ids)]
+    counts, _ = _by_academy(users, columns, mask=mask)
+    counts = counts[counts.sum(axis=1) > 0]
+    return counts.div(counts.sum(axis=1), axis=0) * 100
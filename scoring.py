@@ -0,0 +1,92 @@
+# scoring.py
+# Scores d'engagement (0-10) et de risque de désengagement (0-100 %) calculés à partir des
+# variables de comportement (PROFILE_METRICS) : combinaison linéaire des variables
+# centrées-réduites passée dans une sigmoïde, pour un utilisateur ou toute une cohorte en
+# un seul produit matriciel. Les pondérations sont versionnées pour rester reproductibles.
+import numpy as np
+
+from clusters import PROFILE_METRICS
+
+# {version: {score: (poids dans l'ordre de PROFILE_METRICS, biais)}}
+# Ne jamais modifier une version publiée : en ajouter une nouvelle
+#
+# v1 : pondérations fixées à la main, pas apprises (aucun historique de désengagement n'est
+# disponible pour les ajuster). Règles suivies : activité et usage des contenus comptent le
+# plus, l'ouverture des emails un peu moins, le nombre de thèmes suivis et l'ancienneté peu ;
+# le risque en est le miroir, avec un biais négatif pour qu'un utilisateur moyen ne soit pas
+# « à risque » (environ 43 %). Elles ont été vérifiées uniquement en classant les cinq
+# profils de clusters de référence dans un ordre cohérent ; à recalibrer dès que des
+# départs réels observés permettent une régression logistique.
+WEIGHTS = {
+    "v1": {
+        "engagement": ((0.45, 0.25, 0.4, 0.2, 0.05), 0.0),
+        "churn": ((-0.5, -0.3, -0.4, -0.15, -0.1), -0.3),
+    },
+}
+DEFAULT_VERSION = "v1"
+
+# (seuil de risque en %, niveau, icône), du plus élevé au plus faible
+RISK_LEVELS = ((60, "High", "🔴"), (35, "Medium", "🟡"), (0, "Low", "🟢"))
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def profile_features(profile, fallback):
+    """Vecteur PROFILE_METRICS d'un profil utilisateur. Les variables absentes du profil
+    prennent la valeur de `fallback` (en général le profil moyen de son cluster).
+    Renvoie (vecteur, variables réellement lues dans le profil)."""
+    values, measured = [], []
+    for key, default in zip(PROFILE_METRICS, fallback):
+        value = profile.get(key)
+        if value is None:
+            values.append(default)
+        else:
+            values.append(float(value))
+            measured.append(key)
+    return np.array(values, dtype=np.float64), measured
+
+
+def risk_level(churn):
+    """(niveau, icône) d'un risque de désengagement en %."""
+    for threshold, level, icon in RISK_LEVELS:
+        if churn >= threshold:
+            return level, icon
+    return RISK_LEVELS[-1][1:]
+
+
+def risk_levels(churn):
+    """Niveaux de risque d'un tableau de scores, sans boucle Python."""
+    churn = np.asarray(churn)
+    return np.select([churn >= threshold for threshold, _, _ in RISK_LEVELS],
+                     [level for _, level, _ in RISK_LEVELS], RISK_LEVELS[-1][1])
+
+
+class EngagementScorer:
+    def __init__(self, mean, scale, version=DEFAULT_VERSION, scaling=None):
+        if version not in WEIGHTS:
+            raise ValueError(f"Unknown scoring weights version: {version}")
+        self.version = version
+        self.scaling = scaling
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.where(np.asarray(scale, dtype=np.float64) > 0, scale, 1.0)
+        weights = WEIGHTS[version]
+        # Une colonne par score : (variables, 2)
+        self._weights = np.column_stack([weights["engagement"][0], weights["churn"][0]])
+        self._bias = np.array([weights["engagement"][1], weights["churn"][1]])
+
+    @classmethod
+    def from_snapshot(cls, snapshot, version=DEFAULT_VERSION, users=None):
+        # Même référence de population que l'affectation locale aux clusters
+        mean, scale, scaling = snapshot.population_moments(users)
+        return cls(mean, scale, version, scaling=scaling)
+
+    def score(self, vectors):
+        """`vectors` : tableau (n, variables) ou un seul vecteur, dans l'ordre de PROFILE_METRICS.
+        Renvoie (engagement sur 10, risque de désengagement en %) ; une valeur manquante (NaN)
+        compte comme la moyenne de la population."""
+        Z = (np.atleast_2d(np.asarray(vectors, dtype=np.float64)) - self.mean) / self.scale
+        Z = np.nan_to_num(Z, nan=0.0)
+        scores = _sigmoid(Z @ self._weights + self._bias)
+        return scores[:, 0] * 10, scores[:, 1] * 100
@@ -0,0 +1,137 @@
+# similar_content.py
+# Index inversé BM25 sur les titres et textes du catalogue ÊtrePROF : retrouve en
+# quelques millisecondes les contenus existants les plus proches d'un document.
+# Les listes de postings sont des `array` compacts, extensibles sans reconstruction.
+import json
+import os
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from classification_cache import normalize_text
+
+K1 = 1.2
+B = 0.75
+# Le titre compte double dans les fréquences du document
+TITLE_BOOST = 2
+# Un document entier sert de requête : on garde ses termes les plus discriminants
+MAX_QUERY_TERMS = 64
+
+STOPWORDS = set("""
+les des une est dans pour par sur avec que qui aux ces ses son sont pas plus
+mais ont leur leurs elle ils elles nous vous cette entre comme tout tous
+être avoir fait faire peut aussi même sans lors dont très the and for with
+""".split())
+
+
+def tokenize(text):
+    return [w for w in normalize_text(text).split() if len(w) > 2 and w not in STOPWORDS]
+
+
+class SimilarContentIndex:
+    def __init__(self):
+        self._terms = {}
+        self._postings_docs = []
+        self._postings_tfs = []
+        self._doc_lengths = array("I")
+        self._contents = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._contents)
+
+    def content_ids(self):
+        return {str(content.get("id")) for content in self._contents}
+
+    def add(self, title, text, content):
+        """Ajoute un contenu ; `content` (id, title, url, type...) est renvoyé tel quel par `query`."""
+        counts = Counter(tokenize(text or ""))
+        for token in tokenize(title or ""):
+            counts[token] += TITLE_BOOST
+
+        with self._lock:
+            doc = len(self._contents)
+            self._contents.append(content)
+            self._doc_lengths.append(sum(counts.values()))
+            for token, tf in counts.items():
+                term = self._terms.get(token)
+                if term is None:
+                    term = self._terms[token] = len(self._postings_docs)
+                    self._postings_docs.append(array("I"))
+                    self._postings_tfs.append(array("I"))
+                self._postings_docs[term].append(doc)
+                self._postings_tfs[term].append(tf)
+
+    def query(self, text, k=5):
+        """Top-k contenus les plus proches de `text`, avec leur score BM25."""
+        with self._lock:
+            n_docs = len(self._contents)
+            if not n_docs:
+                return []
+            doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32)
+            average_length = doc_lengths.mean() or 1.0
+            norms = K1 * (1 - B + B * doc_lengths / average_length)
+
+            query_terms = []
+            for token, count in Counter(tokenize(text)).items():
+                term = self._terms.get(token)
+                if term is not None:
+                    df = len(self._postings_docs[term])
+                    idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    query_terms.append((idf * (1 + np.log(count)), idf, term))
+            query_terms.sort(reverse=True)
+
+            scores = np.zeros(n_docs, dtype=np.float32)
+            for _, idf, term in query_terms[:MAX_QUERY_TERMS]:
+                docs = np.frombuffer(self._postings_docs[term], dtype=np.uint32)
+                tfs = np.frombuffer(self._postings_tfs[term], dtype=np.uint32).astype(np.float32)
+                scores[docs] += idf * tfs * (K1 + 1) / (tfs + norms[docs])
+            contents = list(self._contents)
+
+        k = min(k, n_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**contents[i], "score": round(float(scores[i]), 2)} for i in top if scores[i] > 0]
+
+    def save(self, path):
+        # Format compact : postings concaténés (CSR) + vocabulaire + métadonnées JSON
+        with self._lock:
+            terms = sorted(self._terms, key=self._terms.get)
+            offsets = np.cumsum([0] + [len(docs) for docs in self._postings_docs], dtype=np.int64)
+            docs = np.concatenate([np.frombuffer(d, dtype=np.uint32) for d in self._postings_docs] or [np.empty(0, np.uint32)])
+            tfs = np.concatenate([np.frombuffer(t, dtype=np.uint32) for t in self._postings_tfs] or [np.empty(0, np.uint32)])
+            doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).copy()
+            contents = json.dumps(self._contents, ensure_ascii=False)
+
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            terms=np.array("\n".join(terms)),
+            offsets=offsets,
+            docs=docs.astype(np.uint16 if len(doc_lengths) < 65536 else np.uint32),
+            tfs=np.minimum(tfs, 65535).astype(np.uint16),
+            doc_lengths=doc_lengths,
+            contents=np.array(contents),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        if not path or not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            terms = str(data["terms"]).split("\n") if str(data["terms"]) else []
+            offsets = data["offsets"]
+            docs = data["docs"].astype(np.uint32)
+            tfs = data["tfs"].astype(np.uint32)
+            index._doc_lengths = array("I", data["doc_lengths"].astype(np.uint32).tobytes())
+            index._contents = json.loads(str(data["contents"]))
+        for term, token in enumerate(terms):
+            index._terms[token] = term
+            start, end = offsets[term], offsets[term + 1]
+            index._postings_docs.append(array("I", docs[start:end].tobytes()))
+            index._postings_tfs.append(array("I", tfs[start:end].tobytes()))
+        return index
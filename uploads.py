@@ -0,0 +1,115 @@
+# uploads.py
+# Gestion mémoire des fichiers uploadés : plafonds de taille par type, copie vers un
+# fichier temporaire au-delà d'un seuil, décodage incrémental avec détection d'encodage.
+import codecs
+import shutil
+import threading
+from contextlib import contextmanager
+from tempfile import SpooledTemporaryFile
+
+MB = 1024 * 1024
+
+# Au-delà de ce seuil, la copie de travail part sur disque au lieu de rester en RAM
+SPOOL_THRESHOLD = 2 * MB
+CHUNK_SIZE = 64 * 1024
+
+# Plafonds par défaut, surchargeables via st.secrets (section [uploads])
+DEFAULT_SIZE_CAPS = {
+    "txt": 5 * MB,
+    "md": 5 * MB,
+    "pdf": 50 * MB,
+    "docx": 25 * MB,
+}
+
+# Nombre de conversions simultanées pour tout le serveur (toutes sessions confondues) :
+# le pic mémoire reste borné même si plusieurs utilisateurs uploadent en même temps
+MAX_CONCURRENT_CONVERSIONS = 2
+_conversion_slots = threading.BoundedSemaphore(MAX_CONCURRENT_CONVERSIONS)
+
+LEGACY_ENCODINGS = ["cp1252", "latin_1", "iso8859_15", "mac_roman", "cp850"]
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def file_size(uploaded_file):
+    """Taille du fichier sans le lire (UploadedFile expose `size`, sinon seek/tell)."""
+    size = getattr(uploaded_file, "size", None)
+    if size is not None:
+        return size
+    position = uploaded_file.tell()
+    uploaded_file.seek(0, 2)
+    size = uploaded_file.tell()
+    uploaded_file.seek(position)
+    return size
+
+
+def check_upload_size(uploaded_file, suffix, size_caps=None):
+    """Refuse le fichier avant tout parsing s'il dépasse le plafond de son type."""
+    caps = size_caps or DEFAULT_SIZE_CAPS
+    cap = caps.get(suffix)
+    size = file_size(uploaded_file)
+    if cap is not None and size > cap:
+        raise ValueError(
+            f"File too large: {size / MB:.1f} MB (max {cap / MB:.0f} MB for .{suffix} files)"
+        )
+    return size
+
+
+@contextmanager
+def conversion_slot():
+    with _conversion_slots:
+        yield
+
+
+@contextmanager
+def spooled_copy(uploaded_file, threshold=SPOOL_THRESHOLD):
+    """Copie le fichier par blocs dans un SpooledTemporaryFile (RAM puis disque)."""
+    spooled = SpooledTemporaryFile(max_size=threshold)
+    try:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, spooled, CHUNK_SIZE)
+        spooled.seek(0)
+        yield spooled
+    finally:
+        spooled.close()
+
+
+def detect_encoding(sample):
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    try:
+        # final=False : un caractère multi-octets coupé en fin d'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return "cp1252"
+
+    # Contenus francophones : on restreint la détection aux encodages occidentaux courants
+    best = from_bytes(sample, cp_isolation=LEGACY_ENCODINGS).best()
+    return best.encoding if best else "cp1252"
+
+
+def decode_stream(fileobj, encoding=None, chunk_size=CHUNK_SIZE):
+    """Décode un flux binaire bloc par bloc, sans jamais tenir tous les octets en mémoire."""
+    head = fileobj.read(chunk_size)
+    encoding = encoding or detect_encoding(head)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    parts = [decoder.decode(head)]
+    for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+        parts.append(decoder.decode(chunk))
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
@@ -0,0 +1,515 @@
+# user_snapshot.py
+# Instantané colonnaire de toute la base utilisateurs (profils, clusters, métriques
+# d'engagement) pour les analyses de population sans appel à l'API. Une colonne = un
+# fichier .npy ouvert en mémoire partagée (mmap, lecture seule) : les pages du système
+# sont partagées par toutes les sessions et tous les processus. Les textes sont encodés
+# par dictionnaire, les niveaux enseignés en masque de bits.
+#
+# Organisation du dossier : une base complète, des segments de changements ajoutés par
+# user_sync.py, et un manifeste par version qui les liste. Le fichier CURRENT désigne le
+# manifeste en service ; il est remplacé atomiquement (os.replace) : un lecteur voit
+# l'ancienne version ou la nouvelle, jamais un état intermédiaire.
+#
+#   python user_snapshot.py build users_export.parquet --output user_snapshot
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from clusters import PROFILE_METRICS
+from whatif import load_feature_matrix
+
+DEFAULT_PATH = "user_snapshot"
+CURRENT_FILE = "CURRENT"
+COLUMNS_FILE = "columns.json"
+LOCK_FILE = "LOCK"
+DELETED = "deleted"
+
+PLAIN = "plain"
+DICTIONARY = "dictionary"
+BITMASK = "bitmask"
+
+# Colonnes numériques : (type NumPy, valeur manquante)
+NUMERIC_COLUMNS = {
+    "user_id": (np.int64, None),
+    "cluster_id": (np.int16, -1),
+    "degre": (np.int8, 0),
+    **{metric: (np.float32, np.nan) for metric in PROFILE_METRICS},
+    # Secondes depuis l'epoch : user_sync.py écarte les changements déjà appliqués
+    "updated_at": (np.float64, np.nan),
+}
+DICTIONARY_COLUMNS = ("academie",)
+BITMASK_COLUMNS = ("niveaux_enseignes",)
+MAX_BITMASK_VALUES = 64
+
+# Compactage (fusion des segments dans une nouvelle base) au-delà de ces seuils
+COMPACT_RATIO = 0.1
+MAX_SEGMENTS = 48
+# En dessous de cette taille de base, chaque synchronisation compacte : réécrire la base
+# coûte moins qu'une fusion en mémoire dans chaque processus lecteur (hors mmap partagé)
+COMPACT_ALWAYS_ROWS = 1_000_000
+# Versions conservées sur disque (les plus anciennes peuvent encore être lues)
+KEEP_VERSIONS = 3
+
+
+def _split_values(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [str(v).strip().lower() for v in value if str(v).strip()]
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [v.strip().lower() for v in str(value).split(",") if v.strip()]
+
+
+def updated_at_seconds(values):
+    """Horodatages de mise à jour (epoch en secondes ou dates ISO) en secondes depuis l'epoch."""
+    numeric = pd.to_numeric(values, errors="coerce")
+    if numeric.notna().all():
+        return numeric.to_numpy(dtype=np.float64)
+    # Pas d'hypothèse sur la résolution interne (ns, µs ou s selon la version de pandas)
+    timestamps = pd.Series(pd.to_datetime(values, utc=True))
+    return ((timestamps - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64)
+
+
+def encode_columns(frame):
+    """{nom: tableau NumPy} et {nom: métadonnées} à partir d'un export utilisateurs
+    (une ligne par utilisateur ; les colonnes absentes sont considérées manquantes).
+    Pour un même user_id, la dernière ligne (ou la plus récente selon updated_at) l'emporte."""
+    frame = frame.rename(columns={"cluster": "cluster_id"})
+    if "updated_at" in frame.columns:
+        frame = frame.assign(updated_at=updated_at_seconds(frame["updated_at"])).sort_values("updated_at", kind="stable")
+    frame = frame.drop_duplicates("user_id", keep="last").sort_values("user_id")
+    arrays, columns = {}, {}
+
+    for name, (dtype, missing) in NUMERIC_COLUMNS.items():
+        if name in frame.columns:
+            values = pd.to_numeric(frame[name], errors="coerce")
+        else:
+            values = pd.Series(np.nan, index=frame.index)
+        if missing is not None:
+            values = values.fillna(missing)
+        arrays[name] = values.to_numpy(dtype=dtype)
+        columns[name] = {"kind": PLAIN, "dtype": np.dtype(dtype).str, "missing": None if missing is None else float(missing)}
+
+    for name in DICTIONARY_COLUMNS:
+        values = frame[name] if name in frame.columns else pd.Series(None, index=frame.index, dtype=object)
+        codes, dictionary = pd.factorize(values.astype("string"), sort=True)
+        arrays[name] = codes.astype(np.int16)  # -1 : manquant
+        columns[name] = {"kind": DICTIONARY, "dtype": np.dtype(np.int16).str, "dictionary": [str(v) for v in dictionary]}
+
+    for name in BITMASK_COLUMNS:
+        values = frame[name] if name in frame.columns else pd.Series(None, index=frame.index, dtype=object)
+        split = [_split_values(value) for value in values]
+        dictionary = sorted({v for vs in split for v in vs})
+        if len(dictionary) > MAX_BITMASK_VALUES:
+            raise ValueError(f"{name}: {len(dictionary)} distinct values, at most {MAX_BITMASK_VALUES} supported")
+        exploded = pd.Series(split).explode().dropna()
+        codes = pd.Categorical(exploded, categories=dictionary).codes.astype(np.uint64)
+        mask = np.zeros(len(split), dtype=np.uint64)
+        np.bitwise_or.at(mask, exploded.index.to_numpy(), np.uint64(1) << codes)
+        arrays[name] = mask
+        columns[name] = {"kind": BITMASK, "dtype": np.dtype(np.uint64).str, "dictionary": dictionary}
+
+    if DELETED in frame.columns:
+        arrays[DELETED] = frame[DELETED].fillna(False).astype(bool).to_numpy()
+    return arrays, columns
+
+
+def _complete(arrays, columns):
+    """Ajoute les colonnes numériques absentes (instantané construit avant leur ajout),
+    remplies avec leur valeur manquante."""
+    length = len(arrays["user_id"])
+    arrays, columns = dict(arrays), dict(columns)
+    for name, (dtype, missing) in NUMERIC_COLUMNS.items():
+        if name not in columns:
+            arrays[name] = np.full(length, missing, dtype=dtype)
+            columns[name] = {"kind": PLAIN, "dtype": np.dtype(dtype).str, "missing": float(missing)}
+    return arrays, columns
+
+
+def _union_columns(all_columns):
+    """Métadonnées communes à plusieurs jeux de colonnes : dictionnaires réunis et triés."""
+    union = {}
+    for name, meta in all_columns[0].items():
+        if meta["kind"] == PLAIN:
+            union[name] = meta
+        else:
+            dictionary = sorted({v for columns in all_columns for v in columns[name]["dictionary"]})
+            if meta["kind"] == BITMASK and len(dictionary) > MAX_BITMASK_VALUES:
+                raise ValueError(f"{name}: {len(dictionary)} distinct values, at most {MAX_BITMASK_VALUES} supported")
+            union[name] = {**meta, "dictionary": dictionary}
+    return union
+
+
+def _remap(arrays, columns, target):
+    """Réencode les colonnes dictionnaire / masque de bits selon les dictionnaires de `target`.
+    Les colonnes déjà alignées sont renvoyées telles quelles (sans copie d'un mmap)."""
+    out = dict(arrays)
+    for name, meta in columns.items():
+        source, wanted = meta.get("dictionary"), target[name].get("dictionary")
+        if meta["kind"] == PLAIN or source == wanted:
+            continue
+        positions = [wanted.index(v) for v in source]
+        if meta["kind"] == DICTIONARY:
+            # Le code -1 (manquant) tombe sur le dernier élément ajouté : -1
+            out[name] = np.array(positions + [-1], dtype=np.int16)[arrays[name]]
+        else:
+            remapped = np.zeros(len(arrays[name]), dtype=np.uint64)
+            for j, position in enumerate(positions):
+                remapped |= ((arrays[name] >> np.uint64(j)) & np.uint64(1)) << np.uint64(position)
+            out[name] = remapped
+    return out
+
+
+def merge_columns(base, segments):
+    """Applique les segments (dans l'ordre) à la base : chaque ligne d'un segment remplace
+    celle du même user_id, ou la supprime si elle est marquée `deleted`.
+    `base` et chaque segment : (arrays, columns). Renvoie (arrays, columns) triés par user_id."""
+    base = _complete(*base)
+    if not segments:
+        return base
+    segments = [_complete(*segment) for segment in segments]
+    columns = _union_columns([base[1]] + [segment_columns for _, segment_columns in segments])
+    merged = _remap(*base, columns)
+    for segment_arrays, segment_columns in segments:
+        segment = _remap(segment_arrays, segment_columns, columns)
+        kept = ~np.isin(merged["user_id"], segment["user_id"])
+        upserted = ~segment.get(DELETED, np.zeros(len(segment["user_id"]), dtype=bool))
+        merged = {name: np.concatenate([merged[name][kept], segment[name][upserted]]) for name in columns}
+    order = np.argsort(merged["user_id"], kind="stable")
+    return {name: values[order] for name, values in merged.items()}, columns
+
+
+def _write_columns(arrays, columns, directory):
+    # Écrit à côté puis renommé : le dossier n'apparaît que complet
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_directory, f"{name}.npy"), values)
+    with open(os.path.join(tmp_directory, COLUMNS_FILE), "w", encoding="utf-8") as f:
+        json.dump(columns, f, ensure_ascii=False)
+    # Reste d'une écriture interrompue avant publication : aucun manifeste ne le désigne
+    shutil.rmtree(directory, ignore_errors=True)
+    os.rename(tmp_directory, directory)
+
+
+def _read_columns(directory):
+    with open(os.path.join(directory, COLUMNS_FILE), encoding="utf-8") as f:
+        columns = json.load(f)
+    names = list(columns) + ([DELETED] if os.path.exists(os.path.join(directory, f"{DELETED}.npy")) else [])
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in names}, columns
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotStore:
+    """Écriture de l'instantané : un seul processus à la fois (fichier LOCK)."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+
+    def current(self):
+        """Manifeste en service, ou None si aucun instantané n'a été construit."""
+        version = read_version(self.path)
+        if version is None:
+            return None
+        with open(os.path.join(self.path, f"{version}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, manifest):
+        """(arrays, columns) de la version décrite par `manifest`. Sans segment, les colonnes
+        restent des mmap de la base ; sinon la fusion est faite en mémoire."""
+        base = _read_columns(os.path.join(self.path, manifest["base"]))
+        segments = [_read_columns(os.path.join(self.path, name)) for name in manifest["segments"]]
+        return merge_columns(base, segments)
+
+    def _lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        try:
+            return os.open(os.path.join(self.path, LOCK_FILE), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise RuntimeError(f"Another writer holds {os.path.join(self.path, LOCK_FILE)} "
+                               "(remove it if no sync is running)") from None
+
+    def _unlock(self, fd):
+        os.close(fd)
+        os.remove(os.path.join(self.path, LOCK_FILE))
+
+    def _publish(self, previous, base, segments, watermark):
+        sequence = (previous["sequence"] if previous else 0) + 1
+        manifest = {
+            "version": f"v{sequence:06d}",
+            "sequence": sequence,
+            "created_at": time.time(),
+            "watermark": watermark,
+            "base": base,
+            "segments": segments,
+        }
+        _write_atomic(os.path.join(self.path, f"{manifest['version']}.json"), json.dumps(manifest))
+        # Bascule : les lecteurs suivants ouvrent la nouvelle version
+        _write_atomic(os.path.join(self.path, CURRENT_FILE), manifest["version"])
+        self._collect_garbage(manifest["sequence"])
+        return manifest
+
+    def _collect_garbage(self, sequence):
+        # Les lecteurs d'une ancienne version gardent leurs mmap : sous POSIX, un fichier
+        # supprimé reste lisible tant qu'il est ouvert
+        kept = set()
+        for name in os.listdir(self.path):
+            stem, ext = os.path.splitext(name)
+            if ext == ".json" and stem.startswith("v") and stem[1:].isdigit():
+                if int(stem[1:]) > sequence - KEEP_VERSIONS:
+                    with open(os.path.join(self.path, name), encoding="utf-8") as f:
+                        manifest = json.load(f)
+                    kept.update([manifest["base"], *manifest["segments"]])
+                else:
+                    os.remove(os.path.join(self.path, name))
+        for name in os.listdir(self.path):
+            if name.startswith(("base-", "seg-")) and name not in kept:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def build(self, frame, watermark=None):
+        """Nouvelle base complète à partir d'un export ; remplace les segments existants."""
+        fd = self._lock()
+        try:
+            previous = self.current()
+            if watermark is None:
+                watermark = float(updated_at_seconds(frame["updated_at"]).max()) if "updated_at" in frame else time.time()
+            arrays, columns = encode_columns(frame)
+            arrays.pop(DELETED, None)
+            base = f"base-{(previous['sequence'] if previous else 0) + 1:06d}"
+            _write_columns(arrays, columns, os.path.join(self.path, base))
+            return self._publish(previous, base, [], watermark)
+        finally:
+            self._unlock(fd)
+
+    def apply_changes(self, frame, watermark):
+        """Ajoute un segment avec les utilisateurs de `frame` (lignes complètes, colonne `deleted`
+        optionnelle) et publie une nouvelle version ; compacte au-delà des seuils."""
+        fd = self._lock()
+        try:
+            previous = self.current()
+            if previous is None:
+                raise FileNotFoundError(f"No snapshot in {self.path}: build one first")
+            segments = list(previous["segments"])
+            if len(frame):
+                arrays, columns = encode_columns(frame)
+                segment = f"seg-{previous['sequence'] + 1:06d}"
+                _write_columns(arrays, columns, os.path.join(self.path, segment))
+                segments.append(segment)
+
+            base = previous["base"]
+            if self._needs_compaction(base, segments):
+                base, segments = self._compact(previous, base, segments)
+            return self._publish(previous, base, segments, watermark)
+        finally:
+            self._unlock(fd)
+
+    def compact(self):
+        """Fusionne tous les segments dans une nouvelle base."""
+        fd = self._lock()
+        try:
+            previous = self.current()
+            if previous is None or not previous["segments"]:
+                return previous
+            base, segments = self._compact(previous, previous["base"], previous["segments"])
+            return self._publish(previous, base, segments, previous["watermark"])
+        finally:
+            self._unlock(fd)
+
+    def _needs_compaction(self, base, segments):
+        if len(segments) > MAX_SEGMENTS:
+            return True
+        base_rows = len(np.load(os.path.join(self.path, base, "user_id.npy"), mmap_mode="r"))
+        if base_rows <= COMPACT_ALWAYS_ROWS:
+            return True
+        segment_rows = sum(len(np.load(os.path.join(self.path, name, "user_id.npy"), mmap_mode="r")) for name in segments)
+        return segment_rows > COMPACT_RATIO * max(base_rows, 1)
+
+    def _compact(self, previous, base, segments):
+        arrays, columns = self.load({"base": base, "segments": segments})
+        compacted = f"base-{previous['sequence'] + 1:06d}"
+        _write_columns(arrays, columns, os.path.join(self.path, compacted))
+        return compacted, []
+
+
+def build_snapshot(frame, path=DEFAULT_PATH):
+    return SnapshotStore(path).build(frame)["version"]
+
+
+def read_version(path=DEFAULT_PATH):
+    """Version en service dans `path` (lecture du seul fichier CURRENT), ou None."""
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class UserSnapshot:
+    """Lecture seule. Les filtres renvoient des masques booléens, combinables avec & et |."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        store = SnapshotStore(path)
+        manifest = store.current()
+        if manifest is None:
+            raise FileNotFoundError(f"No user snapshot in {path}")
+        self.version = manifest["version"]
+        self.created_at = manifest["created_at"]
+        self.watermark = manifest["watermark"]
+        self.segments = len(manifest["segments"])
+        self._arrays, self.columns = store.load(manifest)
+        self._groups = {}
+        self._moments = None
+
+    def __len__(self):
+        return len(self._arrays["user_id"])
+
+    def __repr__(self):
+        return f"UserSnapshot(version={self.version!r}, users={len(self)})"
+
+    def __getitem__(self, name):
+        return self._arrays[name]
+
+    def dictionary(self, name):
+        return self.columns[name].get("dictionary", [])
+
+    # -- Filtres -----------------------------------------------------------------
+
+    def _codes(self, name, values):
+        dictionary = self.dictionary(name)
+        return [dictionary.index(v) for v in values if v in dictionary]
+
+    def mask(self, cluster_ids=None, academies=None, degres=None, levels=None, anciennete=None):
+        """Masque des utilisateurs qui vérifient tous les critères donnés. `levels` : au moins
+        un des niveaux ; `anciennete` : (min, max) inclus."""
+        mask = np.ones(len(self), dtype=bool)
+        if cluster_ids is not None:
+            mask &= np.isin(self["cluster_id"], list(cluster_ids))
+        if academies is not None:
+            mask &= np.isin(self["academie"], self._codes("academie", academies))
+        if degres is not None:
+            mask &= np.isin(self["degre"], list(degres))
+        if levels is not None:
+            bits = np.uint64(0)
+            for code in self._codes("niveaux_enseignes", levels):
+                bits |= np.uint64(1) << np.uint64(code)
+            mask &= (self["niveaux_enseignes"] & bits) != 0
+        if anciennete is not None:
+            low, high = anciennete
+            mask &= (self["anciennete"] >= low) & (self["anciennete"] <= high)
+        return mask
+
+    def lookup(self, user_id):
+        """Ligne décodée d'un utilisateur (recherche dichotomique sur user_id trié), ou None."""
+        ids = self["user_id"]
+        position = int(np.searchsorted(ids, user_id))
+        if position == len(ids) or ids[position] != user_id:
+            return None
+        return self.rows(np.array([position]))[0]
+
+    def rows(self, selection):
+        """Lignes décodées (liste de dicts) pour un masque ou des positions."""
+        positions = np.flatnonzero(selection) if np.asarray(selection).dtype == bool else np.asarray(selection)
+        academies = self.dictionary("academie")
+        levels = self.dictionary("niveaux_enseignes")
+        out = []
+        for i in positions:
+            row = {name: self[name][i].item() for name in NUMERIC_COLUMNS}
+            code = int(self["academie"][i])
+            row["academie"] = academies[code] if code >= 0 else None
+            bits = int(self["niveaux_enseignes"][i])
+            row["niveaux_enseignes"] = [level for j, level in enumerate(levels) if bits >> j & 1]
+            out.append(row)
+        return out
+
+    # -- Agrégats ----------------------------------------------------------------
+
+    def group_codes(self, name):
+        """(codes 0..k-1 par utilisateur, libellés des k groupes) ; calculé une fois par colonne."""
+        if name not in self._groups:
+            if self.columns[name]["kind"] == DICTIONARY:
+                labels = self.dictionary(name) + ["Not specified"]
+                codes = np.where(self[name] >= 0, self[name], len(labels) - 1)
+            else:
+                labels, codes = np.unique(self[name], return_inverse=True)
+                labels = labels.tolist()
+            self._groups[name] = (codes.astype(np.int32), labels)
+        return self._groups[name]
+
+    def counts(self, name, mask=None):
+        """Effectif par valeur de `name` (colonne numérique ou encodée par dictionnaire)."""
+        codes, labels = self.group_codes(name)
+        counts = np.bincount(codes if mask is None else codes[mask], minlength=len(labels))
+        series = pd.Series(counts, index=labels, name="Users")
+        return series[series > 0]
+
+    def level_counts(self, mask=None):
+        """Effectif par niveau enseigné (un utilisateur compte pour chacun de ses niveaux)."""
+        bits = self["niveaux_enseignes"] if mask is None else self["niveaux_enseignes"][mask]
+        levels = self.dictionary("niveaux_enseignes")
+        counts = [int(np.count_nonzero(bits & (np.uint64(1) << np.uint64(j)))) for j in range(len(levels))]
+        return pd.Series(counts, index=levels, name="Users")
+
+    def group_mean(self, name, values, mask=None):
+        """Moyenne de `values` (tableau aligné sur les utilisateurs) par valeur de `name`, NaN ignorés."""
+        codes, labels = self.group_codes(name)
+        valid = ~np.isnan(values)
+        if mask is not None:
+            valid &= mask
+        sums = np.bincount(codes[valid], weights=values[valid], minlength=len(labels))
+        counts = np.bincount(codes[valid], minlength=len(labels))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.Series(sums / counts, index=labels).dropna()
+
+    def moments(self):
+        """(moyenne, écart-type) de chaque PROFILE_METRICS sur tous les utilisateurs, NaN
+        ignorés (NaN si la métrique n'est jamais renseignée) ; calculé une fois par version."""
+        if self._moments is None:
+            mean, scale = np.full(len(PROFILE_METRICS), np.nan), np.full(len(PROFILE_METRICS), np.nan)
+            for j, metric in enumerate(PROFILE_METRICS):
+                values = self[metric][~np.isnan(self[metric])].astype(np.float64)
+                if values.size:
+                    mean[j], scale[j] = values.mean(), values.std()
+            self._moments = (mean, scale)
+        return self._moments
+
+    def features(self, mask=None):
+        """Matrice (utilisateurs, PROFILE_METRICS) en float64, pour l'affectation ou les scores."""
+        matrix = np.column_stack([self[metric] for metric in PROFILE_METRICS]).astype(np.float64)
+        return matrix if mask is None else matrix[mask]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the local columnar user snapshot.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build")
+    build_parser.add_argument("source", help="CSV or Parquet export, one row per user")
+    build_parser.add_argument("--output", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    frame = load_feature_matrix(args.source)
+    if "user_id" not in frame.columns:
+        print("The export needs a user_id column", file=sys.stderr)
+        return 1
+    version = build_snapshot(frame, args.output)
+    print(f"Snapshot {version}: {frame['user_id'].nunique():,} users in {time.perf_counter() - started:.1f}s -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
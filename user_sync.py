@@ -0,0 +1,132 @@
+# user_sync.py
+# Synchronisation incrémentale de l'instantané utilisateurs (user_snapshot.py) : seuls les
+# utilisateurs modifiés depuis le filigrane (watermark, plus grand updated_at déjà appliqué)
+# sont récupérés, puis ajoutés en segment et publiés atomiquement. Les segments sont
+# fusionnés dans une nouvelle base au-delà d'un seuil, ou à chaque passage tant que la
+# base est petite (compactage) : les lecteurs restent alors sur des mmap partagés.
+#
+# À lancer périodiquement (cron, tâche planifiée), par exemple toutes les 15 minutes :
+#
+#   python user_sync.py --changes users_changes.parquet
+#   python user_sync.py --api-url https://...
+#   python user_sync.py --compact
+import argparse
+import sys
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import requests
+
+from user_snapshot import DEFAULT_PATH, SnapshotStore, updated_at_seconds
+from whatif import load_feature_matrix
+
+CHANGES_ENDPOINT = "/users/changes"
+PAGE_SIZE = 5000
+REQUEST_TIMEOUT = 60
+# Les changements validés tardivement côté backend peuvent porter un updated_at un peu
+# antérieur au filigrane : on relit cette fenêtre (les lignes déjà appliquées sont écartées)
+OVERLAP_SECONDS = 60
+
+
+def file_changes(path, since):
+    """Changements depuis `since` dans un export CSV / Parquet (colonne updated_at obligatoire)."""
+    frame = load_feature_matrix(path)
+    return frame[updated_at_seconds(frame["updated_at"]) >= since]
+
+
+def api_changes(api_base_url, since, endpoint=CHANGES_ENDPOINT, page_size=PAGE_SIZE):
+    """Changements depuis `since`, page par page : GET {endpoint}?since=&limit=&cursor=
+    doit renvoyer {"success": true, "users": [...], "next_cursor": ...}."""
+    rows, cursor = [], None
+    while True:
+        params = {"since": since, "limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = requests.get(f"{api_base_url}{endpoint}", params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("success"):
+            raise RuntimeError(result.get("error", "Unable to fetch user changes"))
+        rows.extend(result.get("users", []))
+        cursor = result.get("next_cursor")
+        if not cursor:
+            return pd.DataFrame(rows)
+
+
+def drop_applied(changes, applied):
+    """Écarte les lignes déjà reflétées par l'instantané (`applied` : colonnes triées par
+    user_id) : même updated_at ou plus ancien, ou suppression d'un utilisateur absent.
+    Sans ce filtre, la fenêtre de recouvrement republierait les mêmes lignes à chaque passage."""
+    ids = pd.to_numeric(changes["user_id"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    changed_at = updated_at_seconds(changes["updated_at"])
+    applied_ids = applied["user_id"]
+    if len(applied_ids):
+        positions = np.minimum(np.searchsorted(applied_ids, ids), len(applied_ids) - 1)
+        known = applied_ids[positions] == ids
+        applied_at = np.where(known, applied["updated_at"][positions], np.nan)
+    else:
+        known = np.zeros(len(ids), dtype=bool)
+        applied_at = np.full(len(ids), np.nan)
+    # Une comparaison avec NaN (date inconnue dans l'instantané) est fausse : la ligne est gardée
+    already = known & (applied_at >= changed_at)
+    if "deleted" in changes.columns:
+        already |= ~known & changes["deleted"].fillna(False).astype(bool).to_numpy()
+    return changes[~already]
+
+
+def sync(store, fetch_changes):
+    """Applique les changements renvoyés par `fetch_changes(since)` (DataFrame avec updated_at).
+    Renvoie (manifeste en service, nombre de lignes appliquées)."""
+    current = store.current()
+    if current is None:
+        raise FileNotFoundError(f"No snapshot in {store.path}: build one first")
+
+    changes = fetch_changes(current["watermark"] - OVERLAP_SECONDS)
+    if not len(changes):
+        return current, 0
+    if "updated_at" not in changes.columns:
+        raise ValueError("Changes need an updated_at column")
+
+    # La fenêtre de recouvrement rattrape les validations tardives ; les lignes déjà
+    # appliquées sont écartées pour ne pas publier de version inutile
+    changes = drop_applied(changes, store.load(current)[0])
+    if not len(changes):
+        return current, 0
+    latest = max(float(updated_at_seconds(changes["updated_at"]).max()), current["watermark"])
+    return store.apply_changes(changes, latest), len(changes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply user changes to the local snapshot.")
+    parser.add_argument("--snapshot", default=DEFAULT_PATH)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--changes", help="CSV or Parquet export of changed users (updated_at column)")
+    source.add_argument("--api-url", help=f"Backend base URL, changes read from {CHANGES_ENDPOINT}")
+    source.add_argument("--compact", action="store_true", help="Merge all segments into a new base")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.snapshot)
+    started = time.perf_counter()
+    try:
+        if args.compact:
+            manifest, applied = store.compact(), 0
+        elif args.changes:
+            manifest, applied = sync(store, partial(file_changes, args.changes))
+        else:
+            manifest, applied = sync(store, partial(api_changes, args.api_url))
+    except (FileNotFoundError, RuntimeError, ValueError, requests.RequestException) as e:
+        print(f"Sync failed: {e}", file=sys.stderr)
+        return 1
+
+    if manifest is None:
+        print(f"No snapshot in {args.snapshot}: build one first", file=sys.stderr)
+        return 1
+    print(f"{applied:,} changed users applied in {time.perf_counter() - started:.1f}s -> "
+          f"{manifest['version']} ({len(manifest['segments'])} segments)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
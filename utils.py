@@ -1,10 +1,37 @@
 # utils.py
+import os
 import requests
 import streamlit as st
-import pdfplumber
-import mammoth
+from extraction import QUALITY, extract_text
+from archives import iter_archive_members
+from uploads import MB, DEFAULT_SIZE_CAPS, check_upload_size, conversion_slot, spooled_copy
+from jobs import JobManager, SUCCEEDED, FAILED, CANCELLED
+from clusters import ClusterSnapshot, USER_MOMENTS
+from cluster_history import ClusterHistory, DEFAULT_DIRECTORY as CLUSTER_HISTORY_DIRECTORY
+from cohorts import ProfileFetcher
+from user_snapshot import UserSnapshot, DEFAULT_PATH as USER_SNAPSHOT_PATH, read_version
+from scoring import EngagementScorer, DEFAULT_VERSION as SCORING_VERSION
+from assignment import CentroidAssigner
+from exports import CSV, PARQUET, MIME_TYPES, export_rows, parquet_available
+
+# ETREPROF_API_URL permet d'utiliser ces fonctions hors Streamlit (scripts, CLI)
+API_BASE_URL = os.environ.get("ETREPROF_API_URL") or st.secrets["api"]["API_URL"]
+
+
+def get_setting(section, key, default=None):
+    # Paramètre optionnel de .streamlit/secrets.toml, avec valeur par défaut
+    try:
+        return st.secrets[section][key]
+    except Exception:
+        return default
+
+
+# Plafonds d'upload en Mo, ex. dans secrets.toml : [uploads] max_mb = { pdf = 20 }
+UPLOAD_SIZE_CAPS = {
+    **DEFAULT_SIZE_CAPS,
+    **{suffix: int(float(mb) * MB) for suffix, mb in get_setting("uploads", "max_mb", {}).items()},
+}
 
-API_BASE_URL = st.secrets["api"]["API_URL"]
 
 def call_api(endpoint, method="GET", data=None):
     try:
@@ -24,19 +51,173 @@ def call_api(endpoint, method="GET", data=None):
         return None
 
 
-def convert_file_to_markdown(uploaded_file) -> str:
+def convert_file_to_markdown(uploaded_file, preference=QUALITY) -> str:
     suffix = uploaded_file.name.split('.')[-1].lower()
+    check_upload_size(uploaded_file, suffix, UPLOAD_SIZE_CAPS)
+
+    with conversion_slot(), spooled_copy(uploaded_file) as working_copy:
+        return extract_text(working_copy, suffix, preference)
+
+
+def convert_archive_to_markdown(archive_file, preference=QUALITY):
+    """Convertit un à un les fichiers d'une archive ZIP : génère (nom, texte, erreur)."""
+    for name, member, skipped in iter_archive_members(archive_file, UPLOAD_SIZE_CAPS):
+        if skipped:
+            yield name, None, skipped
+            continue
+
+        suffix = name.split('.')[-1].lower()
+        try:
+            with conversion_slot():
+                text = extract_text(member, suffix, preference)
+        except Exception as e:
+            yield name, None, str(e)
+            continue
+        yield name, text, None
+
+
+@st.cache_resource
+def get_job_manager():
+    # Partagé par toutes les sessions : une tâche survit aux reruns et aux changements de page
+    manager = JobManager()
+    # Un recalcul publié invalide les données mises en cache (clusters, profils...)
+    manager.subscribe(lambda job: st.cache_data.clear())
+    return manager
+
+
+@st.cache_resource
+def get_profile_fetcher():
+    # Pool de connexions et cache de profils communs à toutes les sessions
+    return ProfileFetcher(API_BASE_URL)
+
+
+@st.cache_resource
+def get_cluster_history():
+    # Dossier configurable : [clusters] history_dir dans secrets.toml
+    return ClusterHistory(get_setting("clusters", "history_dir", CLUSTER_HISTORY_DIRECTORY))
+
+
+@st.cache_resource(ttl=300, show_spinner="Loading cluster data...")
+def _load_cluster_snapshot(generation):
+    clusters_data = call_api("/clusters")
+    if not clusters_data or not clusters_data.get("success"):
+        # Une exception n'est pas mise en cache : la prochaine exécution réessaiera
+        raise ValueError("Unable to load cluster data")
+    snapshot = ClusterSnapshot.from_api(clusters_data["clusters"])
+    # Chaque nouvelle version est archivée pour comparer les recalculs successifs
+    get_cluster_history().append(snapshot)
+    return snapshot
+
+
+def get_cluster_snapshot():
+    """Instantané des clusters partagé par toutes les sessions (None si l'API ne répond pas).
+    Rechargé toutes les 5 minutes et après chaque recalcul publié."""
+    try:
+        return _load_cluster_snapshot(get_job_manager().generation)
+    except ValueError:
+        return None
+
+
+@st.cache_resource(max_entries=2)
+def _open_user_snapshot(path, version):
+    # Une instance par version : ses colonnes mmap sont partagées par toutes les sessions
+    return UserSnapshot(path)
+
+
+def get_user_snapshot():
+    """Instantané local de la base utilisateurs ([users] snapshot_path dans secrets.toml),
+    ou None s'il n'a pas encore été construit (python user_snapshot.py build ...)."""
+    path = get_setting("users", "snapshot_path", USER_SNAPSHOT_PATH)
+    version = read_version(path)
+    return _open_user_snapshot(path, version) if version else None
+
+
+def get_scorer(snapshot):
+    """Scores d'engagement et de risque, relatifs à la population de l'instantané utilisateurs
+    (variables non réduites s'il n'existe pas encore, voir `scaling`).
+    Version des pondérations : [scoring] weights_version dans secrets.toml."""
+    return EngagementScorer.from_snapshot(snapshot, get_setting("scoring", "weights_version", SCORING_VERSION),
+                                          users=get_user_snapshot())
+
+
+def get_assigner(snapshot):
+    """Affectation locale aux clusters, réduite comme get_scorer()."""
+    return CentroidAssigner.from_snapshot(snapshot, users=get_user_snapshot())
+
+
+def scaling_label(scaling):
+    """Libellé affiché de l'origine des moyennes / écarts-types (clusters.population_moments)."""
+    if scaling == USER_MOMENTS:
+        return "standardized on the local user snapshot"
+    return "unscaled (no user snapshot yet)"
+
+
+@st.fragment(run_every=2)
+def _recompute_progress(job_id):
+    # Seul ce fragment est rejoué pendant le suivi, pas toute la page
+    job = get_job_manager().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    _, stage_label = job.stage()
+    st.progress(job.progress(), text=f"⏳ {stage_label}... about {job.eta():.0f}s left (job {job.id})")
+    if st.button("✖️ Cancel", key=f"cancel_{job.id}"):
+        job.cancel()
+        st.rerun()
+
+
+def recompute_clusters_panel():
+    """Bouton de recalcul des clusters et suivi de la tâche en arrière-plan.
+    L'ID de la tâche est gardé en session et dans l'URL (?job=...) pour survivre à un rechargement."""
+    manager = get_job_manager()
+    job_id = st.session_state.get("recompute_job") or st.query_params.get("job")
+    job = (manager.get(job_id) if job_id else None) or manager.active()
+
+    if job is None or job.done:
+        if st.button("Recompute clusters", type="primary", key="recompute_clusters"):
+            try:
+                job = manager.start_recompute(API_BASE_URL)
+            except RuntimeError as e:
+                st.warning(f"⚠️ {e}")
+            else:
+                st.session_state["recompute_job"] = job.id
+                st.query_params["job"] = job.id
+                st.rerun()
+
+    if job is None:
+        return
+    if not job.done:
+        _recompute_progress(job.id)
+    elif job.status == SUCCEEDED:
+        st.success(f"✅ Clusters recomputed successfully in {job.elapsed():.0f}s! Cluster data has been refreshed.")
+        st.write("### New cluster distribution:")
+        cols = st.columns(len(job.result) or 1)
+        for i, (cluster_key, count) in enumerate(job.result.items()):
+            with cols[i]:
+                st.metric(f"Cluster {cluster_key.split('_')[-1]}", f"{count:,}")
+    elif job.status == FAILED:
+        st.error(f"❌ Failed to recompute clusters: {job.error}")
+    elif job.status == CANCELLED:
+        st.info("Recompute cancelled: its result will be ignored.")
 
-    if suffix in ['txt', 'md']:
-        return uploaded_file.read().decode("utf-8")
 
-    elif suffix == 'pdf':
-        with pdfplumber.open(uploaded_file) as pdf:
-            return "\n\n".join([page.extract_text() for page in pdf.pages])
+def _export_payload(rows_factory, fieldnames, fmt):
+    with export_rows(rows_factory(), fieldnames, fmt) as out:
+        return out.read()
 
-    elif suffix == 'docx':
-        result = mammoth.convert_to_markdown(uploaded_file)
-        return result.value
 
-    else:
-        raise ValueError("Unsupported file format")
+def export_buttons(rows_factory, fieldnames, file_stem, key):
+    """Boutons de téléchargement CSV / Parquet. `rows_factory` renvoie un itérable de dicts ;
+    le fichier n'est écrit (par paquets) qu'au clic, pas à chaque exécution de la page."""
+    formats = [CSV, PARQUET] if parquet_available() else [CSV]
+    cols = st.columns(len(formats))
+    for col, fmt in zip(cols, formats):
+        with col:
+            st.download_button(
+                f"⬇️ {fmt.upper()}",
+                data=lambda fmt=fmt: _export_payload(rows_factory, fieldnames, fmt),
+                file_name=f"{file_stem}.{fmt}",
+                mime=MIME_TYPES[fmt],
+                on_click="ignore",
+                key=f"{key}_{fmt}",
+                use_container_width=True,
+            )
@@ -0,0 +1,162 @@
+# whatif.py
+# Aperçu local d'un reclustering : K-means mini-batch vectorisé sur une matrice de
+# variables utilisateurs (CSV/Parquet), pour essayer un autre k ou d'autres variables
+# sans solliciter /clusters/recompute. Chaque exécution est chronométrée, sa mémoire estimée.
+import time
+
+import numpy as np
+import pandas as pd
+
+from clusters import PROFILE_METRICS
+
+BATCH_SIZE = 2048
+MAX_ITER = 100
+# Arrêt quand les centroïdes bougent moins que ça (en écarts-types) entre deux lots
+TOLERANCE = 1e-4
+ASSIGN_CHUNK = 65536
+# Passes complètes (Lloyd) après les mini-lots, et initialisations essayées
+REFINE_STEPS = 3
+N_INIT = 3
+
+
+def load_feature_matrix(source, name=None):
+    """DataFrame des variables utilisateurs depuis un chemin ou un fichier uploadé (CSV, ou Parquet si pyarrow est installé)."""
+    name = (name or getattr(source, "name", None) or str(source)).lower()
+    if name.endswith(".parquet"):
+        return pd.read_parquet(source)
+    return pd.read_csv(source)
+
+
+def _squared_distances(X, centroids):
+    return np.maximum((X ** 2).sum(axis=1)[:, None] - 2 * X @ centroids.T + (centroids ** 2).sum(axis=1), 0)
+
+
+def _sums_by_label(X, labels, k):
+    # Une passe bincount par variable : bien plus rapide que np.add.at
+    return np.column_stack([np.bincount(labels, weights=X[:, j], minlength=k) for j in range(X.shape[1])])
+
+
+def _kmeans_plus_plus(X, k, rng):
+    centroids = [X[rng.integers(len(X))]]
+    closest = _squared_distances(X, np.array(centroids))[:, 0]
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centroids.append(X[index])
+        closest = np.minimum(closest, _squared_distances(X, X[index][None])[:, 0])
+    return np.array(centroids)
+
+
+def assign(X, centroids):
+    """(indice du centroïde le plus proche, distance au carré), par blocs pour borner la mémoire."""
+    labels = np.empty(len(X), dtype=np.int32)
+    squared = np.empty(len(X))
+    for start in range(0, len(X), ASSIGN_CHUNK):
+        distances = _squared_distances(X[start:start + ASSIGN_CHUNK], centroids)
+        labels[start:start + ASSIGN_CHUNK] = distances.argmin(axis=1)
+        squared[start:start + ASSIGN_CHUNK] = distances.min(axis=1)
+    return labels, squared
+
+
+def minibatch_kmeans(X, k, batch_size=BATCH_SIZE, max_iter=MAX_ITER, seed=0):
+    """K-means mini-batch (Sculley, 2010) : chaque lot déplace ses centroïdes avec un pas
+    1 / nombre de points déjà vus. Renvoie (centroïdes, itérations effectuées)."""
+    rng = np.random.default_rng(seed)
+    init_sample = X[rng.choice(len(X), size=min(len(X), 10 * batch_size), replace=False)]
+    centroids = _kmeans_plus_plus(init_sample, k, rng)
+    seen = np.zeros(k)
+
+    for iteration in range(1, max_iter + 1):
+        batch = X[rng.integers(len(X), size=min(batch_size, len(X)))]
+        labels = _squared_distances(batch, centroids).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = _sums_by_label(batch, labels, k)
+
+        updated = counts > 0
+        seen[updated] += counts[updated]
+        rate = (counts[updated] / seen[updated])[:, None]
+        batch_means = sums[updated] / counts[updated][:, None]
+        previous = centroids.copy()
+        centroids[updated] = (1 - rate) * centroids[updated] + rate * batch_means
+
+        if np.abs(centroids - previous).max() < TOLERANCE:
+            break
+    return centroids, iteration
+
+
+def estimated_memory(n, d, k, batch_size=BATCH_SIZE):
+    """Mémoire de travail (octets) d'un aperçu sur n utilisateurs x d variables, d'après la
+    taille des tableaux : tracemalloc est global au processus, partagé par les sessions."""
+    chunk = min(n, ASSIGN_CHUNK)
+    init = min(n, 10 * batch_size)
+    return 8 * (
+        2 * n * d          # valeurs d'origine et centrées-réduites
+        + 2 * n            # distance au carré (meilleure et courante)
+        + 2 * chunk * k    # distances d'un bloc d'affectation et son argmin
+        + init * (d + 1)   # échantillon d'initialisation k-means++
+    ) + 4 * 2 * n          # étiquettes int32 (meilleure et courante)
+
+
+def preview_clusters(frame, features, k, sample_size=None, seed=0):
+    """Regroupe les utilisateurs de `frame` sur `features` en `k` clusters.
+    Renvoie un dict : effectifs, parts, profils moyens (unités d'origine), durée et mémoire estimée."""
+    started = time.perf_counter()
+    # Valeur manquante : moyenne de la colonne (comme l'affectation locale), 0 si elle est vide
+    selected = frame[list(features)].astype(np.float64)
+    values = selected.fillna(selected.mean()).fillna(0).to_numpy()
+    if sample_size and sample_size < len(values):
+        values = values[np.random.default_rng(seed).choice(len(values), size=sample_size, replace=False)]
+
+    mean = values.mean(axis=0)
+    scale = values.std(axis=0)
+    scale[scale == 0] = 1
+    X = (values - mean) / scale
+
+    # Plusieurs initialisations : la meilleure inertie (sur l'ensemble) l'emporte
+    best = None
+    for attempt in range(N_INIT):
+        centroids, iterations = minibatch_kmeans(X, k, seed=seed + attempt)
+        for _ in range(REFINE_STEPS):
+            labels, squared = assign(X, centroids)
+            counts = np.bincount(labels, minlength=k)
+            filled = counts > 0
+            centroids[filled] = _sums_by_label(X, labels, k)[filled] / counts[filled][:, None]
+        labels, squared = assign(X, centroids)
+        if best is None or squared.sum() < best[2].sum():
+            best = (labels, iterations, squared)
+    labels, iterations, squared = best
+    counts = np.bincount(labels, minlength=k)
+    sums = _sums_by_label(values, labels, k)
+    profiles = sums / np.maximum(counts, 1)[:, None]
+    inertia = float(squared.sum())
+
+    # Clusters triés par taille décroissante, comme un recalcul côté backend
+    order = np.argsort(-counts)
+    seconds = time.perf_counter() - started
+
+    return {
+        "features": list(features),
+        "k": k,
+        "users": len(values),
+        "counts": counts[order],
+        "percentages": counts[order] / max(len(values), 1) * 100,
+        "profiles": profiles[order],
+        "iterations": iterations,
+        "inertia": inertia,
+        "seconds": seconds,
+        "memory": estimated_memory(len(values), len(features), k),
+    }
+
+
+def closest_current_clusters(preview, snapshot):
+    """Pour chaque cluster de l'aperçu, l'identifiant du cluster actuel au profil le plus proche
+    (sur les variables communes, réduites par leur dispersion entre clusters actuels)."""
+    shared = [f for f in preview["features"] if f in PROFILE_METRICS]
+    if not shared:
+        return [None] * preview["k"]
+    current = snapshot.metrics[:, [PROFILE_METRICS.index(f) for f in shared]]
+    proposed = preview["profiles"][:, [preview["features"].index(f) for f in shared]]
+    scale = current.std(axis=0)
+    scale[scale == 0] = 1
+    distances = _squared_distances(proposed / scale, current / scale)
+    return [snapshot.ids[i] for i in distances.argmin(axis=1)]